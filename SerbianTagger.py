@@ -14,26 +14,114 @@ Author: "Petalinkar Saša"
 
 import os
 import logging
-from typing import Optional
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Tuple
 import warnings
-import treetaggerwrapper as ttpw
-from dotenv import load_dotenv
+from lemma_cache import LemmaCache, DEFAULT_MAX_ENTRIES, hash_model_file
+from utils import split_sentences
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
-# Load environment variables from .env file
-load_dotenv()
 
-# Get TreeTagger path from .env file
-TTPARPATH = os.getenv('TREETAGGER_PATH')
-if TTPARPATH:
-    logger.info(f"TreeTagger path found: {TTPARPATH}")
-else:
-    logger.warning("TreeTagger path not found in environment variables. Make sure to set TREETAGGER_PATH in .env file.")
+@lru_cache(maxsize=None)
+def treetagger_path() -> Optional[str]:
+    """
+    Return the Serbian parameter file named by TREETAGGER_PATH.
+    
+    The .env file is read on the first call, when a tagger is created,
+    rather than when this module is imported.
+    
+    Returns:
+        Optional[str]: Path of the parameter file, or None if it is not configured.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    path = os.getenv('TREETAGGER_PATH')
+    if path:
+        logger.info(f"TreeTagger path found: {path}")
+    else:
+        logger.warning("TreeTagger path not found in environment variables. Make sure to set TREETAGGER_PATH in .env file.")
+    return path
+
+# SGML marker separating segments tagged in a single TreeTagger call.
+# TreeTagger passes SGML tags through untouched, so they survive tagging.
+_BOUNDARY_NAME = "wcsr_boundary"
+_BOUNDARY = f"<{_BOUNDARY_NAME}/>"
+
+# Approximate number of characters per TreeTagger call in lemmatize_many
+DEFAULT_BATCH_CHARS = 1000000
+
+
+def _lemmas_from_lines(lines: List[str]) -> List[str]:
+    """Extract the lemma of every token from TreeTagger output lines."""
+    import treetaggerwrapper as ttpw
+    return [tag[2] for tag in ttpw.make_tags(lines) if tag.__class__.__name__ == "Tag"]
 
 
-class SrbTreeTagger:
+def _split_evenly(items: List[str], parts: int) -> List[List[str]]:
+    """Split strings into at most ``parts`` contiguous groups of similar total length."""
+    target = sum(len(item) for item in items) / max(parts, 1)
+    groups: List[List[str]] = [[]]
+    size = 0
+    for item in items:
+        if groups[-1] and size >= target and len(groups) < parts:
+            groups.append([])
+            size = 0
+        groups[-1].append(item)
+        size += len(item)
+    return [group for group in groups if group]
+
+
+class LemmatizerBackend(ABC):
+    """
+    Interface shared by all lemmatizer backends.
+
+    A backend turns text into a space-separated string of lemmas. Only
+    :meth:`lemmatize` must be implemented; batching, statistics and cleanup
+    have default implementations that backends may override.
+    """
+
+    @abstractmethod
+    def lemmatize(self, text: str) -> Optional[str]:
+        """Replace all words in a string with their lemmas."""
+
+    def lemmatize_many(self, texts: Iterable[Optional[str]],
+                       batch_chars: int = DEFAULT_BATCH_CHARS) -> List[Optional[str]]:
+        """Lemmatize many documents, keeping document boundaries."""
+        return list(self.iter_lemmatize_many(texts, batch_chars))
+
+    def iter_lemmatize_many(self, texts: Iterable[Optional[str]],
+                            batch_chars: int = DEFAULT_BATCH_CHARS) -> Iterator[Optional[str]]:
+        """Lazily lemmatize a stream of documents."""
+        for text in texts:
+            yield self.lemmatize(text)
+
+    def model_key(self) -> str:
+        """
+        Identify the model behind the lemmas this backend produces.
+
+        Results saved for later runs (such as incremental count shards) are
+        only reused while the key stays the same.
+        """
+        return type(self).__name__
+
+    def cache_stats(self) -> Optional[dict]:
+        """Return lemma cache statistics, or None if the backend has no cache."""
+        return None
+
+    def close(self) -> None:
+        """Release resources held by the backend."""
+
+    def __enter__(self) -> "LemmatizerBackend":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class SrbTreeTagger(LemmatizerBackend):
     """
     A wrapper for TreeTagger with the Serbian parameter file.
     
@@ -42,27 +130,42 @@ class SrbTreeTagger:
     parameter file is correctly set in the TREETAGGER_PATH environment variable.
     """
     
-    def __init__(self):
+    def __init__(self, cache_path: Optional[str] = None,
+                 cache_size: int = DEFAULT_MAX_ENTRIES):
         """
         Initialize the TreeTagger wrapper with Serbian parameter file.
         
+        Args:
+            cache_path (Optional[str]): SQLite file for a persistent lemma cache.
+                Caching is disabled when None.
+            cache_size (int): Maximum number of cached sentences.
+        
         Raises:
             ValueError: If TREETAGGER_PATH is not set or TreeTagger initialization fails.
         """
-        if not TTPARPATH:
+        parameter_file = treetagger_path()
+        if not parameter_file:
             raise ValueError("TREETAGGER_PATH environment variable is not set. Please check your .env file.")
         
+        import treetaggerwrapper as ttpw
         try:
-            self._tagger = ttpw.TreeTagger(TAGPARFILE=TTPARPATH)
+            self._tagger = ttpw.TreeTagger(TAGPARFILE=parameter_file)
             logger.info("Serbian TreeTagger initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize TreeTagger: {e}")
             raise ValueError(f"TreeTagger initialization failed: {e}")
 
+        self._parameter_file = parameter_file
+        self._model_key: Optional[str] = None
+        self._cache = LemmaCache(cache_path, parameter_file, cache_size) if cache_path else None
+
     def lemmatize(self, text: str) -> Optional[str]:
         """
         Replace all words in a string with their lemmas using TreeTagger.
 
+        When a lemma cache is configured, the text is split into sentences and
+        only sentences missing from the cache are sent to TreeTagger.
+
         Args:
             text (str): The string to lemmatize.
 
@@ -78,26 +181,184 @@ class SrbTreeTagger:
             return None
             
         try:
-            tags = self._tagger.tag_text(text)
-            tags2 = ttpw.make_tags(tags)
-            
-            # Build lemmatized text
-            result = []
-            for tag in tags2:
-                if tag.__class__.__name__ == "Tag":
-                    result.append(tag[2])
-                    
-            return " ".join(result)
+            if self._cache is not None:
+                return self._lemmatize_cached([text])[0]
+            return " ".join(self._tag_lemmas(text))
             
         except IndexError as e:
             logger.error(f"Error during lemmatization: {e}")
-            logger.error(f"Problematic tags: {tags2}")
             return text  # Return original text on error
             
         except Exception as e:
             logger.error(f"Unexpected error during lemmatization: {e}")
             return text  # Return original text on error
 
+    def lemmatize_many(self, texts: Iterable[Optional[str]],
+                       batch_chars: int = DEFAULT_BATCH_CHARS) -> List[Optional[str]]:
+        """
+        Lemmatize many documents, keeping document boundaries.
+
+        Args:
+            texts (Iterable[Optional[str]]): Documents to lemmatize.
+            batch_chars (int): Approximate number of characters sent to TreeTagger per call.
+
+        Returns:
+            List[Optional[str]]: Lemmatized documents, aligned with the input.
+        """
+        return list(self.iter_lemmatize_many(texts, batch_chars))
+
+    def iter_lemmatize_many(self, texts: Iterable[Optional[str]],
+                            batch_chars: int = DEFAULT_BATCH_CHARS) -> Iterator[Optional[str]]:
+        """
+        Lazily lemmatize a stream of documents in batches.
+
+        Documents are grouped until a batch holds about ``batch_chars``
+        characters, and each batch is sent through TreeTagger in a single
+        call with boundary markers between documents, so the per-call
+        overhead is paid once per batch instead of once per document.
+
+        Args:
+            texts (Iterable[Optional[str]]): Documents to lemmatize.
+            batch_chars (int): Approximate number of characters sent to TreeTagger per call.
+
+        Yields:
+            Optional[str]: Lemmatized documents in input order; None for None input.
+        """
+        batch: List[Optional[str]] = []
+        batched = 0
+        for text in texts:
+            batch.append(text)
+            batched += len(text) if text else 0
+            if batched >= batch_chars:
+                yield from self._lemmatize_batch(batch)
+                batch, batched = [], 0
+        if batch:
+            yield from self._lemmatize_batch(batch)
+
+    def _lemmatize_batch(self, texts: List[Optional[str]]) -> List[Optional[str]]:
+        """Lemmatize a batch of documents, returning the originals on error."""
+        documents = [text for text in texts if text is not None]
+        try:
+            if self._cache is not None:
+                lemmatized = self._lemmatize_cached(documents)
+            else:
+                lemmatized = self._lemmatize_segments(documents)
+        except Exception as e:
+            logger.error(f"Unexpected error during batch lemmatization: {e}")
+            lemmatized = documents  # Return original texts on error
+
+        results = iter(lemmatized)
+        return [None if text is None else next(results) for text in texts]
+
+    def tag(self, text: str) -> List[Tuple[str, str, str]]:
+        """
+        Tag a string and return (word, part of speech, lemma) for every token.
+
+        This always runs TreeTagger; the lemma cache is not consulted.
+
+        Args:
+            text (str): The string to tag.
+
+        Returns:
+            List[Tuple[str, str, str]]: One (word, POS, lemma) triple per token.
+        """
+        import treetaggerwrapper as ttpw
+        return [tuple(tag) for tag in ttpw.make_tags(self._tag_text(text))
+                if tag.__class__.__name__ == "Tag"]
+
+    def _tag_text(self, text: str) -> List[str]:
+        """Run TreeTagger on a string and return its raw output lines."""
+        return self._tagger.tag_text(text)
+
+    def _tag_lemmas(self, text: str) -> List[str]:
+        """Tag a string with TreeTagger and return the lemma of every token."""
+        return _lemmas_from_lines(self._tag_text(text))
+
+    def _lemmatize_segments(self, segments: List[str]) -> List[str]:
+        """
+        Lemmatize several segments with a single TreeTagger call.
+
+        Segments are joined with an SGML boundary marker and the tagger output
+        is split back on that marker.
+
+        Args:
+            segments (List[str]): Segments to lemmatize.
+
+        Returns:
+            List[str]: Lemmatized segments, aligned with the input.
+        """
+        if not segments:
+            return []
+        return self._split_segments(self._tag_text(f" {_BOUNDARY} ".join(segments)), segments)
+
+    def _split_segments(self, lines: List[str], segments: List[str]) -> List[str]:
+        """Split tagger output of boundary-joined segments back into lemmatized segments."""
+        import treetaggerwrapper as ttpw
+        lemmas: List[List[str]] = [[]]
+        for tag in ttpw.make_tags(lines):
+            if tag.__class__.__name__ == "Tag":
+                lemmas[-1].append(tag[2])
+            elif _BOUNDARY_NAME in str(tag[0]):
+                lemmas.append([])
+
+        if len(lemmas) != len(segments):
+            logger.warning("Segment boundaries were lost during tagging, tagging segments one by one")
+            return [" ".join(self._tag_lemmas(segment)) for segment in segments]
+        return [" ".join(segment_lemmas) for segment_lemmas in lemmas]
+
+    def _lemmatize_cached(self, texts: List[str]) -> List[str]:
+        """
+        Lemmatize documents sentence by sentence, sending only cache misses to TreeTagger.
+
+        All missing sentences of all documents are tagged in a single call.
+        """
+        documents = [split_sentences(text) for text in texts]
+        sentences = [sentence for document in documents for sentence in document]
+        lemmatized = self._cache.get_many(sentences)
+        missing = list(dict.fromkeys(
+            sentence for sentence, lemmas in zip(sentences, lemmatized) if lemmas is None
+        ))
+        if missing:
+            fresh = dict(zip(missing, self._lemmatize_segments(missing)))
+            self._cache.put_many(fresh.items())
+            lemmatized = [
+                lemmas if lemmas is not None else fresh[sentence]
+                for sentence, lemmas in zip(sentences, lemmatized)
+            ]
+
+        results = []
+        position = 0
+        for document in documents:
+            document_lemmas = lemmatized[position:position + len(document)]
+            results.append(" ".join(lemmas for lemmas in document_lemmas if lemmas))
+            position += len(document)
+        return results
+
+    def cache_stats(self) -> Optional[dict]:
+        """
+        Return lemma cache hit/miss counters.
+
+        Returns:
+            Optional[dict]: Cache statistics, or None if caching is disabled.
+        """
+        return self._cache.stats() if self._cache is not None else None
+
+    def model_key(self) -> str:
+        """
+        Identify the TreeTagger parameter file by its content hash.
+
+        Returns:
+            str: ``treetagger:`` followed by the SHA-256 of the parameter file.
+        """
+        if self._model_key is None:
+            self._model_key = f"treetagger:{hash_model_file(self._parameter_file)}"
+        return self._model_key
+
+    def close(self) -> None:
+        """Release the lemma cache, if any."""
+        if self._cache is not None:
+            self._cache.close()
+
     def lemmarizer(self, text: str) -> Optional[str]:
         """Deprecated wrapper for :meth:`lemmatize`.
 
@@ -110,3 +371,99 @@ class SrbTreeTagger:
             stacklevel=2,
         )
         return self.lemmatize(text)
+
+
+class SrbTreeTaggerPool(SrbTreeTagger):
+    """
+    A pool of persistent TreeTagger processes for Serbian.
+
+    The pool is built on treetaggerwrapper's ``TaggerPoll`` and keeps several
+    TreeTagger subprocesses running. Each call spreads its text across them
+    and reassembles the results in order. Unlike :class:`SrbTreeTagger`, one
+    instance can safely be shared by several threads.
+    """
+
+    def __init__(self, size: Optional[int] = None, cache_path: Optional[str] = None,
+                 cache_size: int = DEFAULT_MAX_ENTRIES):
+        """
+        Start the TreeTagger processes of the pool.
+
+        Args:
+            size (Optional[int]): Number of TreeTagger processes (default: CPU count).
+            cache_path (Optional[str]): SQLite file for a persistent lemma cache.
+            cache_size (int): Maximum number of cached sentences.
+
+        Raises:
+            ValueError: If TREETAGGER_PATH is not set or TreeTagger initialization fails.
+        """
+        parameter_file = treetagger_path()
+        if not parameter_file:
+            raise ValueError("TREETAGGER_PATH environment variable is not set. Please check your .env file.")
+
+        import treetaggerwrapper as ttpw
+        self.size = size or os.cpu_count() or 1
+        try:
+            self._poll = ttpw.TaggerPoll(workerscount=self.size, taggerscount=self.size,
+                                         TAGPARFILE=parameter_file)
+            logger.info(f"Serbian TreeTagger pool with {self.size} processes initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize TreeTagger pool: {e}")
+            raise ValueError(f"TreeTagger initialization failed: {e}")
+
+        self._parameter_file = parameter_file
+        self._model_key: Optional[str] = None
+        self._cache = LemmaCache(cache_path, parameter_file, cache_size) if cache_path else None
+
+    def _tag_text(self, text: str) -> List[str]:
+        return self._poll.tag_text(text)
+
+    def _tag_lemmas(self, text: str) -> List[str]:
+        """Tag a string on all processes of the pool, split at sentence boundaries."""
+        parts = [" ".join(group) for group in _split_evenly(split_sentences(text), self.size)]
+        jobs = [self._poll.tag_text_async(part) for part in parts]
+        lemmas: List[str] = []
+        for job in jobs:
+            job.wait()
+            lemmas.extend(_lemmas_from_lines(job.result))
+        return lemmas
+
+    def _lemmatize_segments(self, segments: List[str]) -> List[str]:
+        """Lemmatize segments on all processes of the pool, keeping their order."""
+        if not segments:
+            return []
+        groups = _split_evenly(segments, self.size)
+        jobs = [self._poll.tag_text_async(f" {_BOUNDARY} ".join(group)) for group in groups]
+        results: List[str] = []
+        for group, job in zip(groups, jobs):
+            job.wait()
+            results.extend(self._split_segments(job.result, group))
+        return results
+
+    def close(self) -> None:
+        """Stop the TreeTagger processes and release the lemma cache."""
+        self._poll.stop_poll()
+        super().close()
+
+
+def create_tagger(pool_size: int = 1, lexicon_path: Optional[str] = None,
+                  **kwargs) -> LemmatizerBackend:
+    """
+    Create a single tagger or a tagger pool, optionally behind a lexicon.
+
+    Args:
+        pool_size (int): Number of TreeTagger processes; a pool is used above 1.
+        lexicon_path (Optional[str]): Lexicon file; known unambiguous forms are then
+            resolved in memory and only the rest goes to TreeTagger.
+        **kwargs: Keyword arguments passed to the tagger (``cache_path``, ``cache_size``).
+
+    Returns:
+        LemmatizerBackend: A backend with the ``lemmatize`` interface.
+    """
+    if pool_size > 1:
+        tagger = SrbTreeTaggerPool(size=pool_size, **kwargs)
+    else:
+        tagger = SrbTreeTagger(**kwargs)
+    if lexicon_path:
+        from lexicon import LexiconLemmatizer
+        return LexiconLemmatizer.from_file(lexicon_path, tagger)
+    return tagger
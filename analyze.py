@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# filepath: d:\GitHub\WordcloudSR\analyze.py
+"""
+AnalyzeSR: Single-Pass Word Cloud and Lemma Frequency Generator
+
+This script combines wordcloudsr.py and wordfrqsr.py. Each subdirectory of the
+input directory is read and lemmatized once, and both the word cloud images
+and the lemma frequency CSV are written from that single result.
+
+Requires:
+    - SerbianTagger with TreeTagger properly installed
+    - wordcloud library
+    - A properly formatted stopwords file
+
+Author: Unknown
+Date: October 16, 2026
+"""
+
+import os
+import time
+from typing import Callable, Set, Optional, Dict, List
+from SerbianTagger import SrbTreeTagger, create_tagger
+from lemma_cache import DEFAULT_MAX_ENTRIES
+from manifest import DirectoryState
+from metrics import DirectoryMetrics, RunResults, finish_run
+from parallel import map_directories
+from progress import CancellationToken, Progress, ProgressTracker
+from render_cache import DEFAULT_MAX_MB, RenderCache
+from wordcloudsr import log_render_cache_stats, render_wordclouds
+from wordfrqsr import sort_lemma_counts, write_frequencies_to_csv
+from utils import (
+    DEFAULT_CHUNK_SIZE,
+    count_lemmas_and_bigrams,
+    load_stopwords,
+    lemmatize_chunks,
+    ensure_directory_exists,
+    list_input_directories,
+    log_cache_stats,
+    parse_arguments,
+    setup_logging,
+    logger
+)
+
+
+def process_directory(directory: str, tagger: SrbTreeTagger, stopwords: Set[str],
+                      output_dir: str, collocations: bool,
+                      width: int, height: int, max_words: int,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      state_dir: Optional[str] = None,
+                      image_format: str = 'png', scale: float = 1.0,
+                      use_matplotlib: bool = False,
+                      render_cache: Optional[RenderCache] = None,
+                      layout_engine: str = 'wordcloud',
+                      keep_frequencies: bool = False,
+                      metrics: Optional[DirectoryMetrics] = None) -> Dict[str, Optional[str]]:
+    """
+    Read and lemmatize a single directory once, then write its word clouds and CSV.
+
+    Args:
+        directory (str): Directory containing text files.
+        tagger (SrbTreeTagger): Initialized tagger instance.
+        stopwords (Set[str]): Set of stopwords.
+        output_dir (str): Directory to save output images and CSV.
+        collocations (bool): Whether to include collocations.
+        width (int): Width of the generated word cloud image.
+        height (int): Height of the generated word cloud image.
+        max_words (int): Maximum number of words in the word cloud.
+        chunk_size (int): Characters of text lemmatized per TreeTagger call.
+        state_dir (Optional[str]): Directory with incremental state; when set, only
+            new or changed files are lemmatized and outputs are rebuilt from merged counts.
+        image_format (str): Output image format: png, webp, jpeg or svg.
+        scale (float): Scaling between layout and output image size.
+        use_matplotlib (bool): Whether to save images through matplotlib.
+        render_cache (Optional[RenderCache]): Cache of rendered images; unchanged word
+            clouds are copied from it instead of being laid out again.
+        layout_engine (str): Word placement engine: wordcloud or numpy.
+        keep_frequencies (bool): Also return the sorted frequency table under ``frequencies``.
+        metrics (Optional[DirectoryMetrics]): Collects file, token and timing statistics.
+
+    Returns:
+        Dict[str, Optional[str]]: Paths to the standard and collocations images and the CSV file.
+    """
+    result = {'standard': None, 'collocations': None, 'csv': None}
+    logger.info(f"Processing directory: {directory}")
+    folder_name = os.path.basename(directory)
+    metrics = metrics or DirectoryMetrics(directory)
+
+    if state_dir:
+        # Merge per-file shards, lemmatizing only new or changed files
+        lemma_freq, bigram_freq = DirectoryState(state_dir, directory).update(
+            tagger, chunk_size, metrics)
+    else:
+        # Lemmatize the directory chunk by chunk, this is its only pass through TreeTagger
+        lemmatized_chunks = metrics.timed(
+            lemmatize_chunks(metrics.read_chunks(directory, chunk_size), tagger), 'lemmatize')
+        with metrics.stage('count'):
+            lemma_freq, bigram_freq = count_lemmas_and_bigrams(lemmatized_chunks)
+    metrics.add_counts(lemma_freq)
+
+    # Frequency table
+    with metrics.stage('count'):
+        sorted_lemmas = sort_lemma_counts(lemma_freq, stopwords)
+    if not sorted_lemmas:
+        logger.warning(f"No lemmas found in {directory}, skipping")
+        return result
+    csv_path = os.path.join(output_dir, f'{folder_name}.csv')
+    with metrics.stage('write'):
+        if write_frequencies_to_csv(sorted_lemmas, csv_path):
+            result['csv'] = csv_path
+    if keep_frequencies and result['csv']:
+        result['frequencies'] = sorted_lemmas
+
+    # Word clouds, rendered from the same counts
+    result['standard'], result['collocations'] = render_wordclouds(
+        lemma_freq,
+        bigram_freq,
+        folder_name,
+        stopwords,
+        output_dir,
+        collocations,
+        width,
+        height,
+        max_words,
+        image_format,
+        scale,
+        use_matplotlib,
+        metrics,
+        render_cache,
+        layout_engine
+    )
+    return result
+
+
+def process_files(collocations: bool = False,
+                  input_dir: str = 'input',
+                  output_dir: str = 'output',
+                  stopwords_file: str = 'stopwords.txt',
+                  width: int = 1200,
+                  height: int = 800,
+                  max_words: int = 200,
+                  lemma_cache: Optional[str] = None,
+                  lemma_cache_size: int = DEFAULT_MAX_ENTRIES,
+                  workers: int = 1,
+                  taggers: int = 1,
+                  lexicon: Optional[str] = None,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE,
+                  state_dir: Optional[str] = None,
+                  image_format: str = 'png',
+                  scale: float = 1.0,
+                  use_matplotlib: bool = False,
+                  report_path: Optional[str] = None,
+                  prometheus_path: Optional[str] = None,
+                  profile_dir: Optional[str] = None,
+                  profile_memory: bool = False,
+                  render_cache: Optional[str] = None,
+                  render_cache_size: int = DEFAULT_MAX_MB,
+                  layout_engine: str = 'wordcloud',
+                  results_db: Optional[str] = None,
+                  collection_depth: Optional[int] = None,
+                  include: Optional[List[str]] = None,
+                  exclude: Optional[List[str]] = None,
+                  progress: Optional[Callable[[Progress], None]] = None,
+                  cancel: Optional[CancellationToken] = None) -> Dict[str, Dict[str, Optional[str]]]:
+    """
+    Process text files in subdirectories, writing word clouds and frequency CSVs in one pass.
+
+    Args:
+        collocations (bool): Whether to include collocations in the word clouds.
+        input_dir (str): Directory containing subdirectories with text files.
+        output_dir (str): Directory where output images and CSV files will be saved.
+        stopwords_file (str): File containing stopwords to exclude.
+        width (int): Width of the generated word clouds.
+        height (int): Height of the generated word clouds.
+        max_words (int): Maximum number of words in each word cloud.
+        lemma_cache (Optional[str]): SQLite file for a persistent lemma cache.
+        lemma_cache_size (int): Maximum number of entries in the lemma cache.
+        workers (int): Number of worker processes. Each worker starts its own
+            TreeTagger; with 1 everything runs in the current process.
+        taggers (int): Number of TreeTagger processes per worker; above 1 a
+            SrbTreeTaggerPool spreads every directory across them.
+        lexicon (Optional[str]): Lexicon file for the in-process lexicon lemmatizer;
+            only unknown and ambiguous forms are then sent to TreeTagger.
+        chunk_size (int): Characters of text lemmatized per TreeTagger call.
+        state_dir (Optional[str]): Directory with incremental per-file state.
+        image_format (str): Output image format: png, webp, jpeg or svg.
+        scale (float): Scaling between layout and output image size.
+        use_matplotlib (bool): Whether to save images through matplotlib (slower).
+        report_path (Optional[str]): JSON file for the run report.
+        prometheus_path (Optional[str]): Prometheus textfile for the run report.
+        profile_dir (Optional[str]): Directory for per-directory, per-stage CPU profiles;
+            None disables profiling.
+        profile_memory (bool): Also record tracemalloc peaks of the lemmatize and render
+            stages (requires ``profile_dir``).
+        render_cache (Optional[str]): Directory of a content-addressed cache of rendered
+            images; word clouds identical to a cached one are copied instead of rendered.
+        render_cache_size (int): Maximum size of the render cache in megabytes.
+        layout_engine (str): Word placement engine: ``wordcloud`` (the library's own)
+            or ``numpy`` (vectorized, much faster on large images).
+        results_db (Optional[str]): Also load every frequency table into this SQLite
+            database (see :mod:`results_db`), upserting directories seen before.
+        collection_depth (Optional[int]): Level of the collections below ``input_dir``,
+            each read with its nested directories; None makes every nested directory
+            a collection of its own files.
+        include (Optional[List[str]]): Glob patterns of files to read (default:
+            ``*.txt`` and ``*.txt.gz``, also inside ``.zip`` and ``.tar`` archives).
+        exclude (Optional[List[str]]): Glob patterns of files and directories to skip.
+        progress (Optional[Callable[[Progress], None]]): Called with the directory, stage,
+            bytes and tokens done as the run advances, from the thread doing the work.
+        cancel (Optional[CancellationToken]): Stops the run between chunks and directories;
+            the results of the directories finished before are kept.
+
+    Returns:
+        Dict[str, Dict[str, Optional[str]]]: Results dictionary with paths to generated images and
+        CSVs. It is a :class:`metrics.RunResults` whose ``metrics`` attribute holds the run report
+        and whose ``cancelled`` attribute tells whether the run was cancelled.
+    """
+    logger.info(
+        f"Starting single-pass analysis (collocations={collocations}, "
+        f"width={width}, height={height}, max_words={max_words})"
+    )
+
+    started = time.perf_counter()
+
+    # Ensure output directory exists
+    ensure_directory_exists(output_dir)
+    results = RunResults()
+    directory_metrics = []
+
+    tagger = None
+    results_store = None
+    try:
+        # Initialize tagger and load stopwords
+        tagger_kwargs = {'cache_path': lemma_cache, 'cache_size': lemma_cache_size,
+                         'pool_size': taggers, 'lexicon_path': lexicon}
+        if workers <= 1:
+            logger.info("Initializing Serbian TreeTagger")
+            tagger = create_tagger(**tagger_kwargs)
+
+        logger.info(f"Loading stopwords from {stopwords_file}")
+        stopwords = load_stopwords(stopwords_file)
+        profile = {'profile_dir': profile_dir, 'memory': profile_memory} if profile_dir else None
+
+        # Process each subdirectory in the input directory
+        directories = list_input_directories(input_dir, collection_depth, include, exclude)
+        cache = RenderCache(render_cache, render_cache_size) if render_cache else None
+        args = (stopwords, output_dir, collocations, width, height, max_words, chunk_size,
+                state_dir, image_format, scale, use_matplotlib, cache, layout_engine,
+                bool(results_db))
+        if results_db:
+            from results_db import ResultsStore
+            results_store = ResultsStore(results_db)
+        tracker = ProgressTracker(progress, len(directories)) if progress else None
+        for directory, result, metrics in map_directories(
+                process_directory, directories, args,
+                tagger=tagger, workers=workers, tagger_kwargs=tagger_kwargs,
+                profile=profile, progress=tracker, cancel=cancel):
+            directory_metrics.append(metrics)
+            frequencies = result.pop('frequencies', None)
+            if results_store is not None and frequencies:
+                results_store.add(os.path.basename(directory), frequencies)
+            if any(result.values()):
+                results[os.path.basename(directory)] = result
+
+        if results_store is not None:
+            results_store.flush()
+        if cancel is not None and cancel.cancelled and len(directory_metrics) < len(directories):
+            results.cancelled = True
+            logger.warning(f"Analysis cancelled after {len(directory_metrics)} of "
+                           f"{len(directories)} directories, keeping their results")
+        logger.info(f"Analysis completed. Processed {len(results)} directories.")
+        log_cache_stats(tagger)
+        if cache is not None:
+            log_render_cache_stats(cache, directory_metrics)
+        if profile_dir:
+            from profiling import merge_profiles
+            merge_profiles(profile_dir, [metrics.directory for metrics in directory_metrics])
+        return finish_run(results, 'analyze', directory_metrics, started,
+                          report_path, prometheus_path)
+
+    except Exception as e:
+        logger.error(f"An error occurred during processing: {e}")
+        raise
+    finally:
+        if tagger is not None:
+            tagger.close()
+        if results_store is not None:
+            results_store.close()
+
+
+def main():
+    """Parse arguments and run the single-pass analysis."""
+    args = parse_arguments()
+    setup_logging(args['debug'])
+
+    process_files(
+        collocations=not args['no_collocations'],
+        input_dir=args['input'],
+        output_dir=args['output'],
+        stopwords_file=args['stopwords'],
+        width=args['width'],
+        height=args['height'],
+        max_words=args['max_words'],
+        lemma_cache=args['lemma_cache'],
+        lemma_cache_size=args['lemma_cache_size'],
+        workers=args['workers'],
+        taggers=args['taggers'],
+        lexicon=args['lexicon'],
+        chunk_size=args['chunk_size'],
+        state_dir=args['state_dir'],
+        image_format=args['format'],
+        scale=args['scale'],
+        use_matplotlib=args['matplotlib'],
+        report_path=args['report'],
+        prometheus_path=args['prometheus'],
+        profile_dir=args['profile'],
+        profile_memory=args['profile_memory'],
+        render_cache=args['render_cache'],
+        render_cache_size=args['render_cache_size'],
+        layout_engine=args['layout_engine'],
+        results_db=args['results_db'],
+        collection_depth=args['collection_depth'],
+        include=args['include'],
+        exclude=args['exclude']
+    )
+
+
+if __name__ == "__main__":
+    main()
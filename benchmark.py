@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+# filepath: d:\GitHub\WordcloudSR\benchmark.py
+"""
+WordcloudSR Benchmark Suite
+
+This script measures the performance of the processing pipeline without a
+TreeTagger installation. It generates a synthetic Serbian-like corpus, runs
+every directory through the same functions the scripts use, with a
+deterministic stand-in tagger, and times each stage separately:
+
+    read       reading and chunking the text files of a directory
+    lemmatize  lemmatizing the chunks
+    count      counting lemmas and bigrams and removing stopwords
+    layout     word cloud layout
+    save       writing the word cloud images
+    csv        writing the frequency CSV
+
+Results are written as JSON so runs can be compared over time.
+
+With ``--compare-layout`` the script instead times word cloud layout alone,
+with each layout engine at each of the ``--layout-sizes``, on the frequency
+table of the first synthetic directory.
+
+With ``--startup`` it measures the startup cost of every command-line
+script instead: ``python -X importtime`` of the script's module, the slowest
+imports, which heavy dependencies are loaded up front, and the wall time of
+``python <script> --help``.
+
+Usage:
+    python benchmark.py --directories 4 --files 50 --words 2000 --output bench.json
+    python benchmark.py --latency 0.01 --repeat 3 --no-render
+    python benchmark.py --compare-layout --layout-sizes 1200x800,3840x2160 --repeat 3
+    python benchmark.py --startup --repeat 5
+
+Author: Unknown
+Date: October 16, 2026
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from SerbianTagger import LemmatizerBackend
+from utils import (
+    count_lemmas_and_bigrams,
+    iter_text_chunks,
+    lemmatize_chunks,
+    list_input_directories,
+    load_stopwords,
+    remove_stopword_bigrams,
+    setup_logging
+)
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('read', 'lemmatize', 'count', 'layout', 'save', 'csv')
+
+# Command-line scripts measured by --startup
+STARTUP_SCRIPTS = ('wordfrqsr', 'wordcloudsr', 'analyze', 'service', 'lexicon', 'termdoc', 'results_db')
+
+# Dependencies that are expensive to import; scripts should load them only when needed
+HEAVY_MODULES = ('numpy', 'matplotlib', 'wordcloud', 'PIL', 'treetaggerwrapper', 'dotenv')
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+_LETTERS = "abcdefghijklmnoprstuvzčćđšž"
+_VOWELS = "aeiou"
+# Frequent function words; they are also written out as the stopword list
+_FUNCTION_WORDS = ["i", "je", "u", "da", "se", "na", "za", "od", "su", "ne", "sa", "to", "ali", "kao"]
+# Inflectional endings added to stems and stripped again by FakeTagger
+_ENDINGS = ["", "a", "e", "i", "u", "om", "ima", "ama", "og", "oj", "ih", "ski"]
+_STRIP_ENDINGS = sorted((e for e in _ENDINGS if e), key=len, reverse=True)
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+class FakeTagger(LemmatizerBackend):
+    """
+    Deterministic stand-in for SrbTreeTagger.
+
+    Tokens are lowercased and a known inflectional ending is stripped, so the
+    same input always gives the same lemmas. Optional sleeps imitate the
+    latency of a TreeTagger round trip.
+    """
+
+    def __init__(self, latency: float = 0.0, latency_per_token: float = 0.0):
+        """
+        Args:
+            latency (float): Seconds added to every ``lemmatize`` call.
+            latency_per_token (float): Seconds added per token.
+        """
+        self.latency = latency
+        self.latency_per_token = latency_per_token
+        self.calls = 0
+        self.tokens = 0
+
+    @staticmethod
+    def _lemma(token: str) -> str:
+        token = token.lower()
+        for ending in _STRIP_ENDINGS:
+            if token.endswith(ending) and len(token) - len(ending) >= 3:
+                return token[:-len(ending)]
+        return token
+
+    def lemmatize(self, text: str) -> Optional[str]:
+        """
+        Replace all words in a string with their fake lemmas.
+
+        Args:
+            text (str): The string to lemmatize.
+
+        Returns:
+            Optional[str]: The lemmatized string, or None if input is None.
+        """
+        if text is None:
+            return None
+        tokens = _TOKEN.findall(text)
+        self.calls += 1
+        self.tokens += len(tokens)
+        delay = self.latency + self.latency_per_token * len(tokens)
+        if delay > 0:
+            time.sleep(delay)
+        return " ".join(self._lemma(token) for token in tokens)
+
+
+def _make_stem(rng: random.Random) -> str:
+    syllables = rng.randint(1, 3)
+    return "".join(rng.choice(_LETTERS) + rng.choice(_VOWELS) for _ in range(syllables)) + rng.choice(_LETTERS)
+
+
+def generate_corpus(root: str, directories: int = 4, files: int = 20, words: int = 2000,
+                    vocabulary: int = 5000, seed: int = 1) -> Dict[str, int]:
+    """
+    Write a synthetic Serbian-like corpus and a matching stopword list.
+
+    Word stems follow a Zipf-like distribution and get random inflectional
+    endings; sentences mix them with frequent function words.
+
+    Args:
+        root (str): Directory to create the corpus in; ``input`` and ``stopwords.txt`` are written there.
+        directories (int): Number of input subdirectories.
+        files (int): Number of text files per subdirectory.
+        words (int): Number of words per file.
+        vocabulary (int): Number of distinct stems.
+        seed (int): Random seed; the same seed gives the same corpus.
+
+    Returns:
+        Dict[str, int]: Number of directories, files, words and bytes written.
+    """
+    rng = random.Random(seed)
+    stems = list(dict.fromkeys(_make_stem(rng) for _ in range(vocabulary)))
+    weights = [1.0 / rank for rank in range(1, len(stems) + 1)]
+
+    input_dir = os.path.join(root, 'input')
+    total_bytes = 0
+    for d in range(directories):
+        directory = os.path.join(input_dir, f"dir{d:03d}")
+        os.makedirs(directory, exist_ok=True)
+        for f in range(files):
+            sentences = []
+            remaining = words
+            while remaining > 0:
+                length = min(remaining, rng.randint(5, 20))
+                sentence = [
+                    rng.choice(_FUNCTION_WORDS) if rng.random() < 0.3
+                    else rng.choices(stems, weights)[0] + rng.choice(_ENDINGS)
+                    for _ in range(length)
+                ]
+                sentences.append(sentence[0].capitalize() + " " + " ".join(sentence[1:]) + ".")
+                remaining -= length
+            data = " ".join(sentences).encode('utf-8')
+            with open(os.path.join(directory, f"file{f:04d}.txt"), 'wb') as fh:
+                fh.write(data)
+            total_bytes += len(data)
+
+    with open(os.path.join(root, 'stopwords.txt'), 'w', encoding='utf-8') as fh:
+        fh.write("\n".join(_FUNCTION_WORDS) + "\n")
+
+    return {'directories': directories, 'files': directories * files,
+            'words': directories * files * words, 'bytes': total_bytes}
+
+
+def benchmark_directory(directory: str, tagger: LemmatizerBackend, stopwords: Set[str],
+                        output_dir: str, chunk_size: int, render: bool = True,
+                        collocations: bool = True, width: int = 1200, height: int = 800,
+                        max_words: int = 200, image_format: str = 'png',
+                        layout_engine: str = 'wordcloud') -> Dict[str, float]:
+    """
+    Run one directory through the pipeline and time each stage.
+
+    Args:
+        directory (str): Directory containing text files.
+        tagger (LemmatizerBackend): Tagger used for lemmatization.
+        stopwords (Set[str]): Set of stopwords.
+        output_dir (str): Directory for the images and CSV file.
+        chunk_size (int): Characters of text lemmatized per tagger call.
+        render (bool): Whether to lay out and save word clouds.
+        collocations (bool): Whether to also render the collocations cloud.
+        width (int): Width of the word cloud image.
+        height (int): Height of the word cloud image.
+        max_words (int): Maximum number of words in the word cloud.
+        image_format (str): Output image format.
+        layout_engine (str): Word placement engine: wordcloud or numpy.
+
+    Returns:
+        Dict[str, float]: Seconds spent in each stage.
+    """
+    from wordfrqsr import sort_lemma_counts, write_frequencies_to_csv
+
+    timings = dict.fromkeys(STAGES, 0.0)
+    folder_name = os.path.basename(directory)
+
+    start = time.perf_counter()
+    chunks = list(iter_text_chunks(directory, chunk_size))
+    timings['read'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lemmatized = list(lemmatize_chunks(chunks, tagger))
+    timings['lemmatize'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lemma_freq, bigram_freq = count_lemmas_and_bigrams(lemmatized)
+    sorted_lemmas = sort_lemma_counts(lemma_freq, stopwords)
+    unigrams = {lemma: count for lemma, count in lemma_freq.items() if lemma not in stopwords}
+    clouds = [('', unigrams)]
+    if render and collocations:
+        from wordcloudsr import collocation_frequencies
+        bigrams = remove_stopword_bigrams(bigram_freq, stopwords)
+        clouds.append(('_collocations', collocation_frequencies(unigrams, bigrams)))
+    timings['count'] = time.perf_counter() - start
+
+    if render:
+        from wordcloudsr import generate_wordcloud_from_frequencies, save_wordcloud
+        from utils import IMAGE_FORMATS
+        for suffix, frequencies in clouds:
+            start = time.perf_counter()
+            wordcloud = generate_wordcloud_from_frequencies(frequencies.items(), width, height, max_words,
+                                                            layout_engine=layout_engine)
+            timings['layout'] += time.perf_counter() - start
+            if wordcloud is None:
+                continue
+            start = time.perf_counter()
+            path = os.path.join(output_dir, f"{folder_name}{suffix}.{IMAGE_FORMATS[image_format]}")
+            save_wordcloud(wordcloud, path)
+            timings['save'] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    write_frequencies_to_csv(sorted_lemmas, os.path.join(output_dir, f"{folder_name}.csv"))
+    timings['csv'] = time.perf_counter() - start
+    return timings
+
+
+def run_benchmark(root: str, tagger: LemmatizerBackend, chunk_size: int,
+                  repeat: int = 1, **options: Any) -> List[Dict[str, Any]]:
+    """
+    Benchmark every directory of a corpus ``repeat`` times.
+
+    Args:
+        root (str): Corpus directory written by :func:`generate_corpus`.
+        tagger (LemmatizerBackend): Tagger used for lemmatization.
+        chunk_size (int): Characters of text lemmatized per tagger call.
+        repeat (int): Number of runs.
+        **options: Keyword arguments passed to :func:`benchmark_directory`.
+
+    Returns:
+        List[Dict[str, Any]]: One entry per run with total and per-directory stage seconds.
+    """
+    stopwords = load_stopwords(os.path.join(root, 'stopwords.txt'))
+    directories = list_input_directories(os.path.join(root, 'input'))
+    output_dir = os.path.join(root, 'output')
+    os.makedirs(output_dir, exist_ok=True)
+
+    runs = []
+    for _ in range(repeat):
+        per_directory = {}
+        started = time.perf_counter()
+        for directory in directories:
+            per_directory[os.path.basename(directory)] = benchmark_directory(
+                directory, tagger, stopwords, output_dir, chunk_size, **options)
+        wall = time.perf_counter() - started
+        totals = {stage: sum(t[stage] for t in per_directory.values()) for stage in STAGES}
+        runs.append({'wall_seconds': wall, 'stages': totals, 'directories': per_directory})
+    return runs
+
+
+def benchmark_layout(directory: str, tagger: LemmatizerBackend, stopwords: Set[str],
+                     sizes: List[Tuple[int, int]], engines: List[str], repeat: int = 1,
+                     max_words: int = 200) -> List[Dict[str, Any]]:
+    """
+    Time word cloud layout with each engine at each canvas size.
+
+    Args:
+        directory (str): Directory whose lemma frequencies are laid out.
+        tagger (LemmatizerBackend): Tagger used for lemmatization.
+        stopwords (Set[str]): Set of stopwords.
+        sizes (List[Tuple[int, int]]): (width, height) canvas sizes.
+        engines (List[str]): Layout engines to compare.
+        repeat (int): Layouts per engine and size.
+        max_words (int): Maximum number of words in the word cloud.
+
+    Returns:
+        List[Dict[str, Any]]: Minimum and median seconds and placed words per engine and size.
+    """
+    from wordcloudsr import generate_wordcloud_from_frequencies
+
+    lemma_freq, _ = count_lemmas_and_bigrams(
+        lemmatize_chunks(iter_text_chunks(directory, 100000), tagger))
+    unigrams = {lemma: count for lemma, count in lemma_freq.items() if lemma not in stopwords}
+
+    results = []
+    for width, height in sizes:
+        for engine in engines:
+            seconds, placed = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                wordcloud = generate_wordcloud_from_frequencies(unigrams.items(), width, height,
+                                                                max_words, layout_engine=engine)
+                seconds.append(time.perf_counter() - start)
+                placed.append(len(wordcloud.layout_) if wordcloud is not None else 0)
+            results.append({'engine': engine, 'width': width, 'height': height,
+                            'seconds': {'min': min(seconds), 'median': statistics.median(seconds)},
+                            'words_placed': min(placed)})
+            logger.info(f"Layout {engine} {width}x{height}: {min(seconds):.2f}s, "
+                        f"{min(placed)} words placed")
+    return results
+
+
+def _parse_sizes(value: str) -> List[Tuple[int, int]]:
+    try:
+        return [tuple(int(part) for part in size.lower().split('x', 1)) for size in value.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected sizes like 1200x800,3840x2160, got {value!r}")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    Parse the output of ``python -X importtime``.
+
+    Args:
+        stderr (str): Standard error of the interpreter.
+
+    Returns:
+        List[Tuple[str, int, int]]: (module, self, cumulative) import times in microseconds,
+        in the order the imports finished.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        imports.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return imports
+
+
+def benchmark_startup(scripts: List[str], repeat: int = 1, top: int = 10) -> List[Dict[str, Any]]:
+    """
+    Measure the startup cost of command-line scripts in fresh interpreters.
+
+    Args:
+        scripts (List[str]): Script modules, e.g. ``wordfrqsr``.
+        repeat (int): Measurements per script.
+        top (int): Number of slowest imports reported per script.
+
+    Returns:
+        List[Dict[str, Any]]: Per script, the minimum and median import time of its module,
+        the wall time of ``--help``, the heavy modules it imports and its slowest imports.
+    """
+    results = []
+    for script in scripts:
+        import_ms, help_seconds, imports = [], [], []
+        for _ in range(repeat):
+            completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {script}'],
+                                       cwd=_ROOT, capture_output=True, text=True)
+            if completed.returncode != 0:
+                raise RuntimeError(f"Importing {script} failed: {completed.stderr.strip().splitlines()[-1:]}")
+            imports = parse_importtime(completed.stderr)
+            import_ms.append(next(cumulative for module, _, cumulative in reversed(imports)
+                                  if module == script) / 1000)
+
+            start = time.perf_counter()
+            subprocess.run([sys.executable, f'{script}.py', '--help'], cwd=_ROOT,
+                           capture_output=True, check=True)
+            help_seconds.append(time.perf_counter() - start)
+
+        loaded = {module for module, _, _ in imports}
+        slowest = sorted(imports, key=lambda entry: entry[1], reverse=True)[:top]
+        results.append({
+            'script': script,
+            'import_ms': {'min': min(import_ms), 'median': statistics.median(import_ms)},
+            'help_seconds': {'min': min(help_seconds), 'median': statistics.median(help_seconds)},
+            'modules': len(imports),
+            'heavy_modules': [module for module in HEAVY_MODULES if module in loaded],
+            'slowest_imports': [{'module': module, 'self_ms': own / 1000, 'cumulative_ms': cumulative / 1000}
+                                for module, own, cumulative in slowest],
+        })
+        logger.info(f"Startup {script}: import {min(import_ms):.0f} ms, --help {min(help_seconds):.2f}s, "
+                    f"heavy modules: {', '.join(results[-1]['heavy_modules']) or 'none'}")
+    return results
+
+
+def summarize(runs: List[Dict[str, Any]], corpus: Dict[str, int]) -> Dict[str, Any]:
+    """
+    Summarize benchmark runs with the minimum and median time of every stage.
+
+    Args:
+        runs (List[Dict[str, Any]]): Results of :func:`run_benchmark`.
+        corpus (Dict[str, int]): Corpus statistics from :func:`generate_corpus`.
+
+    Returns:
+        Dict[str, Any]: Stage statistics and throughput of the fastest run.
+    """
+    stages = {
+        stage: {'min': min(run['stages'][stage] for run in runs),
+                'median': statistics.median(run['stages'][stage] for run in runs)}
+        for stage in STAGES
+    }
+    fastest = min(run['wall_seconds'] for run in runs)
+    return {
+        'stages': stages,
+        'wall_seconds': {'min': fastest,
+                         'median': statistics.median(run['wall_seconds'] for run in runs)},
+        'words_per_second': corpus['words'] / fastest if fastest else None,
+        'bytes_per_second': corpus['bytes'] / fastest if fastest else None,
+    }
+
+
+def parse_arguments() -> Dict[str, Any]:
+    """Parse the benchmark command-line arguments."""
+    parser = argparse.ArgumentParser(description='WordcloudSR - pipeline benchmark')
+    parser.add_argument('--directories', type=int, default=4, help='Number of input directories (default: 4)')
+    parser.add_argument('--files', type=int, default=20, help='Files per directory (default: 20)')
+    parser.add_argument('--words', type=int, default=2000, help='Words per file (default: 2000)')
+    parser.add_argument('--vocabulary', type=int, default=5000, help='Distinct word stems (default: 5000)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed of the corpus (default: 1)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds of fake tagger latency per call (default: 0)')
+    parser.add_argument('--latency-per-token', type=float, default=0.0,
+                        help='Seconds of fake tagger latency per token (default: 0)')
+    parser.add_argument('--chunk-size', type=int, default=100000,
+                        help='Characters of text lemmatized per tagger call (default: 100000)')
+    parser.add_argument('--repeat', type=int, default=1, help='Number of runs (default: 1)')
+    parser.add_argument('--no-render', action='store_true', help='Skip word cloud layout and image saving')
+    parser.add_argument('--no-collocations', action='store_true', help='Skip the collocations word cloud')
+    parser.add_argument('--format', default='png', help='Word cloud image format (default: png)')
+    parser.add_argument('--layout-engine', default='wordcloud', choices=('wordcloud', 'numpy'),
+                        help='Word placement engine of the pipeline benchmark (default: wordcloud)')
+    parser.add_argument('--compare-layout', action='store_true',
+                        help='Only time word cloud layout, with every engine at every --layout-sizes size')
+    parser.add_argument('--layout-sizes', type=_parse_sizes, default=[(1200, 800), (3840, 2160)],
+                        help='Canvas sizes of --compare-layout (default: 1200x800,3840x2160)')
+    parser.add_argument('--startup', action='store_true',
+                        help='Only measure the import time and --help wall time of the scripts')
+    parser.add_argument('--scripts', default=','.join(STARTUP_SCRIPTS),
+                        type=lambda value: [script for script in value.split(',') if script],
+                        help=f'Scripts measured by --startup (default: {",".join(STARTUP_SCRIPTS)})')
+    parser.add_argument('--workdir', default=None,
+                        help='Directory for the corpus and outputs (default: a temporary directory)')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary directory')
+    parser.add_argument('--output', default=None, help='JSON file for the results (default: print)')
+    return vars(parser.parse_args())
+
+
+def main() -> int:
+    """Generate a corpus, run the benchmark and write the JSON results."""
+    args = parse_arguments()
+    setup_logging()
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpu_count': os.cpu_count()},
+        'config': {key: value for key, value in args.items() if key not in ('output', 'keep')},
+    }
+    if args['startup']:
+        report['startup'] = benchmark_startup(args['scripts'], args['repeat'])
+        return write_report(report, args['output'])
+
+    root = args['workdir'] or tempfile.mkdtemp(prefix='wcsr-bench-')
+    try:
+        corpus = generate_corpus(root, args['directories'], args['files'], args['words'],
+                                 args['vocabulary'], args['seed'])
+        tagger = FakeTagger(args['latency'], args['latency_per_token'])
+        report['corpus'] = corpus
+        if args['compare_layout']:
+            report['layout'] = benchmark_layout(
+                list_input_directories(os.path.join(root, 'input'))[0], tagger,
+                load_stopwords(os.path.join(root, 'stopwords.txt')), args['layout_sizes'],
+                ['wordcloud', 'numpy'], args['repeat'])
+        else:
+            runs = run_benchmark(root, tagger, args['chunk_size'], args['repeat'],
+                                 render=not args['no_render'],
+                                 collocations=not args['no_collocations'],
+                                 image_format=args['format'],
+                                 layout_engine=args['layout_engine'])
+            report['summary'] = summarize(runs, corpus)
+            report['runs'] = runs
+    finally:
+        if args['workdir'] or args['keep']:
+            logger.info(f"Benchmark corpus and outputs kept in {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+    return write_report(report, args['output'])
+
+
+def write_report(report: Dict[str, Any], output: Optional[str]) -> int:
+    """Write the JSON results to a file, or print them; returns the exit code."""
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Benchmark results written to {output}")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+# filepath: d:\GitHub\WordcloudSR\corpus.py
+"""
+Corpus: Input Scanner for Directories, Compressed Files and Archives
+
+This module finds the collections of an input directory and streams the
+text of their documents. A collection is what one word cloud and one CSV
+are made from: a directory, or a ``.zip``/``.tar``/``.tar.gz`` archive.
+Documents are ``.txt`` files, also gzip-compressed (``.txt.gz``) and also
+inside archives, which are read member by member without extracting them
+to disk.
+
+By default every nested directory is a collection of its own files, as in
+earlier versions. With a collection depth, only the directories (and
+archives) at that depth below the input directory are collections, and all
+documents below them are read. Include and exclude glob patterns select
+documents and skip directories.
+
+Directories are listed with ``os.scandir``; symlinked directories are not
+followed (as with ``os.walk``), and entries that cannot be read are reported
+and skipped. Documents are read in blocks of
+bounded size, and large plain files are memory-mapped. Blocks are cut on
+UTF-8 character boundaries and passed on at sentence ends (or at least
+between words), so no document has to fit in memory at once. Invalid UTF-8
+is replaced and reported per block rather than skipping the document.
+
+Author: Unknown
+Date: October 16, 2026
+"""
+
+import os
+import re
+import gzip
+import time
+import fnmatch
+import logging
+import mmap
+import tarfile
+import zipfile
+from typing import Any, BinaryIO, Callable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Documents read by default
+DEFAULT_INCLUDE = ('*.txt', '*.txt.gz')
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+# Bytes read from a document per call
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+# Plain files at least this large are memory-mapped instead of read
+MMAP_THRESHOLD = 64 << 20
+
+# Terminal punctuation followed by whitespace, as in utils.split_sentences
+_SENTENCE_END = re.compile(r'[.!?\u2026]\s+')
+
+# Characters searched backwards for a sentence end before a block is cut
+_CUT_WINDOW = 64 * 1024
+
+_READ_ERRORS = (OSError, EOFError, UnicodeDecodeError, zipfile.BadZipFile, tarfile.TarError)
+
+
+def is_archive(name: str) -> bool:
+    """Check whether a file name is that of a supported archive."""
+    return name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _matches(name: str, patterns: Sequence[str]) -> bool:
+    """Match a relative path, or its last component, against glob patterns."""
+    base = name.rsplit('/', 1)[-1]
+    return any(fnmatch.fnmatchcase(name, pattern) or fnmatch.fnmatchcase(base, pattern)
+               for pattern in patterns)
+
+
+def utf8_boundary(data: Any, start: int, end: int) -> int:
+    """
+    Move the end of a block back so that it does not split a UTF-8 character.
+
+    Args:
+        data (Any): Bytes-like buffer (``bytes`` or ``mmap``).
+        start (int): Start of the block.
+        end (int): Proposed end of the block.
+
+    Returns:
+        int: ``end``, or the start of an incomplete character at the end of the
+        block; never ``start`` unless the block is empty.
+    """
+    for position in range(end - 1, max(start, end - 4) - 1, -1):
+        byte = data[position]
+        if byte & 0xC0 != 0x80:
+            # ASCII or the lead byte of a character: does the character fit?
+            length = 1 if byte < 0xC0 else 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+            if position + length > end and position > start:
+                return position
+            return end
+    return end
+
+
+def safe_cut(text: str) -> int:
+    """
+    Find where a block of text can be cut without splitting a sentence or word.
+
+    Args:
+        text (str): Decoded text whose end may be incomplete.
+
+    Returns:
+        int: Length of the prefix that ends after a sentence (or at least after
+        whitespace); 0 if there is no such place.
+    """
+    last = None
+    for last in _SENTENCE_END.finditer(text, max(0, len(text) - _CUT_WINDOW)):
+        pass
+    if last is not None:
+        return last.end()
+    # No sentence end nearby: cut after the last whitespace instead
+    tail = text[-_CUT_WINDOW:]
+    if tail[-1:].isspace():
+        return len(text)
+    last_word = tail.rsplit(None, 1)[-1] if tail.strip() else tail
+    return len(text) - len(last_word) if len(last_word) < len(tail) else 0
+
+
+class Collection(str):
+    """
+    Path of a collection (a directory or an archive) together with its scan options.
+
+    It is a ``str``, so it can be passed wherever a directory path is expected,
+    and it survives pickling to worker processes.
+    """
+
+    def __new__(cls, path: str, recursive: bool = False,
+                include: Optional[Sequence[str]] = None,
+                exclude: Optional[Sequence[str]] = None) -> "Collection":
+        """
+        Args:
+            path (str): Directory or archive.
+            recursive (bool): Also read the documents of nested directories.
+            include (Optional[Sequence[str]]): Glob patterns of documents to read;
+                defaults to ``DEFAULT_INCLUDE``.
+            exclude (Optional[Sequence[str]]): Glob patterns of documents and
+                directories to skip.
+        """
+        collection = super().__new__(cls, path)
+        collection.recursive = recursive
+        collection.include = tuple(include or DEFAULT_INCLUDE)
+        collection.exclude = tuple(exclude or ())
+        return collection
+
+
+class Document:
+    """
+    A text document: a plain or gzip-compressed file, or an archive member.
+    """
+
+    def __init__(self, path: str, name: str, size: int, mtime_ns: int,
+                 opener: Callable[[], BinaryIO], file_path: Optional[str] = None):
+        """
+        Args:
+            path (str): Path for messages; archive members are shown below the archive.
+            name (str): Path relative to the collection, with ``/`` separators.
+            size (int): Size in bytes, as stored (compressed for ``.gz`` files).
+            mtime_ns (int): Modification time in nanoseconds.
+            opener (Callable[[], BinaryIO]): Opens the raw stored bytes.
+            file_path (Optional[str]): The file, for uncompressed files on disk, which
+                can then be memory-mapped.
+        """
+        self.path = path
+        self.name = name
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self._opener = opener
+        self.file_path = file_path
+        self.decode_errors = 0
+
+    def open(self) -> BinaryIO:
+        """Open the document as a binary stream, decompressing ``.gz`` files."""
+        stream = self._opener()
+        if self.name.lower().endswith('.gz'):
+            return gzip.GzipFile(fileobj=stream, mode='rb')
+        return stream
+
+    def read_bytes(self) -> bytes:
+        """Return the whole (decompressed) content."""
+        with self.open() as stream:
+            return stream.read()
+
+    def _iter_blocks(self, block_size: int) -> Iterator[Tuple[int, bytes]]:
+        """Yield (offset, bytes) blocks that end on a UTF-8 character boundary."""
+        if self.file_path is not None and self.size >= MMAP_THRESHOLD:
+            # Large plain files are mapped, so only the current block is ever copied
+            with open(self.file_path, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mapped, 'madvise'):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                start, size = 0, len(mapped)
+                while start < size:
+                    end = min(size, start + block_size)
+                    if end < size:
+                        end = utf8_boundary(mapped, start, end)
+                    yield start, mapped[start:end]
+                    if hasattr(mapped, 'madvise'):
+                        # Release the pages already decoded
+                        done = end - end % mmap.PAGESIZE
+                        if done:
+                            mapped.madvise(mmap.MADV_DONTNEED, 0, done)
+                    start = end
+            return
+
+        offset = 0
+        pending = b''
+        with self.open() as stream:
+            while True:
+                block = stream.read(block_size)
+                if not block:
+                    break
+                data = pending + block
+                end = utf8_boundary(data, 0, len(data))
+                pending = data[end:]
+                if end:
+                    yield offset, data[:end]
+                    offset += end
+        if pending:
+            yield offset, pending
+
+    def decode(self, data: bytes, offset: int = 0) -> str:
+        """Decode one block, replacing invalid bytes and reporting them."""
+        try:
+            return data.decode('utf-8')
+        except UnicodeDecodeError as e:
+            self.decode_errors += 1
+            logger.warning(f"Invalid UTF-8 in {self.path} at byte {offset + e.start} "
+                           f"(block {offset}-{offset + len(data)}), replacing undecodable bytes")
+            return data.decode('utf-8', errors='replace')
+
+    def iter_text(self, block_size: int = DEFAULT_BLOCK_SIZE,
+                  on_block: Optional[Callable[[int], None]] = None,
+                  hasher: Optional[Any] = None) -> Iterator[str]:
+        """
+        Decode the document as UTF-8 in pieces of about ``block_size`` bytes.
+
+        Blocks are cut on character boundaries, and pieces end at a sentence end
+        where possible, never inside a word unless a single word is longer than
+        a block; such a word is cut at the end of the block, so a piece never
+        grows beyond about two blocks. Plain files of at least ``MMAP_THRESHOLD``
+        bytes are memory-mapped. Invalid bytes are replaced and reported per
+        block (see ``decode_errors``) instead of failing the whole document.
+
+        Args:
+            block_size (int): Bytes read per call.
+            on_block (Optional[Callable[[int], None]]): Called with the size of every block.
+            hasher (Optional[Any]): ``hashlib`` object updated with the raw bytes of
+                every block, so the content digest is known once the text is read.
+
+        Yields:
+            str: Consecutive pieces of the text.
+        """
+        carry = ''
+        for offset, data in self._iter_blocks(block_size):
+            if on_block is not None:
+                on_block(len(data))
+            if hasher is not None:
+                hasher.update(data)
+            text = carry + self.decode(data, offset)
+            cut = safe_cut(text)
+            if not cut and len(text) >= block_size:
+                # No whitespace near the end: cut the word rather than carry it on
+                cut = len(text)
+            if cut:
+                yield text[:cut]
+            carry = text[cut:]
+        if carry:
+            yield carry
+
+
+def _list_directory(path: str, nested: bool) -> List[os.DirEntry]:
+    """
+    List a directory sorted by name.
+
+    A nested directory that cannot be listed is reported and read as empty;
+    the collection or input directory itself must be readable.
+    """
+    try:
+        with os.scandir(path) as scan:
+            return sorted(scan, key=lambda entry: entry.name)
+    except OSError as e:
+        if not nested:
+            raise
+        logger.warning(f"Could not list directory {path}: {e}")
+        return []
+
+
+def _is_directory(entry: os.DirEntry) -> bool:
+    """Check for a directory without following symlinks, so a link cycle is never entered."""
+    try:
+        return entry.is_dir(follow_symlinks=False)
+    except OSError as e:
+        logger.warning(f"Could not read {entry.path}: {e}")
+        return False
+
+
+def _file_document(path: str, name: str, entry: os.DirEntry) -> Optional[Document]:
+    try:
+        stat = entry.stat()
+    except OSError as e:
+        logger.warning(f"Could not read file {path}: {e}")
+        return None
+    mappable = path if not name.lower().endswith('.gz') else None
+    return Document(path, name, stat.st_size, stat.st_mtime_ns, lambda: open(path, 'rb'), mappable)
+
+
+def _zip_documents(path: str, prefix: str, include: Sequence[str],
+                   exclude: Sequence[str]) -> Iterator[Document]:
+    with zipfile.ZipFile(path) as archive:
+        for info in sorted(archive.infolist(), key=lambda info: info.filename):
+            name = prefix + info.filename
+            if info.is_dir() or not _matches(name, include) or _matches(name, exclude):
+                continue
+            mtime_ns = int(time.mktime(info.date_time + (0, 0, -1)) * 1e9)
+            yield Document(os.path.join(path, info.filename), name, info.compress_size, mtime_ns,
+                           lambda info=info: archive.open(info))
+
+
+def _tar_documents(path: str, prefix: str, include: Sequence[str],
+                   exclude: Sequence[str]) -> Iterator[Document]:
+    # Stream mode reads the archive front to back, so each member must be
+    # consumed before the next one is requested
+    with tarfile.open(path, 'r|*') as archive:
+        for member in archive:
+            name = prefix + member.name
+            if not member.isfile() or not _matches(name, include) or _matches(name, exclude):
+                continue
+            yield Document(os.path.join(path, member.name), name, member.size,
+                           int(member.mtime * 1e9), lambda member=member: archive.extractfile(member))
+
+
+def _archive_documents(path: str, prefix: str, include: Sequence[str],
+                       exclude: Sequence[str]) -> Iterator[Document]:
+    """Yield the matching members of an archive; unreadable archives are skipped."""
+    reader = _zip_documents if path.lower().endswith('.zip') else _tar_documents
+    try:
+        yield from reader(path, prefix, include, exclude)
+    except (OSError, EOFError, zipfile.BadZipFile, tarfile.TarError) as e:
+        logger.warning(f"Could not read archive {path}: {e}")
+
+
+def _directory_documents(path: str, prefix: str, recursive: bool, include: Sequence[str],
+                         exclude: Sequence[str]) -> Iterator[Document]:
+    for entry in _list_directory(path, bool(prefix)):
+        name = prefix + entry.name
+        if _matches(name, exclude):
+            continue
+        if _is_directory(entry):
+            if recursive:
+                yield from _directory_documents(entry.path, name + '/', recursive, include, exclude)
+        elif is_archive(entry.name):
+            yield from _archive_documents(entry.path, name + '/', include, exclude)
+        elif _matches(name, include):
+            document = _file_document(entry.path, name, entry)
+            if document is not None:
+                yield document
+
+
+def iter_documents(collection: str) -> Iterator[Document]:
+    """
+    Yield the documents of a collection in a deterministic order.
+
+    Args:
+        collection (str): A directory or archive path, or a :class:`Collection`
+            carrying scan options. A plain directory path reads only the
+            directory's own files (and archives), like earlier versions.
+
+    Yields:
+        Document: Documents; those of tar archives must be read before the next is requested.
+    """
+    include = getattr(collection, 'include', DEFAULT_INCLUDE)
+    exclude = getattr(collection, 'exclude', ())
+    if os.path.isfile(collection):
+        yield from _archive_documents(str(collection), '', include, exclude)
+    else:
+        yield from _directory_documents(str(collection), '', getattr(collection, 'recursive', False),
+                                        include, exclude)
+
+
+def iter_collection_text(collection: str, block_size: int = DEFAULT_BLOCK_SIZE,
+                         on_document: Optional[Callable[[Document], None]] = None,
+                         on_block: Optional[Callable[[int], None]] = None) -> Iterator[str]:
+    """
+    Stream the text of all documents of a collection in bounded pieces.
+
+    Args:
+        collection (str): Directory, archive or :class:`Collection`.
+        block_size (int): Bytes read per call.
+        on_document (Optional[Callable[[Document], None]]): Called for every document
+            that is read.
+        on_block (Optional[Callable[[int], None]]): Called with the size of every block
+            read, e.g. to report progress within a large document.
+
+    Yields:
+        str: Pieces of text; a piece never spans two documents.
+    """
+    count = 0
+    for document in iter_documents(collection):
+        try:
+            for piece in document.iter_text(block_size, on_block):
+                yield piece
+        except _READ_ERRORS as e:
+            logger.warning(f"Could not read file {document.path}: {e}")
+            continue
+        count += 1
+        if on_document is not None:
+            on_document(document)
+    logger.info(f"Processed {count} text files from {collection}")
+
+
+def scan_collections(input_dir: str, depth: Optional[int] = None,
+                     include: Optional[Sequence[str]] = None,
+                     exclude: Optional[Sequence[str]] = None) -> List[str]:
+    """
+    Find the collections of an input directory, in a deterministic order.
+
+    Args:
+        input_dir (str): Root input directory.
+        depth (Optional[int]): Level of the collections below ``input_dir`` (1 for its
+            children); their nested directories are read as part of them. None makes
+            every nested directory a collection of its own files.
+        include (Optional[Sequence[str]]): Glob patterns of documents to read.
+        exclude (Optional[Sequence[str]]): Glob patterns of documents and directories to skip.
+
+    Returns:
+        List[str]: :class:`Collection` paths of directories and archives.
+    """
+    if depth is not None and depth < 1:
+        raise ValueError(f"Collection depth must be at least 1, got {depth}")
+    exclude = tuple(exclude or ())
+    collections: List[str] = []
+
+    def visit(path: str, prefix: str, level: int) -> None:
+        for entry in _list_directory(path, level > 1):
+            name = prefix + entry.name
+            if _matches(name, exclude):
+                continue
+            if _is_directory(entry):
+                if depth is None:
+                    collections.append(Collection(entry.path, False, include, exclude))
+                    visit(entry.path, name + '/', level + 1)
+                elif level == depth:
+                    collections.append(Collection(entry.path, True, include, exclude))
+                else:
+                    visit(entry.path, name + '/', level + 1)
+            elif is_archive(entry.name) and level == (depth or 1):
+                # Deeper archives are read as part of the collection that contains them
+                collections.append(Collection(entry.path, False, include, exclude))
+
+    visit(input_dir, '', 1)
+    return collections
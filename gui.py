@@ -3,34 +3,50 @@
 Simple Tkinter GUI for WordcloudSR.
 """
 import tkinter as tk
-from tkinter import filedialog, messagebox, scrolledtext
+from tkinter import filedialog, messagebox, scrolledtext, ttk
 from threading import Thread
+from typing import Any, Dict, Optional
 
+from progress import CancellationToken, Progress
+from utils import parse_arguments, setup_logging
 from wordcloudsr import process_files
 
 
+def format_progress(progress: Progress) -> str:
+    """Describe throughput and time left for the progress line."""
+    text = (f"{progress.directories_done}/{progress.directories_total} directories, "
+            f"{progress.bytes_per_second / 1e6:.2f} MB/s, "
+            f"{progress.tokens_per_second:,.0f} tokens/s")
+    if progress.eta_seconds is not None and progress.directories_done < progress.directories_total:
+        text += f", about {progress.eta_seconds:.0f}s left"
+    if progress.directory and progress.stage != 'done':
+        text += f" ({progress.stage} {progress.directory})"
+    return text
+
+
 class WordcloudGUI:
     """Simple Tkinter interface for WordcloudSR."""
 
-    def __init__(self, master: tk.Tk) -> None:
+    def __init__(self, master: tk.Tk, args: Optional[Dict[str, Any]] = None) -> None:
         self.master = master
+        self.args = args or {}
         master.title("WordcloudSR GUI")
 
         # Input directory
         tk.Label(master, text="Input Directory:").grid(row=0, column=0, sticky="w")
-        self.input_var = tk.StringVar(value="input")
+        self.input_var = tk.StringVar(value=self.args.get('input', "input"))
         tk.Entry(master, textvariable=self.input_var, width=40).grid(row=0, column=1, padx=5)
         tk.Button(master, text="Browse", command=self.browse_input).grid(row=0, column=2)
 
         # Output directory
         tk.Label(master, text="Output Directory:").grid(row=1, column=0, sticky="w")
-        self.output_var = tk.StringVar(value="output")
+        self.output_var = tk.StringVar(value=self.args.get('output', "output"))
         tk.Entry(master, textvariable=self.output_var, width=40).grid(row=1, column=1, padx=5)
         tk.Button(master, text="Browse", command=self.browse_output).grid(row=1, column=2)
 
         # Stopwords file
         tk.Label(master, text="Stopwords File:").grid(row=2, column=0, sticky="w")
-        self.stopwords_var = tk.StringVar(value="stopwords.txt")
+        self.stopwords_var = tk.StringVar(value=self.args.get('stopwords', "stopwords.txt"))
         tk.Entry(master, textvariable=self.stopwords_var, width=40).grid(row=2, column=1, padx=5)
         tk.Button(master, text="Browse", command=self.browse_stopwords).grid(row=2, column=2)
 
@@ -38,12 +54,30 @@ class WordcloudGUI:
         self.collocations_var = tk.BooleanVar(value=True)
         tk.Checkbutton(master, text="Include Collocations", variable=self.collocations_var).grid(row=3, columnspan=3, pady=(5, 5), sticky="w")
 
-        # Run button
-        tk.Button(master, text="Process Files", command=self.run_process).grid(row=4, columnspan=3, pady=(5, 5))
+        # Profiling checkboxes, preset by --profile and --profile-memory
+        self.profile_var = tk.BooleanVar(value=bool(self.args.get('profile')))
+        tk.Checkbutton(master, text="Profile Run", variable=self.profile_var).grid(row=4, column=0, sticky="w")
+        self.profile_memory_var = tk.BooleanVar(value=bool(self.args.get('profile_memory')))
+        tk.Checkbutton(master, text="Profile Memory", variable=self.profile_memory_var).grid(row=4, column=1, sticky="w")
+
+        # Run and cancel buttons
+        buttons = tk.Frame(master)
+        buttons.grid(row=5, columnspan=3, pady=(5, 5))
+        self.run_button = tk.Button(buttons, text="Process Files", command=self.run_process)
+        self.run_button.pack(side="left", padx=5)
+        self.cancel_button = tk.Button(buttons, text="Cancel", command=self.cancel_process, state="disabled")
+        self.cancel_button.pack(side="left", padx=5)
+        self.cancel_token: Optional[CancellationToken] = None
+
+        # Progress bar and throughput
+        self.progress_bar = ttk.Progressbar(master, orient="horizontal", mode="determinate", maximum=1.0)
+        self.progress_bar.grid(row=6, columnspan=3, sticky="we", padx=5)
+        self.progress_var = tk.StringVar(value="")
+        tk.Label(master, textvariable=self.progress_var, anchor="w").grid(row=7, columnspan=3, sticky="w", padx=5)
 
         # Status area
         self.status = scrolledtext.ScrolledText(master, width=60, height=10, state="disabled")
-        self.status.grid(row=5, columnspan=3, pady=(5, 0))
+        self.status.grid(row=8, columnspan=3, pady=(5, 0))
 
     def browse_input(self) -> None:
         directory = filedialog.askdirectory()
@@ -61,24 +95,63 @@ class WordcloudGUI:
             self.stopwords_var.set(file_path)
 
     def run_process(self) -> None:
-        Thread(target=self._process).start()
-
-    def _process(self) -> None:
+        self.cancel_token = CancellationToken()
+        self.run_button.configure(state="disabled")
+        self.cancel_button.configure(state="normal")
+        self.progress_bar["value"] = 0
+        self.progress_var.set("")
+        Thread(target=self._process, args=(self.cancel_token,)).start()
+
+    def cancel_process(self) -> None:
+        """Stop the running job after the current chunk, keeping finished directories."""
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+            self.cancel_button.configure(state="disabled")
+            self.append_status("Cancelling...\n")
+
+    def _process(self, cancel: CancellationToken) -> None:
         self.append_status("Processing started...\n")
+        profile_dir = None
+        if self.profile_var.get():
+            profile_dir = self.args.get('profile') or "profile"
         try:
             results = process_files(
                 collocations=self.collocations_var.get(),
                 input_dir=self.input_var.get(),
                 output_dir=self.output_var.get(),
                 stopwords_file=self.stopwords_var.get(),
+                profile_dir=profile_dir,
+                profile_memory=self.profile_memory_var.get(),
+                progress=self.show_progress,
+                cancel=cancel,
             )
-            if results:
+            if profile_dir:
+                self.append_status(f"Profiles written to {profile_dir}\n")
+            if results.cancelled:
+                self.append_status(f"Cancelled. Kept the results of {len(results)} directories.\n")
+            elif results:
                 self.append_status(f"Completed. Processed {len(results)} directories.\n")
             else:
                 self.append_status("No results generated.\n")
         except Exception as e:
             messagebox.showerror("Error", str(e))
             self.append_status(f"Error: {e}\n")
+        finally:
+            self.master.after(0, self._finish_process)
+
+    def _finish_process(self) -> None:
+        self.run_button.configure(state="normal")
+        self.cancel_button.configure(state="disabled")
+
+    def show_progress(self, progress: Progress) -> None:
+        """Show a progress update from the processing thread."""
+        text = format_progress(progress)
+
+        def _show() -> None:
+            self.progress_bar["value"] = progress.fraction
+            self.progress_var.set(text)
+
+        self.master.after(0, _show)
 
     def append_status(self, text: str) -> None:
         """Safely append status text from any thread."""
@@ -94,8 +167,10 @@ class WordcloudGUI:
 
 
 def main() -> None:
+    args = parse_arguments()
+    setup_logging(args['debug'])
     root = tk.Tk()
-    app = WordcloudGUI(root)
+    app = WordcloudGUI(root, args)
     root.mainloop()
 
 
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# filepath: d:\GitHub\WordcloudSR\lemma_cache.py
+"""
+LemmaCache: Persistent On-Disk Lemma Cache
+
+This module provides a SQLite-backed cache that maps sentences to their
+lemmatized form. Repeated runs over a mostly unchanged corpus only send
+unseen sentences to TreeTagger. Entries are evicted in least-recently-used
+order once the configured size limit is reached, and the whole cache is
+invalidated when the TreeTagger parameter file changes.
+
+Author: Unknown
+Date: October 16, 2026
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1000000
+
+# SQLite limits the number of host parameters in a single statement
+_QUERY_BATCH = 500
+
+
+def hash_model_file(model_path: str) -> str:
+    """
+    Compute a SHA-256 digest of a TreeTagger parameter file.
+
+    Args:
+        model_path (str): Path to the parameter file.
+
+    Returns:
+        str: Hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(model_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _key(segment: str) -> bytes:
+    return hashlib.sha1(segment.encode('utf-8')).digest()
+
+
+class LemmaCache:
+    """
+    A persistent sentence → lemmas cache stored in SQLite.
+
+    The cache is safe to share between threads of one process, and several
+    processes may open the same file concurrently.
+    """
+
+    def __init__(self, path: str, model_path: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Open (or create) a lemma cache.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            model_path (str): TreeTagger parameter file the cached lemmas were produced with.
+            max_entries (int): Maximum number of cached sentences kept on disk.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key BLOB PRIMARY KEY, lemmas TEXT NOT NULL, last_used INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)"
+            )
+        self._check_model(hash_model_file(model_path))
+        self._size = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        logger.info(f"Opened lemma cache {path} with {self._size} entries")
+
+    def _check_model(self, model_hash: str) -> None:
+        """Drop all entries if they were produced by a different parameter file."""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'model_hash'").fetchone()
+        if row and row[0] == model_hash:
+            return
+        with self._conn:
+            if row:
+                logger.info("TreeTagger parameter file changed, invalidating lemma cache")
+                self._conn.execute("DELETE FROM entries")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('model_hash', ?)",
+                (model_hash,)
+            )
+
+    def get_many(self, segments: List[str]) -> List[Optional[str]]:
+        """
+        Look up the lemmatized form of several segments.
+
+        Args:
+            segments (List[str]): Segments (usually sentences) to look up.
+
+        Returns:
+            List[Optional[str]]: Cached lemmas for each segment, or None on a miss.
+        """
+        keys = [_key(s) for s in segments]
+        found: Dict[bytes, str] = {}
+        with self._lock:
+            for start in range(0, len(keys), _QUERY_BATCH):
+                batch = list(set(keys[start:start + _QUERY_BATCH]))
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, lemmas FROM entries WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time_ns()
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE entries SET last_used = ? WHERE key = ?",
+                        [(now, k) for k in found]
+                    )
+
+            results = [found.get(k) for k in keys]
+            hits = sum(1 for r in results if r is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        """
+        Store lemmatized segments, evicting the least recently used entries if needed.
+
+        Args:
+            items (Iterable[Tuple[str, str]]): (segment, lemmas) pairs.
+        """
+        now = time.time_ns()
+        rows = [(_key(segment), lemmas, now) for segment, lemmas in items]
+        if not rows:
+            return
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.executemany(
+                    "INSERT OR IGNORE INTO entries (key, lemmas, last_used) VALUES (?, ?, ?)", rows
+                )
+                self._size += max(cursor.rowcount, 0)
+                if self._size > self.max_entries:
+                    self._evict()
+
+    def _evict(self) -> None:
+        """Remove least recently used entries until the cache fits its size limit."""
+        # Other processes may have written to the file, so re-count before evicting
+        self._size = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        excess = self._size - self.max_entries
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM entries WHERE key IN "
+            "(SELECT key FROM entries ORDER BY last_used ASC LIMIT ?)",
+            (excess,)
+        )
+        self._size -= excess
+        logger.debug(f"Evicted {excess} entries from lemma cache")
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return hit/miss counters for this cache instance.
+
+        Returns:
+            Dict[str, float]: Hits, misses, hit rate and current number of entries.
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': self._size,
+        }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "LemmaCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
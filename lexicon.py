@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+# filepath: d:\GitHub\WordcloudSR\lexicon.py
+"""
+Lexicon: In-Process Lemmatizer Backed by TreeTagger Output
+
+This module builds a form → lemma lexicon from previously tagged text and
+uses it as a lemmatizer backend. Word forms that TreeTagger has always
+lemmatized the same way are resolved in memory; unknown and ambiguous forms
+are still sent to TreeTagger. An agreement report compares the result with
+full TreeTagger output, so the speed/accuracy trade-off can be checked on
+real data.
+
+Large lexicons can be compiled into a compact binary file that is memory-mapped
+read-only. Lookups binary-search the mapped tables directly, so nothing is
+deserialized at startup and worker processes share the pages through the OS
+page cache.
+
+Usage:
+    python lexicon.py build --input input --output lexicon.tsv
+    python lexicon.py build --tagged treetagger_output.txt --output lexicon.tsv
+    python lexicon.py compile --lexicon lexicon.tsv --output lexicon.bin
+    python lexicon.py agreement --input input --lexicon lexicon.bin
+
+Author: Unknown
+Date: October 16, 2026
+"""
+
+import re
+import sys
+import mmap
+import array
+import struct
+import difflib
+import hashlib
+import logging
+import argparse
+import collections
+from collections.abc import Mapping as MappingABC
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+from SerbianTagger import LemmatizerBackend, DEFAULT_BATCH_CHARS
+from lemma_cache import hash_model_file
+from utils import iter_text_files, list_input_directories, setup_logging, split_sentences
+
+logger = logging.getLogger(__name__)
+
+# Approximation of the TreeTagger tokenizer: words (with inner hyphens and
+# apostrophes) and single punctuation characters
+_TOKEN = re.compile(r"\w+(?:[-'’]\w+)*|[^\w\s]")
+
+# Compact lexicon file: magic, form count, lemma count, then little-endian
+# uint32 tables (form offsets, lemma id per form, lemma offsets) followed by
+# the UTF-8 form and lemma blobs. Forms are sorted by their UTF-8 bytes and
+# every distinct lemma is stored once.
+_COMPACT_MAGIC = b'WCSRLEX1'
+_COMPACT_HEADER = struct.Struct('<8sII')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into tokens roughly the way the TreeTagger tokenizer does.
+
+    Args:
+        text (str): Text to tokenize.
+
+    Returns:
+        List[str]: Tokens in order.
+    """
+    return _TOKEN.findall(text)
+
+
+class Lexicon:
+    """
+    Observed form → lemma counts collected from TreeTagger output.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, collections.Counter] = collections.defaultdict(collections.Counter)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, form: str, lemma: str, count: int = 1) -> None:
+        """Record that TreeTagger lemmatized ``form`` as ``lemma``."""
+        self._entries[form][lemma] += count
+
+    def update_from_tags(self, tags: Iterable[Tuple[str, str, str]]) -> None:
+        """
+        Record (word, POS, lemma) triples, e.g. from :meth:`SrbTreeTagger.tag`.
+
+        Args:
+            tags (Iterable[Tuple[str, str, str]]): Tagged tokens.
+        """
+        for word, _, lemma in tags:
+            self.add(word, lemma)
+
+    @classmethod
+    def from_tagged_file(cls, path: str) -> "Lexicon":
+        """
+        Build a lexicon from a TreeTagger output file with ``word<TAB>POS<TAB>lemma`` lines.
+
+        Args:
+            path (str): Path to the tagged file.
+
+        Returns:
+            Lexicon: The collected lexicon.
+        """
+        lexicon = cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) == 3:
+                    lexicon.add(parts[0], parts[2])
+        return lexicon
+
+    @classmethod
+    def load(cls, path: str) -> "Lexicon":
+        """
+        Load a lexicon saved with :meth:`save`.
+
+        Args:
+            path (str): Path to the ``form<TAB>lemma<TAB>count`` file.
+
+        Returns:
+            Lexicon: The loaded lexicon.
+        """
+        lexicon = cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                form, lemma, count = line.rstrip('\n').split('\t')
+                lexicon.add(form, lemma, int(count))
+        return lexicon
+
+    def save(self, path: str) -> None:
+        """
+        Save the lexicon as a sorted ``form<TAB>lemma<TAB>count`` file.
+
+        Args:
+            path (str): Output path.
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            for form in sorted(self._entries):
+                for lemma, count in sorted(self._entries[form].items()):
+                    f.write(f"{form}\t{lemma}\t{count}\n")
+
+    def save_compact(self, path: str, min_count: int = 1) -> int:
+        """
+        Save the unambiguous forms as a compact, memory-mappable lexicon file.
+
+        Args:
+            path (str): Output path.
+            min_count (int): Minimum number of observations of a form.
+
+        Returns:
+            int: Number of forms written.
+        """
+        return write_compact_lexicon(self.unambiguous(min_count), path)
+
+    def unambiguous(self, min_count: int = 1) -> Dict[str, str]:
+        """
+        Return the forms that were always lemmatized the same way.
+
+        Args:
+            min_count (int): Minimum number of observations of a form.
+
+        Returns:
+            Dict[str, str]: Mapping from form to its only lemma.
+        """
+        return {
+            form: next(iter(lemmas))
+            for form, lemmas in self._entries.items()
+            if len(lemmas) == 1 and sum(lemmas.values()) >= min_count
+        }
+
+
+def _uint32_table(values: Iterable[int]) -> bytes:
+    table = array.array('I', values)
+    if sys.byteorder != 'little':
+        table.byteswap()
+    return table.tobytes()
+
+
+def write_compact_lexicon(forms: Mapping[str, str], path: str) -> int:
+    """
+    Write a form → lemma mapping as a compact lexicon file.
+
+    Args:
+        forms (Mapping[str, str]): Form → lemma mapping.
+        path (str): Output path.
+
+    Returns:
+        int: Number of forms written.
+    """
+    entries = sorted((form.encode('utf-8'), lemma) for form, lemma in forms.items() if form)
+    lemma_ids: Dict[str, int] = {}
+    form_offsets, form_lemmas = [0], []
+    for form, lemma in entries:
+        form_offsets.append(form_offsets[-1] + len(form))
+        form_lemmas.append(lemma_ids.setdefault(lemma, len(lemma_ids)))
+    lemma_blobs = [lemma.encode('utf-8') for lemma in lemma_ids]
+    lemma_offsets = [0]
+    for lemma in lemma_blobs:
+        lemma_offsets.append(lemma_offsets[-1] + len(lemma))
+
+    with open(path, 'wb') as f:
+        f.write(_COMPACT_HEADER.pack(_COMPACT_MAGIC, len(entries), len(lemma_ids)))
+        f.write(_uint32_table(form_offsets))
+        f.write(_uint32_table(form_lemmas))
+        f.write(_uint32_table(lemma_offsets))
+        for form, _ in entries:
+            f.write(form)
+        for lemma in lemma_blobs:
+            f.write(lemma)
+    return len(entries)
+
+
+def is_compact_lexicon(path: str) -> bool:
+    """Return True if ``path`` is a compact lexicon file."""
+    with open(path, 'rb') as f:
+        return f.read(len(_COMPACT_MAGIC)) == _COMPACT_MAGIC
+
+
+class CompactLexicon(MappingABC):
+    """
+    Read-only form → lemma mapping backed by a memory-mapped compact lexicon file.
+
+    Lookups binary-search the sorted form table in place; only the looked up
+    form and lemma are decoded.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Compact lexicon file written by :func:`write_compact_lexicon`.
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._size, lemma_count = _COMPACT_HEADER.unpack_from(self._mmap, 0)
+        if magic != _COMPACT_MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a compact lexicon file")
+
+        position = _COMPACT_HEADER.size
+        self._form_offsets, position = self._table(position, self._size + 1)
+        self._form_lemmas, position = self._table(position, self._size)
+        self._lemma_offsets, position = self._table(position, lemma_count + 1)
+        self._forms_start = position
+        self._lemmas_start = position + self._form_offsets[self._size]
+
+    def _table(self, position: int, length: int) -> Tuple[Union[memoryview, array.array], int]:
+        """Map a uint32 table without copying it on little-endian machines."""
+        end = position + 4 * length
+        if sys.byteorder == 'little':
+            return memoryview(self._mmap)[position:end].cast('I'), end
+        table = array.array('I', self._mmap[position:end])
+        table.byteswap()
+        return table, end
+
+    def _form(self, index: int) -> bytes:
+        start = self._forms_start + self._form_offsets[index]
+        return self._mmap[start:self._forms_start + self._form_offsets[index + 1]]
+
+    def _lemma(self, lemma_id: int) -> str:
+        start = self._lemmas_start + self._lemma_offsets[lemma_id]
+        end = self._lemmas_start + self._lemma_offsets[lemma_id + 1]
+        return self._mmap[start:end].decode('utf-8')
+
+    def _find(self, form: str) -> int:
+        key = form.encode('utf-8')
+        low, high = 0, self._size
+        while low < high:
+            middle = (low + high) // 2
+            if self._form(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._size and self._form(low) == key:
+            return low
+        return -1
+
+    def __getitem__(self, form: str) -> str:
+        index = self._find(form)
+        if index < 0:
+            raise KeyError(form)
+        return self._lemma(self._form_lemmas[index])
+
+    def get(self, form: str, default: Optional[str] = None) -> Optional[str]:
+        index = self._find(form)
+        return default if index < 0 else self._lemma(self._form_lemmas[index])
+
+    def __contains__(self, form: object) -> bool:
+        return isinstance(form, str) and self._find(form) >= 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(self._size):
+            yield self._form(index).decode('utf-8')
+
+    def close(self) -> None:
+        """Unmap the lexicon file."""
+        if self._mmap.closed:
+            return
+        # Views into the mapping must be released before it can be closed
+        for table in (self._form_offsets, self._form_lemmas, self._lemma_offsets):
+            if isinstance(table, memoryview):
+                table.release()
+        self._mmap.close()
+
+
+class LexiconLemmatizer(LemmatizerBackend):
+    """
+    A lemmatizer that resolves known forms in memory and falls back to TreeTagger.
+
+    Sentences that contain unknown or ambiguous tokens are collected per call,
+    de-duplicated and sent to the fallback backend in a single batch, so the
+    fallback tags those tokens in their sentence context.
+    """
+
+    def __init__(self, lexicon: Mapping[str, str], fallback: LemmatizerBackend,
+                 lexicon_hash: Optional[str] = None):
+        """
+        Args:
+            lexicon (Mapping[str, str]): Unambiguous form → lemma mapping.
+            fallback (LemmatizerBackend): Backend used for all other tokens.
+            lexicon_hash (Optional[str]): Digest identifying the lexicon; computed
+                from its entries when needed if not given.
+        """
+        self.lexicon = lexicon
+        self.fallback = fallback
+        self.lexicon_hash = lexicon_hash
+        self.known_tokens = 0
+        self.unknown_tokens = 0
+
+    @classmethod
+    def from_file(cls, path: str, fallback: LemmatizerBackend,
+                  min_count: int = 1) -> "LexiconLemmatizer":
+        """
+        Create a lemmatizer from a lexicon file.
+
+        Compact lexicon files are memory-mapped; text files saved with
+        :meth:`Lexicon.save` are loaded into a dictionary.
+
+        Args:
+            path (str): Path to the lexicon file.
+            fallback (LemmatizerBackend): Backend used for unknown and ambiguous tokens.
+            min_count (int): Minimum number of observations of a form. Ignored for
+                compact files, which are filtered when they are compiled.
+
+        Returns:
+            LexiconLemmatizer: The lemmatizer.
+        """
+        if is_compact_lexicon(path):
+            lexicon = CompactLexicon(path)
+            logger.info(f"Mapped {len(lexicon)} unambiguous forms from {path}")
+        else:
+            lexicon = Lexicon.load(path).unambiguous(min_count)
+            logger.info(f"Loaded {len(lexicon)} unambiguous forms from {path}")
+        return cls(lexicon, fallback, f"{hash_model_file(path)}:{min_count}")
+
+    def lemmatize(self, text: str) -> Optional[str]:
+        """
+        Replace all words in a string with their lemmas.
+
+        Args:
+            text (str): The string to lemmatize.
+
+        Returns:
+            Optional[str]: The lemmatized string, or None if input is None.
+        """
+        if text is None:
+            return None
+        return self.lemmatize_many([text])[0]
+
+    def iter_lemmatize_many(self, texts: Iterable[Optional[str]],
+                            batch_chars: int = DEFAULT_BATCH_CHARS) -> Iterator[Optional[str]]:
+        """
+        Lemmatize documents in batches, resolving known tokens in memory.
+
+        Args:
+            texts (Iterable[Optional[str]]): Documents to lemmatize.
+            batch_chars (int): Approximate number of characters per batch.
+
+        Yields:
+            Optional[str]: Lemmatized documents in input order.
+        """
+        batch: List[Optional[str]] = []
+        batched = 0
+        for text in texts:
+            batch.append(text)
+            batched += len(text) if text else 0
+            if batched >= batch_chars:
+                yield from self._lemmatize_batch(batch)
+                batch, batched = [], 0
+        if batch:
+            yield from self._lemmatize_batch(batch)
+
+    def _lookup(self, token: str) -> Optional[str]:
+        lemma = self.lexicon.get(token)
+        if lemma is None and not token.islower():
+            lemma = self.lexicon.get(token.lower())
+        return lemma
+
+    def _lemmatize_batch(self, texts: List[Optional[str]]) -> List[Optional[str]]:
+        # Resolve tokens from the lexicon sentence by sentence. A sentence with an
+        # unknown or ambiguous token is sent to the fallback whole, so TreeTagger
+        # still sees the context of the tokens it has to decide.
+        lookups: Dict[str, Optional[str]] = {}
+        documents: List[Optional[List[Tuple[List[str], List[Optional[str]]]]]] = []
+        pending: Dict[str, Optional[str]] = {}
+        for text in texts:
+            if text is None:
+                documents.append(None)
+                continue
+            sentences = []
+            for sentence in split_sentences(text):
+                tokens = tokenize(sentence)
+                lemmas = []
+                for token in tokens:
+                    if token not in lookups:
+                        lookups[token] = self._lookup(token)
+                    lemmas.append(lookups[token])
+                if None in lemmas:
+                    pending[sentence] = None
+                sentences.append((sentence, tokens, lemmas))
+            documents.append(sentences)
+        if pending:
+            tagged = self.fallback.lemmatize_many(list(pending))
+            pending = dict(zip(pending, tagged))
+
+        results: List[Optional[str]] = []
+        for sentences in documents:
+            if sentences is None:
+                results.append(None)
+                continue
+            lemmatized = []
+            for sentence, tokens, lemmas in sentences:
+                if sentence not in pending:
+                    self.known_tokens += len(lemmas)
+                    lemmatized.extend(lemmas)
+                    continue
+                tagged_lemmas = (pending[sentence] or "").split()
+                if len(tagged_lemmas) != len(tokens):
+                    # TreeTagger split the sentence differently; keep its output as is
+                    self.unknown_tokens += len(tagged_lemmas)
+                    lemmatized.extend(tagged_lemmas)
+                    continue
+                for lemma, tagged_lemma in zip(lemmas, tagged_lemmas):
+                    if lemma is None:
+                        lemma = tagged_lemma
+                        self.unknown_tokens += 1
+                    else:
+                        self.known_tokens += 1
+                    lemmatized.append(lemma)
+            results.append(" ".join(lemmatized))
+        return results
+
+    def coverage(self) -> float:
+        """Return the share of tokens resolved from the lexicon so far."""
+        total = self.known_tokens + self.unknown_tokens
+        return self.known_tokens / total if total else 0.0
+
+    def model_key(self) -> str:
+        """Identify the lexicon together with the model of the fallback backend."""
+        if self.lexicon_hash is None:
+            digest = hashlib.sha256()
+            for form in sorted(self.lexicon):
+                digest.update(f"{form}\t{self.lexicon[form]}\n".encode('utf-8'))
+            self.lexicon_hash = digest.hexdigest()
+        return f"lexicon:{self.lexicon_hash}+{self.fallback.model_key()}"
+
+    def cache_stats(self) -> Optional[dict]:
+        return self.fallback.cache_stats()
+
+    def close(self) -> None:
+        logger.info(f"Lexicon resolved {self.coverage():.1%} of tokens without TreeTagger")
+        if isinstance(self.lexicon, CompactLexicon):
+            self.lexicon.close()
+        self.fallback.close()
+
+
+def agreement(texts: Iterable[str], lemmatizer: LexiconLemmatizer) -> Dict[str, float]:
+    """
+    Compare lexicon lemmatization with full TreeTagger output.
+
+    Tokens are aligned with a sequence matcher, so differences in tokenization
+    count as disagreements instead of shifting the rest of the text.
+
+    Args:
+        texts (Iterable[str]): Texts to compare on.
+        lemmatizer (LexiconLemmatizer): Lexicon lemmatizer; its fallback is used as reference.
+
+    Returns:
+        Dict[str, float]: Token counts, agreement rate and lexicon coverage.
+    """
+    reference_tokens = matching = 0
+    for text in texts:
+        reference = (lemmatizer.fallback.lemmatize(text) or "").split()
+        candidate = (lemmatizer.lemmatize(text) or "").split()
+        matcher = difflib.SequenceMatcher(None, reference, candidate, autojunk=False)
+        matching += sum(block.size for block in matcher.get_matching_blocks())
+        reference_tokens += len(reference)
+    return {
+        'tokens': reference_tokens,
+        'agreeing_tokens': matching,
+        'agreement_rate': matching / reference_tokens if reference_tokens else 0.0,
+        'lexicon_coverage': lemmatizer.coverage(),
+    }
+
+
+def _iter_corpus(input_dir: str) -> Iterable[str]:
+    for directory in list_input_directories(input_dir):
+        for _, text in iter_text_files(directory):
+            yield text
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Build a lexicon or report its agreement with TreeTagger."""
+    from SerbianTagger import SrbTreeTagger
+
+    parser = argparse.ArgumentParser(description='WordcloudSR - lemma lexicon tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='Build a lexicon from tagged text')
+    source = build.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', help='Input directory to tag with TreeTagger')
+    source.add_argument('--tagged', help='Existing TreeTagger output (word, POS, lemma per line)')
+    build.add_argument('--output', required=True, help='Lexicon file to write')
+
+    compile_ = subparsers.add_parser('compile', help='Compile a lexicon into the compact format')
+    compile_.add_argument('--lexicon', required=True, help='Lexicon file written by build')
+    compile_.add_argument('--output', required=True, help='Compact lexicon file to write')
+    compile_.add_argument('--min-count', type=int, default=1,
+                          help='Minimum observations of a form to include it (default: 1)')
+
+    check = subparsers.add_parser('agreement', help='Compare lexicon and TreeTagger lemmas')
+    check.add_argument('--input', required=True, help='Input directory with text files')
+    check.add_argument('--lexicon', required=True, help='Lexicon file')
+    check.add_argument('--min-count', type=int, default=1,
+                       help='Minimum observations of a form to trust it (default: 1)')
+
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    if args.command == 'build':
+        if args.tagged:
+            lexicon = Lexicon.from_tagged_file(args.tagged)
+        else:
+            lexicon = Lexicon()
+            with SrbTreeTagger() as tagger:
+                for text in _iter_corpus(args.input):
+                    lexicon.update_from_tags(tagger.tag(text))
+        lexicon.save(args.output)
+        print(f"Wrote {len(lexicon)} forms ({len(lexicon.unambiguous())} unambiguous) to {args.output}")
+        return 0
+
+    if args.command == 'compile':
+        count = Lexicon.load(args.lexicon).save_compact(args.output, args.min_count)
+        print(f"Wrote {count} unambiguous forms to {args.output}")
+        return 0
+
+    with LexiconLemmatizer.from_file(args.lexicon, SrbTreeTagger(), args.min_count) as lemmatizer:
+        report = agreement(_iter_corpus(args.input), lemmatizer)
+    print(f"Tokens compared:  {report['tokens']}")
+    print(f"Agreement rate:   {report['agreement_rate']:.2%}")
+    print(f"Lexicon coverage: {report['lexicon_coverage']:.2%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# filepath: d:\GitHub\WordcloudSR\manifest.py
+"""
+WordcloudSR Incremental Processing State
+
+This module keeps, for every input directory, a manifest of its text files
+(path, size, modification time and content hash) together with per-file
+lemma count shards. On later runs only new or changed files are lemmatized;
+counts of deleted or changed files are subtracted from the merged totals and
+everything else is reused without touching TreeTagger.
+
+State layout for one directory::
+
+    <state_dir>/<folder>-<path hash>/state.json
+    <state_dir>/<folder>-<path hash>/shards/<content sha256>.json
+
+``state.json`` holds the manifest and the merged counts it describes and is
+replaced atomically, so an interrupted run never leaves totals that do not
+match the manifest. It also records the tagger's model key (see
+:meth:`SerbianTagger.LemmatizerBackend.model_key`); state built with a
+different TreeTagger model or lexicon is discarded.
+
+Shards hold raw lemma and bigram counts before stopword removal, so changing
+the stopword list does not require re-tagging.
+
+Author: Unknown
+Date: October 16, 2026
+"""
+
+import os
+import json
+import hashlib
+import logging
+import itertools
+import collections
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from corpus import iter_documents
+from metrics import DirectoryMetrics
+from utils import (
+    DEFAULT_CHUNK_SIZE,
+    chunk_sentences,
+    count_lemmas_and_bigrams,
+    lemmatize_chunks,
+    lemmatize_documents
+)
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the state layout or shard contents change meaning; older state is rebuilt
+STATE_VERSION = 3
+
+# State files of earlier versions, removed when the state is rebuilt
+_LEGACY_FILES = ('manifest.json', 'merged.json')
+
+# Lemma counts and bigram counts
+Counts = Tuple[collections.Counter, collections.Counter]
+
+
+def _write_json(path: str, data: Any) -> None:
+    """Atomically write a JSON file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str) -> Optional[Any]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        logger.warning(f"Ignoring corrupt state file {path}: {e}")
+        return None
+
+
+def _model_key(tagger: Any) -> str:
+    """Return the model key of a tagger; taggers without one are told apart by class."""
+    model_key = getattr(tagger, 'model_key', None)
+    return model_key() if model_key is not None else type(tagger).__name__
+
+
+def _read_head(pieces: Iterator[str], limit: int) -> Tuple[List[str], bool]:
+    """
+    Read pieces of a document until more than ``limit`` characters are read.
+
+    Returns:
+        Tuple[List[str], bool]: The pieces read, and whether they are the whole document.
+    """
+    head: List[str] = []
+    read = 0
+    for piece in pieces:
+        head.append(piece)
+        read += len(piece)
+        if read > limit:
+            return head, False
+    return head, True
+
+
+def _add(total: Counts, counts: Counts) -> None:
+    total[0].update(counts[0])
+    total[1].update(counts[1])
+
+
+def _subtract(total: Counts, counts: Counts) -> None:
+    total[0].subtract(counts[0])
+    total[1].subtract(counts[1])
+
+
+class DirectoryState:
+    """
+    Manifest and lemma count shards of a single input directory.
+    """
+
+    def __init__(self, state_dir: str, directory: str):
+        """
+        Open the incremental state of a directory.
+
+        Args:
+            state_dir (str): Root directory holding the state of all input directories.
+            directory (str): Input directory this state belongs to.
+        """
+        self.directory = directory
+        path_hash = hashlib.sha1(os.path.abspath(directory).encode('utf-8')).hexdigest()[:10]
+        self.path = os.path.join(state_dir, f"{os.path.basename(directory)}-{path_hash}")
+        self._shard_dir = os.path.join(self.path, 'shards')
+        os.makedirs(self._shard_dir, exist_ok=True)
+        self._state_path = os.path.join(self.path, 'state.json')
+
+    def _shard_path(self, digest: str) -> str:
+        return os.path.join(self._shard_dir, f"{digest}.json")
+
+    def _load_shard(self, digest: str) -> Counts:
+        data = _read_json(self._shard_path(digest))
+        if data is None:
+            return collections.Counter(), collections.Counter()
+        return collections.Counter(data['unigrams']), collections.Counter(data['bigrams'])
+
+    def _apply(self, merged: Counts, previous: Optional[Dict[str, Any]],
+               digest: str, counts: Counts) -> None:
+        """Replace the counts of a file's previous content with those of its current content."""
+        # Touched but identical content is already part of the merged totals
+        if previous and previous['sha256'] == digest:
+            return
+        if previous:
+            _subtract(merged, self._load_shard(previous['sha256']))
+        _add(merged, counts)
+
+    def _load_state(self, model_key: str) -> Tuple[Dict[str, Dict[str, Any]], Counts]:
+        """Return the manifest and merged counts of the last run, if they can be reused."""
+        empty: Counts = (collections.Counter(), collections.Counter())
+        state = _read_json(self._state_path)
+        if state is None:
+            legacy = [name for name in _LEGACY_FILES if os.path.exists(os.path.join(self.path, name))]
+            if legacy:
+                logger.info(f"Discarding incremental state in an older format for {self.directory}")
+                for name in legacy:
+                    os.remove(os.path.join(self.path, name))
+                self._collect_garbage({})
+            return {}, empty
+        if state.get('version') != STATE_VERSION:
+            logger.info(f"Discarding incremental state in an older format for {self.directory}")
+        elif state.get('model') != model_key:
+            logger.info(f"Discarding incremental state built with another tagger model for {self.directory}")
+        else:
+            return state['files'], (collections.Counter(state['unigrams']),
+                                    collections.Counter(state['bigrams']))
+        self._collect_garbage({})
+        return {}, empty
+
+    def update(self, tagger: Any, chunk_size: int = DEFAULT_CHUNK_SIZE,
+               metrics: Optional[DirectoryMetrics] = None) -> Counts:
+        """
+        Bring the state up to date with the directory and return merged counts.
+
+        Only files whose content is not already covered by a shard are
+        lemmatized. Documents are read in pieces and hashed as they are read:
+        small ones are batched, and those longer than ``chunk_size`` are
+        lemmatized while they are read, so no document is held in memory.
+        Such a large file is therefore tagged again when it is touched
+        without changing its content.
+
+        Args:
+            tagger (Any): Tagger exposing ``lemmatize(text)``; small files are
+                batched if it also has ``iter_lemmatize_many``. State built with
+                a tagger of another ``model_key()`` is rebuilt.
+            chunk_size (int): Characters of text lemmatized per tagger call.
+            metrics (Optional[DirectoryMetrics]): Collects statistics of the files
+                that are read; their lemmatization and counting is timed as ``lemmatize``.
+
+        Returns:
+            Tuple[collections.Counter, collections.Counter]: Lemma and bigram
+            counts over all current files, before stopword removal.
+        """
+        metrics = metrics or DirectoryMetrics(self.directory)
+        model_key = _model_key(tagger)
+        old_files, merged = self._load_state(model_key)
+
+        new_files: Dict[str, Dict[str, Any]] = {}
+        # Files that need tagging: (previous manifest entry, content digest, text)
+        pending: List[Tuple[Optional[Dict[str, Any]], str, str]] = []
+        pending_chars = 0
+        tagged = reused = 0
+        for document in iter_documents(self.directory):
+            name = document.name
+            previous = old_files.get(name)
+
+            # Unchanged size and mtime: trust the manifest without reading the file
+            if (previous and previous['size'] == document.size
+                    and previous['mtime'] == document.mtime_ns
+                    and os.path.exists(self._shard_path(previous['sha256']))):
+                new_files[name] = previous
+                reused += 1
+                continue
+
+            hasher = hashlib.sha256()
+            pieces = document.iter_text(hasher=hasher)
+            try:
+                with metrics.stage('extract'):
+                    head, complete = _read_head(pieces, chunk_size)
+                if not complete:
+                    # Too large to batch: lemmatize while reading, the digest is known at the end
+                    text = itertools.chain(head, metrics.timed(pieces, 'extract'))
+                    with metrics.stage('lemmatize'):
+                        counts = count_lemmas_and_bigrams(
+                            lemmatize_chunks(chunk_sentences(text, chunk_size), tagger))
+                digest = hasher.hexdigest()
+                metrics.add_document(document)
+            except Exception as e:
+                logger.warning(f"Could not read file {document.path}: {e}")
+                continue
+
+            new_files[name] = {'size': document.size, 'mtime': document.mtime_ns, 'sha256': digest}
+            if os.path.exists(self._shard_path(digest)):
+                self._apply(merged, previous, digest, self._load_shard(digest))
+                reused += 1
+                continue
+            if not complete:
+                self._apply(merged, previous, digest, self._write_shard(digest, counts))
+                tagged += 1
+                continue
+
+            text = ''.join(head)
+            pending.append((previous, digest, text))
+            pending_chars += len(text)
+            if pending_chars >= chunk_size:
+                with metrics.stage('lemmatize'):
+                    tagged += self._build_shards(pending, merged, tagger, chunk_size)
+                pending, pending_chars = [], 0
+        with metrics.stage('lemmatize'):
+            tagged += self._build_shards(pending, merged, tagger, chunk_size)
+
+        removed = [name for name in old_files if name not in new_files]
+        for name in removed:
+            _subtract(merged, self._load_shard(old_files[name]['sha256']))
+        # Drop zero and negative counts
+        merged = (+merged[0], +merged[1])
+
+        # Manifest and totals are replaced together, so they always describe the same files
+        _write_json(self._state_path, {'version': STATE_VERSION, 'model': model_key, 'files': new_files,
+                                       'unigrams': merged[0], 'bigrams': merged[1]})
+        self._collect_garbage(new_files)
+
+        logger.info(
+            f"Incremental state for {self.directory}: {tagged} files lemmatized, "
+            f"{reused} reused, {len(removed)} removed"
+        )
+        return merged
+
+    def _build_shards(self, pending: List[Tuple[Optional[Dict[str, Any]], str, str]],
+                      merged: Counts, tagger: Any, chunk_size: int) -> int:
+        """
+        Lemmatize pending small files, store their shards and add them to the merged counts.
+
+        The files are sent through the tagger together as one batch of documents.
+
+        Returns:
+            int: Number of files lemmatized.
+        """
+        small = {}
+        for _, digest, text in pending:
+            small.setdefault(digest, text)
+
+        shards: Dict[str, Counts] = {}
+        lemmatized_documents = lemmatize_documents(small.values(), tagger, chunk_size)
+        for digest, lemmatized in zip(small, lemmatized_documents):
+            shards[digest] = self._write_shard(digest, count_lemmas_and_bigrams([lemmatized or ""]))
+
+        for previous, digest, _ in pending:
+            self._apply(merged, previous, digest, shards[digest])
+        return len(pending)
+
+    def _write_shard(self, digest: str, counts: Counts) -> Counts:
+        """Store the lemma and bigram counts of one file content as a shard."""
+        _write_json(self._shard_path(digest), {'unigrams': counts[0], 'bigrams': counts[1]})
+        return counts
+
+    def _collect_garbage(self, files: Dict[str, Dict[str, Any]]) -> None:
+        """Delete shards that no current file refers to."""
+        referenced = {f"{entry['sha256']}.json" for entry in files.values()}
+        for name in os.listdir(self._shard_dir):
+            if name not in referenced:
+                os.remove(os.path.join(self._shard_dir, name))
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# filepath: d:\GitHub\WordcloudSR\metrics.py
+"""
+WordcloudSR Run Metrics
+
+This module collects structured statistics while directories are processed:
+files and bytes read, tokens, unique lemmas, and the seconds spent in each
+pipeline stage. A run report built from them is returned together with the
+results of ``process_files`` and can be written as JSON or as a Prometheus
+textfile for the node_exporter textfile collector.
+
+Stage times are exclusive: when a stage pulls data from another one (for
+example lemmatization pulling chunks from the file reader), the time spent
+in the inner stage is not counted again in the outer one.
+
+Author: Unknown
+Date: October 16, 2026
+"""
+
+import os
+import json
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, TypeVar
+
+from corpus import Document, iter_collection_text
+from utils import chunk_sentences
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('extract', 'lemmatize', 'count', 'render', 'write')
+
+T = TypeVar('T')
+
+
+class DirectoryMetrics:
+    """
+    Statistics of processing one input directory.
+    """
+
+    def __init__(self, directory: str, profiler: Any = None):
+        """
+        Args:
+            directory (str): The input directory.
+            profiler (Any): Optional :class:`profiling.DirectoryProfiler` that follows
+                the stage switches of this directory.
+        """
+        self.directory = directory
+        self.profiler = profiler
+        self.files = 0
+        self.bytes = 0
+        self.tokens = 0
+        self.unique_lemmas = 0
+        self.render_cache_hits = 0
+        self.render_cache_misses = 0
+        self.decode_errors = 0
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        # Bytes of the document being read, until it is added to ``bytes``
+        self.bytes_reading = 0
+        # progress.ProgressTracker and progress.CancellationToken of the run, if any
+        self.progress: Any = None
+        self.cancel: Any = None
+        self._active: List[str] = []
+        self._mark = 0.0
+
+    def _switch(self) -> None:
+        """Charge the time since the last switch to the innermost active stage."""
+        now = time.perf_counter()
+        if self._active:
+            self.seconds[self._active[-1]] += now - self._mark
+        self._mark = now
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Time a block of code as part of a stage.
+
+        Entering a stage is also where a run is reported to its progress
+        tracker and where cancellation is checked.
+
+        Args:
+            name (str): One of ``STAGES``.
+
+        Raises:
+            progress.Cancelled: If the run has been cancelled.
+        """
+        if self.cancel is not None:
+            self.cancel.check()
+        if self.progress is not None:
+            self.progress.update(self, name)
+        self._switch()
+        previous = self._active[-1] if self._active else None
+        self._active.append(name)
+        if self.profiler is not None:
+            self.profiler.enter(name)
+            self.profiler.switch(previous, name)
+        try:
+            yield
+        finally:
+            self._switch()
+            self._active.pop()
+            if self.profiler is not None:
+                self.profiler.switch(name, previous)
+                self.profiler.exit(name)
+
+    def timed(self, items: Iterable[T], name: str) -> Iterator[T]:
+        """
+        Charge the time spent producing each item of a lazy iterable to a stage.
+
+        Args:
+            items (Iterable[T]): Iterable to wrap, e.g. a generator of chunks.
+            name (str): One of ``STAGES``.
+
+        Yields:
+            T: The items of ``items``.
+        """
+        iterator = iter(items)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def add_document(self, document: Document) -> None:
+        """Record a document that was read."""
+        self.files += 1
+        self.bytes += document.size
+        self.bytes_reading = 0
+        self.decode_errors += document.decode_errors
+
+    def _add_block(self, size: int) -> None:
+        self.bytes_reading += size
+
+    def read_chunks(self, directory: str, chunk_size: int) -> Iterator[str]:
+        """
+        Read a directory in sentence-bounded chunks, recording files and bytes.
+
+        Same chunks as :func:`utils.iter_text_chunks`; the reading time is
+        charged to the ``extract`` stage.
+
+        Args:
+            directory (str): Directory (or archive) containing text files.
+            chunk_size (int): Target maximum chunk length in characters.
+
+        Returns:
+            Iterator[str]: Chunks of text.
+        """
+        texts = iter_collection_text(directory, chunk_size, on_document=self.add_document,
+                                     on_block=self._add_block)
+        return self.timed(chunk_sentences(texts, chunk_size), 'extract')
+
+    def add_reading(self, reading: "DirectoryMetrics") -> None:
+        """
+        Take over the files and bytes recorded by the metrics of a separate reader thread.
+
+        The reader's stage seconds are not added: they overlap with the stages of
+        this directory, which already count the time spent waiting for its chunks.
+
+        Args:
+            reading (DirectoryMetrics): Metrics the reader thread recorded into.
+        """
+        if reading.progress is not None:
+            reading.progress.abandon(reading)
+        self.files += reading.files
+        self.bytes += reading.bytes
+        self.decode_errors += reading.decode_errors
+
+    def add_counts(self, lemma_freq: Mapping[str, int]) -> None:
+        """Record token and unique lemma counts before stopword removal."""
+        self.tokens = sum(lemma_freq.values())
+        self.unique_lemmas = len(lemma_freq)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the statistics as a JSON-serializable dictionary."""
+        return {
+            'directory': self.directory,
+            'files': self.files,
+            'bytes': self.bytes,
+            'tokens': self.tokens,
+            'unique_lemmas': self.unique_lemmas,
+            'render_cache_hits': self.render_cache_hits,
+            'render_cache_misses': self.render_cache_misses,
+            'decode_errors': self.decode_errors,
+            'seconds': dict(self.seconds),
+        }
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Sent back from worker processes once the directory is done
+        state = self.__dict__.copy()
+        state['_active'] = []
+        state['profiler'] = None
+        state['progress'] = None
+        state['cancel'] = None
+        return state
+
+
+class RunResults(dict):
+    """
+    Results of ``process_files``: a dict keyed by directory name, plus the run report.
+
+    Attributes:
+        metrics (Dict[str, Any]): Run report built by :func:`build_report`.
+        counts (Any): :class:`vocabulary.CountStore` with the lemma counts of every
+            directory, when the run was asked to keep them; otherwise None.
+        cancelled (bool): Whether the run was cancelled; the results then cover only the
+            directories finished before.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.metrics: Dict[str, Any] = {}
+        self.counts: Any = None
+        self.cancelled = False
+
+
+def build_report(script: str, directories: Iterable[DirectoryMetrics],
+                 wall_seconds: float, finished: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Combine the statistics of all directories into a run report.
+
+    Args:
+        script (str): Name of the script that produced the run.
+        directories (Iterable[DirectoryMetrics]): Statistics of each processed directory.
+        wall_seconds (float): Elapsed time of the whole run.
+        finished (Optional[float]): Unix time the run finished; defaults to now.
+
+    Returns:
+        Dict[str, Any]: Report with per-directory statistics, totals and throughput.
+    """
+    per_directory = [metrics.to_dict() for metrics in directories]
+    totals = {key: sum(d[key] for d in per_directory)
+              for key in ('files', 'bytes', 'tokens', 'render_cache_hits', 'render_cache_misses',
+                          'decode_errors')}
+    totals['seconds'] = {stage: sum(d['seconds'][stage] for d in per_directory) for stage in STAGES}
+    return {
+        'script': script,
+        'finished': finished if finished is not None else time.time(),
+        'wall_seconds': wall_seconds,
+        'directory_count': len(per_directory),
+        'totals': totals,
+        'throughput': {
+            'tokens_per_second': totals['tokens'] / wall_seconds if wall_seconds else 0.0,
+            'bytes_per_second': totals['bytes'] / wall_seconds if wall_seconds else 0.0,
+        },
+        'directories': per_directory,
+    }
+
+
+def _write_atomic(path: str, content: str) -> None:
+    """Write a file so that readers never see it half-written."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def write_json_report(report: Dict[str, Any], path: str) -> None:
+    """
+    Write a run report as JSON.
+
+    Args:
+        report (Dict[str, Any]): Report from :func:`build_report`.
+        path (str): Output path.
+    """
+    _write_atomic(path, json.dumps(report, ensure_ascii=False, indent=2))
+    logger.info(f"Run report written to {path}")
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_prometheus(report: Dict[str, Any]) -> str:
+    """
+    Format a run report in the Prometheus text exposition format.
+
+    Args:
+        report (Dict[str, Any]): Report from :func:`build_report`.
+
+    Returns:
+        str: Metrics text.
+    """
+    lines = []
+
+    def metric(name: str, kind: str, help_text: str, samples: List[tuple]) -> None:
+        lines.append(f"# HELP wordcloudsr_{name} {help_text}")
+        lines.append(f"# TYPE wordcloudsr_{name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{_label(str(val))}"' for key, val in
+                                  (('script', report['script']),) + labels)
+            lines.append(f"wordcloudsr_{name}{{{label_text}}} {value}")
+
+    metric('run_last_finished_timestamp_seconds', 'gauge', 'Unix time the last run finished.',
+           [((), report['finished'])])
+    metric('run_wall_seconds', 'gauge', 'Elapsed time of the last run.',
+           [((), report['wall_seconds'])])
+    metric('run_directories', 'gauge', 'Directories processed in the last run.',
+           [((), report['directory_count'])])
+    metric('run_tokens_per_second', 'gauge', 'Tokens lemmatized per second in the last run.',
+           [((), report['throughput']['tokens_per_second'])])
+    metric('run_bytes_per_second', 'gauge', 'Input bytes processed per second in the last run.',
+           [((), report['throughput']['bytes_per_second'])])
+    metric('run_stage_seconds', 'gauge', 'Seconds spent in each stage in the last run.',
+           [((('stage', stage),), seconds) for stage, seconds in report['totals']['seconds'].items()])
+
+    for key, help_text in (('files', 'Files read'), ('bytes', 'Bytes read'),
+                           ('tokens', 'Tokens lemmatized'), ('unique_lemmas', 'Distinct lemmas'),
+                           ('render_cache_hits', 'Word clouds copied from the render cache'),
+                           ('render_cache_misses', 'Word clouds rendered after a render cache miss'),
+                           ('decode_errors', 'Blocks of input with invalid UTF-8')):
+        metric(f'directory_{key}', 'gauge', f'{help_text} per directory in the last run.',
+               [((('directory', os.path.basename(d['directory'])),), d[key])
+                for d in report['directories']])
+    metric('directory_stage_seconds', 'gauge', 'Seconds per directory and stage in the last run.',
+           [((('directory', os.path.basename(d['directory'])), ('stage', stage)), seconds)
+            for d in report['directories'] for stage, seconds in d['seconds'].items()])
+
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus_textfile(report: Dict[str, Any], path: str) -> None:
+    """
+    Write a run report as a Prometheus textfile (e.g. for the node_exporter textfile collector).
+
+    Args:
+        report (Dict[str, Any]): Report from :func:`build_report`.
+        path (str): Output path, conventionally ending in ``.prom``.
+    """
+    _write_atomic(path, format_prometheus(report))
+    logger.info(f"Prometheus metrics written to {path}")
+
+
+def finish_run(results: RunResults, script: str, directories: Iterable[DirectoryMetrics],
+               started: float, report_path: Optional[str] = None,
+               prometheus_path: Optional[str] = None) -> RunResults:
+    """
+    Attach the run report to the results and write it where requested.
+
+    Args:
+        results (RunResults): Results of the run.
+        script (str): Name of the script that produced the run.
+        directories (Iterable[DirectoryMetrics]): Statistics of each processed directory.
+        started (float): ``time.perf_counter()`` value at the start of the run.
+        report_path (Optional[str]): JSON report path.
+        prometheus_path (Optional[str]): Prometheus textfile path.
+
+    Returns:
+        RunResults: ``results``, with ``metrics`` set.
+    """
+    results.metrics = build_report(script, directories, time.perf_counter() - started)
+    results.metrics['cancelled'] = results.cancelled
+    if report_path:
+        write_json_report(results.metrics, report_path)
+    if prometheus_path:
+        write_prometheus_textfile(results.metrics, prometheus_path)
+    return results
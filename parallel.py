@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# filepath: d:\GitHub\WordcloudSR\parallel.py
+"""
+WordcloudSR Parallel Execution
+
+This module spreads the processing of input subdirectories across a pool of
+worker processes. Every worker starts its own SrbTreeTagger once and reuses
+it for all directories it is given. Results are returned in the order the
+directories were submitted, regardless of which worker finishes first, and a
+failure in one directory does not stop the others. The statistics collected
+while processing a directory are returned along with its result.
+
+A run can report its progress to a :class:`progress.ProgressTracker` and be
+stopped with a :class:`progress.CancellationToken`; the directories finished
+before the cancellation are still returned.
+
+Author: Unknown
+Date: October 16, 2026
+"""
+
+import logging
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+from metrics import DirectoryMetrics
+from progress import CancellationToken, Cancelled, ProgressTracker
+
+logger = logging.getLogger(__name__)
+
+# Tagger owned by the current worker process, created by _init_worker
+_WORKER_TAGGER = None
+# Cancellation token of the run the worker process belongs to
+_WORKER_CANCEL: Optional[CancellationToken] = None
+
+
+def _init_worker(tagger_kwargs: Dict[str, Any], cancel: Optional[CancellationToken] = None,
+                 log_level: Optional[int] = None) -> None:
+    """Start the TreeTagger instance of a worker process."""
+    global _WORKER_TAGGER, _WORKER_CANCEL
+    from SerbianTagger import create_tagger
+    # Spawned workers start without the logging set up by the script's entry point
+    if log_level is not None and not logging.getLogger().handlers:
+        from utils import setup_logging
+        setup_logging(debug=log_level <= logging.DEBUG)
+    _WORKER_CANCEL = cancel
+    _WORKER_TAGGER = create_tagger(**tagger_kwargs)
+
+
+def _new_metrics(directory: str, profile: Optional[Dict[str, Any]]) -> DirectoryMetrics:
+    """Create the metrics of a directory, with a profiler if profiling is on."""
+    if not profile:
+        return DirectoryMetrics(directory)
+    from profiling import DirectoryProfiler
+    return DirectoryMetrics(directory, DirectoryProfiler(directory=directory, **profile))
+
+
+def _process(func: Callable, directory: str, tagger: Any, args: Tuple,
+             profile: Optional[Dict[str, Any]], progress: Optional[ProgressTracker] = None,
+             cancel: Optional[CancellationToken] = None) -> Tuple[Any, DirectoryMetrics]:
+    """Process one directory and return its result and metrics."""
+    metrics = _new_metrics(directory, profile)
+    metrics.progress = progress
+    metrics.cancel = cancel
+    try:
+        return func(directory, tagger, *args, metrics=metrics), metrics
+    except BaseException:
+        if progress is not None:
+            progress.abandon(metrics)
+        raise
+    finally:
+        if metrics.profiler is not None:
+            metrics.profiler.finish()
+
+
+def _run_directory(func: Callable, directory: str, args: Tuple,
+                   profile: Optional[Dict[str, Any]]) -> Tuple[Any, DirectoryMetrics]:
+    """Process one directory with the tagger of the current worker."""
+    if _WORKER_CANCEL is not None:
+        _WORKER_CANCEL.check()
+    return _process(func, directory, _WORKER_TAGGER, args, profile, cancel=_WORKER_CANCEL)
+
+
+def map_directories(func: Callable, directories: Sequence[str], args: Tuple,
+                    tagger: Any = None, workers: int = 1,
+                    tagger_kwargs: Optional[Dict[str, Any]] = None,
+                    profile: Optional[Dict[str, Any]] = None,
+                    progress: Optional[ProgressTracker] = None,
+                    cancel: Optional[CancellationToken] = None
+                    ) -> Iterator[Tuple[str, Any, DirectoryMetrics]]:
+    """
+    Apply a ``process_directory`` function to several directories.
+
+    ``func`` is called as ``func(directory, tagger, *args, metrics=metrics)``
+    with a fresh :class:`DirectoryMetrics` for every directory. With a single
+    worker the given tagger is used in the current process. With more
+    workers, ``func`` must be a module-level function and every worker
+    process creates its own tagger from ``tagger_kwargs``.
+
+    Args:
+        func (Callable): Function processing one directory.
+        directories (Sequence[str]): Directories to process.
+        args (Tuple): Extra positional arguments passed to ``func``.
+        tagger (Any): Tagger used when running serially.
+        workers (int): Number of worker processes.
+        tagger_kwargs (Optional[Dict[str, Any]]): Keyword arguments for ``create_tagger`` in workers.
+        profile (Optional[Dict[str, Any]]): Keyword arguments for
+            :class:`profiling.DirectoryProfiler` (``profile_dir``, ``memory``); every
+            directory is then profiled where it runs. None disables profiling.
+        progress (Optional[ProgressTracker]): Receives the progress of the run.
+        cancel (Optional[CancellationToken]): Stops the run between chunks and directories.
+
+    Yields:
+        Tuple[str, Any, DirectoryMetrics]: (directory, result, metrics) in the order
+        of ``directories``. Directories that failed in a worker are logged and left out,
+        as are the directories not finished when the run is cancelled.
+    """
+    if workers <= 1:
+        for directory in directories:
+            try:
+                if cancel is not None:
+                    cancel.check()
+                result, metrics = _process(func, directory, tagger, args, profile, progress, cancel)
+            except Cancelled:
+                logger.warning(f"Cancelled while processing {directory}")
+                return
+            if progress is not None:
+                progress.finish(metrics)
+            yield directory, result, metrics
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+
+    root = logging.getLogger()
+    log_level = root.getEffectiveLevel() if root.handlers else None
+    logger.info(f"Processing {len(directories)} directories with {workers} worker processes")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(tagger_kwargs or {}, cancel, log_level)) as executor:
+        futures = [executor.submit(_run_directory, func, d, args, profile) for d in directories]
+        cancelled = False
+        # Waiting on the futures in submission order keeps the output deterministic
+        for directory, future in zip(directories, futures):
+            if not cancelled and cancel is not None and cancel.cancelled:
+                # Directories not started yet are dropped; those already finished are kept
+                cancelled = True
+                for pending in futures:
+                    pending.cancel()
+            if future.cancelled():
+                continue
+            try:
+                result, metrics = future.result()
+            except BrokenProcessPool:
+                logger.error("Worker pool failed, check the TreeTagger configuration")
+                raise
+            except Cancelled:
+                logger.warning(f"Cancelled while processing {directory}")
+                continue
+            except Exception as e:
+                logger.error(f"Failed to process directory {directory}: {e}")
+                continue
+            if progress is not None:
+                progress.finish(metrics)
+            yield directory, result, metrics
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# filepath: d:\GitHub\WordcloudSR\pipeline.py
+"""
+WordcloudSR Pipelined Execution
+
+This module runs items through a chain of stages, each served by its own
+pool of worker threads and connected by bounded queues. While one directory
+is being rendered the next one can already be lemmatized, so TreeTagger (an
+external process) and word cloud layout keep each other busy instead of
+taking turns.
+
+The queues are bounded: when a later stage falls behind, the earlier stages
+block on a full queue instead of piling up finished work in memory.
+
+A pipeline given a :class:`progress.CancellationToken` stops when the token
+is set; items that already left the last stage are still returned.
+
+:func:`prefetch` runs a lazy iterable ahead of its consumer in a thread of
+its own, so a stage can start reading the next item's data while a later
+stage is still busy with the current one, again through a bounded queue.
+
+Author: Unknown
+Date: October 16, 2026
+"""
+
+import queue
+import weakref
+import logging
+import threading
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from progress import Cancelled
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the stream in a queue
+_DONE = object()
+
+# Seconds between checks for a stopped pipeline while waiting on a queue
+_POLL_SECONDS = 0.1
+
+T = TypeVar('T')
+
+
+class Stage:
+    """
+    One step of a pipeline.
+
+    ``func`` is called as ``func(item, state)``, where ``state`` is the value
+    returned by ``setup()`` in the worker thread (None without ``setup``).
+    Worker-local state lets every worker own a resource that is not
+    thread-safe, such as a tagger.
+    """
+
+    def __init__(self, name: str, func: Callable[[Any, Any], Any], workers: int = 1,
+                 setup: Optional[Callable[[], Any]] = None,
+                 teardown: Optional[Callable[[Any], None]] = None):
+        """
+        Args:
+            name (str): Stage name used in log messages.
+            func (Callable[[Any, Any], Any]): Function turning an item into the next stage's item.
+            workers (int): Number of worker threads.
+            setup (Optional[Callable[[], Any]]): Creates the state of a worker thread.
+            teardown (Optional[Callable[[Any], None]]): Releases the state of a worker thread.
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.setup = setup
+        self.teardown = teardown
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """Put an item on a queue, giving up if the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:
+    """Take an item from a queue, returning ``_DONE`` if the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def run_pipeline(items: Iterable[Any], stages: Sequence[Stage],
+                 queue_size: int = 2, cancel: Any = None) -> Iterator[Tuple[int, Any]]:
+    """
+    Run items through the stages concurrently.
+
+    Items that raise in a stage are logged and dropped; the others continue.
+    If a worker cannot be set up, the pipeline stops and the error is raised.
+
+    Args:
+        items (Iterable[Any]): Input items, consumed lazily by a feeder thread.
+        stages (Sequence[Stage]): Stages in order.
+        queue_size (int): Capacity of each queue between two stages.
+        cancel (Any): :class:`progress.CancellationToken` that stops the pipeline.
+
+    Yields:
+        Tuple[int, Any]: (input position, result of the last stage), in completion order.
+    """
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in range(len(stages) + 1)]
+    threads: List[threading.Thread] = []
+    errors: List[Exception] = []
+
+    def feed() -> None:
+        try:
+            for item in enumerate(items):
+                if not _put(queues[0], item, stop):
+                    return
+        except Exception as e:
+            logger.error(f"Pipeline input failed: {e}")
+            errors.append(e)
+            stop.set()
+        _put(queues[0], _DONE, stop)
+
+    def watch() -> None:
+        while not stop.wait(_POLL_SECONDS):
+            if cancel.cancelled:
+                logger.warning("Pipeline cancelled")
+                stop.set()
+
+    def work(stage: Stage, inbox: queue.Queue, outbox: queue.Queue,
+             remaining: List[int], lock: threading.Lock) -> None:
+        state = None
+        try:
+            if stage.setup:
+                state = stage.setup()
+            while True:
+                entry = _get(inbox, stop)
+                if entry is _DONE:
+                    # Let the other workers of this stage see the end too
+                    _put(inbox, _DONE, stop)
+                    break
+                index, item = entry
+                try:
+                    result = stage.func(item, state)
+                except Cancelled:
+                    # The token was checked before the watch thread saw it; stop everything now
+                    stop.set()
+                    break
+                except Exception as e:
+                    if stop.is_set():
+                        # Cancelled (or stopped by another failure) while working on the item
+                        break
+                    logger.error(f"Pipeline stage '{stage.name}' failed on item {index}: {e}")
+                    continue
+                if not _put(outbox, (index, result), stop):
+                    break
+        except Exception as e:
+            # A worker that cannot start (e.g. no TreeTagger) stops the whole pipeline
+            logger.error(f"Pipeline stage '{stage.name}' worker failed: {e}")
+            errors.append(e)
+            stop.set()
+        finally:
+            if stage.teardown and state is not None:
+                stage.teardown(state)
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                _put(outbox, _DONE, stop)
+
+    threads.append(threading.Thread(target=feed, name='pipeline-feed', daemon=True))
+    if cancel is not None:
+        threads.append(threading.Thread(target=watch, name='pipeline-cancel', daemon=True))
+    for position, stage in enumerate(stages):
+        remaining, lock = [stage.workers], threading.Lock()
+        for number in range(stage.workers):
+            threads.append(threading.Thread(
+                target=work, args=(stage, queues[position], queues[position + 1], remaining, lock),
+                name=f"pipeline-{stage.name}-{number}", daemon=True))
+
+    for thread in threads:
+        thread.start()
+    try:
+        while True:
+            entry = _get(queues[-1], stop)
+            if entry is _DONE:
+                break
+            yield entry
+        # Results that were finished when the pipeline stopped
+        while True:
+            try:
+                entry = queues[-1].get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _DONE:
+                yield entry
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+
+
+def prefetch(items: Iterable[T], maxsize: int, name: str = 'pipeline-prefetch') -> Iterator[T]:
+    """
+    Produce the items of a lazy iterable in a background thread, ahead of the consumer.
+
+    The thread starts right away and stays at most ``maxsize`` items ahead, so
+    producing (e.g. reading a file) overlaps with whatever the consumer does
+    while memory stays bounded. An exception raised while producing is raised
+    in the consumer when it reaches that point. When the returned iterator is
+    closed or garbage-collected before the end, the thread stops and closes
+    ``items``.
+
+    Args:
+        items (Iterable[T]): Items to produce, e.g. a generator of text chunks.
+        maxsize (int): Number of items that may wait for the consumer.
+        name (str): Name of the producer thread.
+
+    Returns:
+        Iterator[T]: The items of ``items``, in order.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+    closed = threading.Event()
+
+    def produce() -> None:
+        iterator = iter(items)
+        try:
+            for item in iterator:
+                if not _put(buffer, (True, item), closed):
+                    return
+        except BaseException as e:
+            _put(buffer, (False, e), closed)
+            return
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+        _put(buffer, (False, None), closed)
+
+    def consume() -> Iterator[T]:
+        try:
+            while True:
+                ok, value = buffer.get()
+                if not ok:
+                    if value is not None:
+                        raise value
+                    return
+                yield value
+        finally:
+            closed.set()
+
+    consumer = consume()
+    # A consumer that is dropped without ever being started never runs its finally block
+    weakref.finalize(consumer, closed.set)
+    threading.Thread(target=produce, name=name, daemon=True).start()
+    return consumer
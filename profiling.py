@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# filepath: d:\GitHub\WordcloudSR\profiling.py
+"""
+WordcloudSR Profiling
+
+This module captures CPU profiles of every input directory, split by
+pipeline stage, when a script runs with ``--profile``. A profile is attached
+to the :class:`metrics.DirectoryMetrics` of a directory and follows its stage
+switches, so each stage gets its own ``cProfile`` profile. Optionally,
+``tracemalloc`` records the peak memory of the lemmatize and render stages
+together with the largest allocations at that peak.
+
+Output layout::
+
+    <profile_dir>/<folder>/<stage>.pstats       cProfile statistics
+    <profile_dir>/<folder>/<stage>.collapsed    collapsed stacks for flame graphs
+    <profile_dir>/<folder>/memory.txt           peak memory (with --profile-memory)
+    <profile_dir>/run.pstats                    all directories and stages merged
+    <profile_dir>/run.collapsed                 stacks prefixed with folder and stage
+
+The collapsed files can be rendered with flamegraph.pl or speedscope. Since
+cProfile records caller/callee pairs rather than full stacks, the stacks are
+reconstructed from the call graph and time is split between callers in
+proportion to their share of the calls.
+
+Without ``--profile`` nothing in this module is imported or run.
+
+Author: Unknown
+Date: October 16, 2026
+"""
+
+import os
+import glob
+import pstats
+import cProfile
+import logging
+import tracemalloc
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Stages whose peak memory is recorded with --profile-memory
+MEMORY_STAGES = ('lemmatize', 'render')
+
+# Number of allocation sites listed per stage in memory.txt
+_TOP_ALLOCATIONS = 25
+
+# Deepest call stack written to collapsed files
+_MAX_STACK_DEPTH = 64
+
+# Stacks with less time than this are left out of collapsed files
+_MIN_SECONDS = 1e-6
+
+
+class DirectoryProfiler:
+    """
+    Per-stage CPU and memory profiler of one input directory.
+    """
+
+    def __init__(self, profile_dir: str, directory: str, memory: bool = False):
+        """
+        Args:
+            profile_dir (str): Root directory for profile output.
+            directory (str): Input directory being profiled.
+            memory (bool): Whether to record tracemalloc peaks of the lemmatize and render stages.
+        """
+        self.path = os.path.join(profile_dir, os.path.basename(directory))
+        self.memory = memory
+        self._profiles: Dict[str, cProfile.Profile] = {}
+        self._current: Optional[cProfile.Profile] = None
+        self._peaks: Dict[str, int] = {}
+        self._snapshots: Dict[str, tracemalloc.Snapshot] = {}
+        self._started_tracemalloc = False
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def switch(self, previous: Optional[str], current: Optional[str]) -> None:
+        """
+        Move CPU profiling from one stage to another.
+
+        Args:
+            previous (Optional[str]): Stage that was running, if any.
+            current (Optional[str]): Stage that runs from now on, if any.
+        """
+        if self._current is not None:
+            self._current.disable()
+            self._current = None
+        if current is not None:
+            self._current = self._profiles.setdefault(current, cProfile.Profile())
+            self._current.enable()
+
+    def enter(self, stage: str) -> None:
+        """Start measuring the peak memory of a stage."""
+        if self.memory and stage in MEMORY_STAGES:
+            tracemalloc.reset_peak()
+
+    def exit(self, stage: str) -> None:
+        """Record the peak memory of a stage and snapshot allocations at a new maximum."""
+        if not (self.memory and stage in MEMORY_STAGES):
+            return
+        _, peak = tracemalloc.get_traced_memory()
+        if peak > self._peaks.get(stage, 0):
+            self._peaks[stage] = peak
+            self._snapshots[stage] = tracemalloc.take_snapshot()
+
+    def finish(self) -> None:
+        """Stop profiling and write the profiles of this directory."""
+        self.switch(None, None)
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        os.makedirs(self.path, exist_ok=True)
+        # Leave no stages of an earlier run behind
+        for name in os.listdir(self.path):
+            if name.endswith(('.pstats', '.collapsed')) or name == 'memory.txt':
+                os.remove(os.path.join(self.path, name))
+        for stage, profile in self._profiles.items():
+            stats = pstats.Stats(profile)
+            stats.dump_stats(os.path.join(self.path, f"{stage}.pstats"))
+            write_collapsed(stats, os.path.join(self.path, f"{stage}.collapsed"))
+        if self.memory:
+            self._write_memory(os.path.join(self.path, 'memory.txt'))
+        logger.debug(f"Profile written to {self.path}")
+
+    def _write_memory(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            for stage in MEMORY_STAGES:
+                if stage not in self._peaks:
+                    continue
+                f.write(f"{stage}: peak {self._peaks[stage] / 1024 / 1024:.1f} MiB\n")
+                snapshot = self._snapshots[stage].filter_traces((
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                ))
+                for statistic in snapshot.statistics('lineno')[:_TOP_ALLOCATIONS]:
+                    f.write(f"    {statistic}\n")
+                f.write("\n")
+
+
+def _frame_name(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename == '~':
+        # Built-in functions
+        return name.strip('<>').replace(';', ':')
+    return f"{os.path.basename(filename)}:{line}:{name}".replace(';', ':')
+
+
+def collapsed_stacks(stats: pstats.Stats) -> Dict[str, float]:
+    """
+    Reconstruct collapsed call stacks with self time from profile statistics.
+
+    Args:
+        stats (pstats.Stats): Profile statistics.
+
+    Returns:
+        Dict[str, float]: Seconds of self time per ``caller;...;callee`` stack.
+    """
+    raw = stats.stats
+    callees: Dict[tuple, List[tuple]] = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller in callers:
+            callees.setdefault(caller, []).append(func)
+
+    stacks: Dict[str, float] = {}
+
+    def walk(func: tuple, stack: List[str], on_stack: set, share: float) -> None:
+        self_time = raw[func][2]
+        stack.append(_frame_name(func))
+        key = ";".join(stack)
+        stacks[key] = stacks.get(key, 0.0) + self_time * share
+        if len(stack) < _MAX_STACK_DEPTH:
+            for callee in callees.get(func, ()):
+                if callee in on_stack or callee not in raw:
+                    continue
+                callee_total = raw[callee][3]
+                edge_total = raw[callee][4][func][3]
+                # Skip branches too small to show up in a flame graph
+                if callee_total <= 0 or share * edge_total < _MIN_SECONDS:
+                    continue
+                # Portion of the callee's time that was spent on behalf of this stack
+                on_stack.add(callee)
+                walk(callee, stack, on_stack, share * min(1.0, edge_total / callee_total))
+                on_stack.discard(callee)
+        stack.pop()
+
+    roots = [func for func, (_, _, _, _, callers) in raw.items()
+             if not any(caller in raw for caller in callers)]
+    for root in roots:
+        walk(root, [], {root}, 1.0)
+    return stacks
+
+
+def write_collapsed(stats: pstats.Stats, path: str) -> None:
+    """
+    Write profile statistics as collapsed stacks with microsecond weights.
+
+    Args:
+        stats (pstats.Stats): Profile statistics.
+        path (str): Output path.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, seconds in sorted(collapsed_stacks(stats).items()):
+            weight = int(seconds * 1e6)
+            if weight > 0:
+                f.write(f"{stack} {weight}\n")
+
+
+def merge_profiles(profile_dir: str, directories: Iterable[str]) -> Optional[str]:
+    """
+    Merge the per-directory and per-stage profiles of a run.
+
+    Args:
+        profile_dir (str): Root directory of the profile output.
+        directories (Iterable[str]): Input directories profiled in this run.
+
+    Returns:
+        Optional[str]: Path of the merged ``run.pstats`` file, or None if there was nothing to merge.
+    """
+    files = sorted(
+        path for directory in directories
+        for path in glob.glob(os.path.join(glob.escape(profile_dir),
+                                           glob.escape(os.path.basename(directory)), '*.pstats'))
+    )
+    if not files:
+        return None
+    stats = pstats.Stats(files[0])
+    for path in files[1:]:
+        stats.add(path)
+    run_path = os.path.join(profile_dir, 'run.pstats')
+    stats.dump_stats(run_path)
+
+    # Prefix stacks with directory and stage so one flame graph shows both
+    with open(os.path.join(profile_dir, 'run.collapsed'), 'w', encoding='utf-8') as out:
+        for path in files:
+            folder = os.path.basename(os.path.dirname(path)).replace(';', ':')
+            stage = os.path.splitext(os.path.basename(path))[0]
+            with open(f"{os.path.splitext(path)[0]}.collapsed", 'r', encoding='utf-8') as f:
+                for line in f:
+                    out.write(f"{folder};{stage};{line}")
+    logger.info(f"Profiles written to {profile_dir} (view with: python -m pstats {run_path})")
+    return run_path
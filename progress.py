@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# filepath: d:\GitHub\WordcloudSR\progress.py
+"""
+WordcloudSR Progress Reporting and Cancellation
+
+This module lets a caller of ``process_files`` follow a long run and stop
+it. A :class:`ProgressTracker` turns the stage switches and byte counts of
+the directories being processed into :class:`Progress` snapshots for a
+callback. A :class:`CancellationToken` is checked whenever a directory
+enters a stage, i.e. between chunks and between directories; the current
+directory is then abandoned and the results of the finished ones are kept.
+
+The token works across worker processes. Progress from worker processes is
+reported when a directory finishes; in the current process (one worker or
+pipelined mode) it is also reported while a directory is being read.
+
+Author: Unknown
+Date: October 16, 2026
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between two callbacks for the same running directory
+DEFAULT_MIN_INTERVAL = 0.2
+
+
+class Cancelled(Exception):
+    """Raised inside a run when its :class:`CancellationToken` has been set."""
+
+
+class CancellationToken:
+    """
+    A flag that asks a running ``process_files`` call to stop.
+
+    Set it from any thread (e.g. a GUI button); worker processes see it too.
+    """
+
+    def __init__(self):
+        import multiprocessing
+        self._event = multiprocessing.Event()
+
+    def cancel(self) -> None:
+        """Ask the run to stop at the next chunk or directory."""
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether :meth:`cancel` has been called."""
+        return self._event.is_set()
+
+    def check(self) -> None:
+        """
+        Raise :class:`Cancelled` if the run should stop.
+
+        Raises:
+            Cancelled: If :meth:`cancel` has been called.
+        """
+        if self._event.is_set():
+            raise Cancelled()
+
+
+class Progress:
+    """
+    Snapshot of a run's progress, passed to the progress callback.
+
+    Attributes:
+        directory (Optional[str]): Directory the update is about.
+        stage (str): Its current stage (one of ``metrics.STAGES``), or ``done``.
+        directories_done (int): Directories finished so far.
+        directories_total (int): Directories in the run.
+        bytes_done (int): Input bytes read so far, including running directories.
+        tokens_done (int): Tokens lemmatized and counted in finished directories.
+        elapsed (float): Seconds since the run started.
+    """
+
+    def __init__(self, directory: Optional[str], stage: str, directories_done: int,
+                 directories_total: int, bytes_done: int, tokens_done: int, elapsed: float):
+        self.directory = directory
+        self.stage = stage
+        self.directories_done = directories_done
+        self.directories_total = directories_total
+        self.bytes_done = bytes_done
+        self.tokens_done = tokens_done
+        self.elapsed = elapsed
+
+    @property
+    def fraction(self) -> float:
+        """Share of the directories that are finished, from 0 to 1."""
+        return self.directories_done / self.directories_total if self.directories_total else 1.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        """Input throughput so far."""
+        return self.bytes_done / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Lemmatization throughput so far."""
+        return self.tokens_done / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """Estimated seconds left, from the time per finished directory; None before the first."""
+        if not self.directories_done:
+            return None
+        return self.elapsed / self.directories_done * (self.directories_total - self.directories_done)
+
+
+class ProgressTracker:
+    """
+    Collects the progress of all directories of a run and reports it to a callback.
+
+    The callback runs in whichever thread processes a directory; GUI code must
+    hand the update over to its own thread.
+    """
+
+    def __init__(self, callback: Callable[[Progress], None], directories_total: int,
+                 min_interval: float = DEFAULT_MIN_INTERVAL):
+        """
+        Args:
+            callback (Callable[[Progress], None]): Receives progress snapshots.
+            directories_total (int): Directories in the run.
+            min_interval (float): Minimum seconds between updates about a running
+                directory; stage changes and finished directories are always reported.
+        """
+        self.callback = callback
+        self.directories_total = directories_total
+        self.min_interval = min_interval
+        self.directories_done = 0
+        self.bytes_done = 0
+        self.tokens_done = 0
+        self._started = time.perf_counter()
+        self._last = 0.0
+        self._stages: Dict[int, str] = {}
+        self._running: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+
+    def _emit(self, directory: Optional[str], stage: str) -> None:
+        running_bytes = sum(metrics.bytes + metrics.bytes_reading for metrics in self._running.values())
+        snapshot = Progress(directory, stage, self.directories_done, self.directories_total,
+                            self.bytes_done + running_bytes, self.tokens_done,
+                            time.perf_counter() - self._started)
+        try:
+            self.callback(snapshot)
+        except Exception as e:
+            logger.warning(f"Progress callback failed: {e}")
+
+    def update(self, metrics: Any, stage: str) -> None:
+        """
+        Report that a directory entered a stage or read more input.
+
+        Args:
+            metrics (DirectoryMetrics): Statistics of the running directory.
+            stage (str): Stage it is in.
+        """
+        now = time.perf_counter()
+        with self._lock:
+            self._running[id(metrics)] = metrics
+            changed = self._stages.get(id(metrics)) != stage
+            if not changed and now - self._last < self.min_interval:
+                return
+            self._stages[id(metrics)] = stage
+            self._last = now
+            self._emit(metrics.directory, stage)
+
+    def finish(self, metrics: Any) -> None:
+        """
+        Report a finished directory.
+
+        Args:
+            metrics (DirectoryMetrics): Its final statistics.
+        """
+        with self._lock:
+            self._running.pop(id(metrics), None)
+            self._stages.pop(id(metrics), None)
+            self.directories_done += 1
+            self.bytes_done += metrics.bytes
+            self.tokens_done += metrics.tokens
+            self._last = time.perf_counter()
+            self._emit(metrics.directory, 'done')
+
+    def abandon(self, metrics: Any) -> None:
+        """Forget a directory that was cancelled or failed."""
+        with self._lock:
+            self._running.pop(id(metrics), None)
+            self._stages.pop(id(metrics), None)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# filepath: d:\GitHub\WordcloudSR\render_cache.py
+"""
+RenderCache: Content-Addressed Word Cloud Image Cache
+
+This module keeps rendered word cloud images in a directory, named by a
+fingerprint of everything that determines the image: the frequency table
+that is laid out and the rendering parameters. When a directory produces
+the same table as in an earlier run, the cached image is hard-linked (or
+copied, where links are not possible) to the output path and layout is
+skipped entirely.
+
+Entries are evicted in least-recently-used order (by modification time,
+which is refreshed on every hit) once the cache grows beyond its size
+limit. Several processes may share one cache directory.
+
+Author: Unknown
+Date: October 16, 2026
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_MB = 512
+
+# After eviction the cache is trimmed to this fraction of its limit, so a
+# full cache is not rescanned on every new entry
+_EVICT_TO = 0.9
+
+
+def _place(source: str, target: str) -> None:
+    """Hard-link (or copy) a file to a path, replacing whatever is there."""
+    tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        # Different file system, or links not supported
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+class RenderCache:
+    """
+    A directory of rendered images keyed by a fingerprint of their inputs.
+    """
+
+    def __init__(self, path: str, max_mb: int = DEFAULT_MAX_MB):
+        """
+        Open (or create) a render cache.
+
+        Args:
+            path (str): Cache directory.
+            max_mb (int): Maximum size of the cached images in megabytes.
+        """
+        self.path = path
+        self.max_bytes = max_mb * 1024 * 1024
+        self.evictions = 0
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, frequencies: Mapping[str, int], params: Mapping[str, Any]) -> str:
+        """
+        Fingerprint the inputs of one image.
+
+        Args:
+            frequencies (Mapping[str, int]): The frequency table that is laid out.
+            params (Mapping[str, Any]): JSON-serializable rendering parameters.
+
+        Returns:
+            str: Hex digest identifying the image.
+        """
+        payload = json.dumps({'words': sorted(frequencies.items()), 'params': params},
+                             sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry(self, key: str, output_path: str) -> str:
+        extension = os.path.splitext(output_path)[1]
+        return os.path.join(self.path, key[:2], f"{key}{extension}")
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """
+        Place a cached image at the output path.
+
+        Args:
+            key (str): Fingerprint from :meth:`key`.
+            output_path (str): Where the image is expected.
+
+        Returns:
+            bool: True on a cache hit, False if the image has to be rendered.
+        """
+        entry = self._entry(key, output_path)
+        try:
+            # Unchanged since the last run: the output already is the cached file
+            if not (os.path.exists(output_path) and os.path.samefile(entry, output_path)):
+                directory = os.path.dirname(output_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                _place(entry, output_path)
+            os.utime(entry)
+        except OSError:
+            # Not cached, or evicted by another process meanwhile
+            return False
+        logger.debug(f"Render cache hit for {output_path}")
+        return True
+
+    def store(self, key: str, output_path: str) -> None:
+        """
+        Add a freshly rendered image to the cache.
+
+        Args:
+            key (str): Fingerprint from :meth:`key`.
+            output_path (str): Path of the rendered image.
+        """
+        entry = self._entry(key, output_path)
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            _place(output_path, entry)
+            size = os.path.getsize(entry)
+        except OSError as e:
+            logger.warning(f"Could not add {output_path} to the render cache: {e}")
+            return
+        with self._lock:
+            if self._size is None:
+                self._evict()
+            else:
+                self._size += size
+                if self._size > self.max_bytes:
+                    self._evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for root, _, names in os.walk(self.path):
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self) -> None:
+        """Remove the least recently used images until the cache fits its limit."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            evicted = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes * _EVICT_TO:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                evicted += 1
+            self.evictions += evicted
+            logger.info(f"Render cache: evicted {evicted} images, {total / 1024 / 1024:.1f} MB left")
+        self._size = total
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return the size of the cache.
+
+        Returns:
+            Dict[str, float]: Entries, megabytes on disk and evictions by this instance.
+        """
+        entries = self._entries()
+        return {
+            'entries': len(entries),
+            'megabytes': sum(size for _, size, _ in entries) / 1024 / 1024,
+            'evictions': self.evictions,
+        }
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Sent to worker processes together with the other directory arguments
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_size'] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# filepath: d:\GitHub\WordcloudSR\results_db.py
+"""
+ResultsStore: SQLite Sink for Lemma Frequency Tables
+
+This module loads the lemma frequencies of every processed directory into a
+single SQLite database, next to (not instead of) the per-directory CSV files.
+Questions like "top lemmas across all folders since Monday" then become one
+indexed query instead of parsing thousands of CSVs.
+
+Tables are buffered and written in bulk, one transaction per batch of
+directories. A directory that is processed again (e.g. in an incremental
+run) is upserted: changed frequencies are updated in place and lemmas that
+disappeared are deleted.
+
+Usage:
+    python wordfrqsr.py --results-db output/results.sqlite
+    python results_db.py top --db output/results.sqlite --limit 20
+    python results_db.py top --db output/results.sqlite --since 2026-10-12 --per-directory
+    python results_db.py top --db output/results.sqlite --directory folder1
+    python results_db.py lemma --db output/results.sqlite --lemma grad
+    python results_db.py directories --db output/results.sqlite
+
+Author: Unknown
+Date: October 16, 2026
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Frequency rows buffered before they are written in one transaction
+DEFAULT_BATCH_ROWS = 500000
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS directories ("
+    "id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, updated REAL NOT NULL, "
+    "tokens INTEGER NOT NULL, lemmas INTEGER NOT NULL, batch INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS frequencies ("
+    "directory_id INTEGER NOT NULL REFERENCES directories (id), lemma TEXT NOT NULL, "
+    "frequency INTEGER NOT NULL, batch INTEGER NOT NULL, "
+    "PRIMARY KEY (directory_id, lemma)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS frequencies_lemma ON frequencies (lemma)",
+    "CREATE INDEX IF NOT EXISTS frequencies_directory ON frequencies (directory_id, frequency)",
+    "CREATE INDEX IF NOT EXISTS directories_updated ON directories (updated)",
+)
+
+
+def parse_since(value: str) -> float:
+    """
+    Convert an ISO date or date-time (e.g. ``2026-10-12``) to a Unix timestamp.
+
+    Args:
+        value (str): Local date or date-time.
+
+    Returns:
+        float: Seconds since the epoch.
+    """
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {value!r}, expected e.g. 2026-10-12")
+
+
+class ResultsStore:
+    """
+    Lemma frequencies of many directories in one SQLite database.
+    """
+
+    def __init__(self, path: str, batch_rows: int = DEFAULT_BATCH_ROWS):
+        """
+        Open (or create) a results database.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            batch_rows (int): Frequency rows buffered before a batch is written.
+        """
+        self.path = path
+        self.batch_rows = batch_rows
+        self.written = 0
+        self._pending: List[Tuple[str, List[Tuple[str, int]], float]] = []
+        self._pending_rows = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+    def add(self, name: str, frequencies: List[Tuple[str, int]]) -> None:
+        """
+        Queue the frequency table of a directory, writing a batch when enough rows are queued.
+
+        Args:
+            name (str): Directory name.
+            frequencies (List[Tuple[str, int]]): (lemma, frequency) pairs, stopwords removed.
+        """
+        self._pending.append((name, frequencies, time.time()))
+        self._pending_rows += len(frequencies)
+        if self._pending_rows >= self.batch_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all queued tables in a single transaction."""
+        if not self._pending:
+            return
+        started = time.perf_counter()
+        with self._conn:
+            batch = self._conn.execute(
+                "SELECT COALESCE(MAX(batch), 0) + 1 FROM directories").fetchone()[0]
+            for name, frequencies, updated in self._pending:
+                self._conn.execute(
+                    "INSERT INTO directories (name, updated, tokens, lemmas, batch) "
+                    "VALUES (?, ?, ?, ?, ?) ON CONFLICT (name) DO UPDATE SET "
+                    "updated = excluded.updated, tokens = excluded.tokens, "
+                    "lemmas = excluded.lemmas, batch = excluded.batch",
+                    (name, updated, sum(count for _, count in frequencies), len(frequencies), batch)
+                )
+                directory_id = self._conn.execute(
+                    "SELECT id FROM directories WHERE name = ?", (name,)).fetchone()[0]
+                self._conn.executemany(
+                    "INSERT INTO frequencies (directory_id, lemma, frequency, batch) "
+                    "VALUES (?, ?, ?, ?) ON CONFLICT (directory_id, lemma) DO UPDATE SET "
+                    "frequency = excluded.frequency, batch = excluded.batch",
+                    ((directory_id, lemma, count, batch) for lemma, count in frequencies)
+                )
+                # Lemmas not seen in this run of the directory are stale
+                self._conn.execute(
+                    "DELETE FROM frequencies WHERE directory_id = ? AND batch <> ?",
+                    (directory_id, batch)
+                )
+        logger.info(f"Wrote {len(self._pending)} frequency tables ({self._pending_rows} rows) "
+                    f"to {self.path} in {time.perf_counter() - started:.2f}s")
+        self.written += len(self._pending)
+        self._pending = []
+        self._pending_rows = 0
+
+    def _since_clause(self, since: Optional[float]) -> Tuple[str, tuple]:
+        return ("WHERE d.updated >= ?", (since,)) if since is not None else ("", ())
+
+    def top(self, limit: int = 20, directory: Optional[str] = None,
+            since: Optional[float] = None) -> List[Tuple[str, int]]:
+        """
+        Return the most frequent lemmas of one directory, or summed over all directories.
+
+        Args:
+            limit (int): Number of lemmas.
+            directory (Optional[str]): Directory name; None for all directories.
+            since (Optional[float]): Only directories updated at or after this Unix time.
+
+        Returns:
+            List[Tuple[str, int]]: (lemma, frequency) pairs, most frequent first.
+        """
+        if directory is not None:
+            return self._conn.execute(
+                "SELECT f.lemma, f.frequency FROM frequencies f "
+                "JOIN directories d ON d.id = f.directory_id WHERE d.name = ? "
+                + ("AND d.updated >= ? " if since is not None else "")
+                + "ORDER BY f.frequency DESC, f.lemma LIMIT ?",
+                (directory,) + ((since,) if since is not None else ()) + (limit,)
+            ).fetchall()
+        where, params = self._since_clause(since)
+        return self._conn.execute(
+            "SELECT f.lemma, SUM(f.frequency) AS total FROM frequencies f "
+            f"JOIN directories d ON d.id = f.directory_id {where} "
+            "GROUP BY f.lemma ORDER BY total DESC, f.lemma LIMIT ?",
+            params + (limit,)
+        ).fetchall()
+
+    def top_per_directory(self, limit: int = 20,
+                          since: Optional[float] = None) -> Dict[str, List[Tuple[str, int]]]:
+        """
+        Return the most frequent lemmas of every directory.
+
+        Args:
+            limit (int): Number of lemmas per directory.
+            since (Optional[float]): Only directories updated at or after this Unix time.
+
+        Returns:
+            Dict[str, List[Tuple[str, int]]]: Directory name to (lemma, frequency) pairs.
+        """
+        return {name: self.top(limit, name) for name, _, _, _ in self.directories(since)}
+
+    def lemma(self, lemma: str, limit: Optional[int] = None,
+              since: Optional[float] = None) -> List[Tuple[str, int]]:
+        """
+        Return the directories that use a lemma most.
+
+        Args:
+            lemma (str): Lemma to look up.
+            limit (Optional[int]): Number of directories; None for all.
+            since (Optional[float]): Only directories updated at or after this Unix time.
+
+        Returns:
+            List[Tuple[str, int]]: (directory, frequency) pairs, most frequent first.
+        """
+        return self._conn.execute(
+            "SELECT d.name, f.frequency FROM frequencies f "
+            "JOIN directories d ON d.id = f.directory_id WHERE f.lemma = ? "
+            + ("AND d.updated >= ? " if since is not None else "")
+            + "ORDER BY f.frequency DESC, d.name LIMIT ?",
+            (lemma,) + ((since,) if since is not None else ()) + (limit if limit is not None else -1,)
+        ).fetchall()
+
+    def directories(self, since: Optional[float] = None) -> List[Tuple[str, float, int, int]]:
+        """
+        Return the stored directories.
+
+        Args:
+            since (Optional[float]): Only directories updated at or after this Unix time.
+
+        Returns:
+            List[Tuple[str, float, int, int]]: Name, last update (Unix time), tokens and
+            distinct lemmas of each directory, by name.
+        """
+        where, params = self._since_clause(since)
+        return self._conn.execute(
+            f"SELECT d.name, d.updated, d.tokens, d.lemmas FROM directories d {where} ORDER BY d.name",
+            params
+        ).fetchall()
+
+    def close(self) -> None:
+        """Write any queued tables and close the database connection."""
+        try:
+            self.flush()
+        finally:
+            self._conn.close()
+
+    def __enter__(self) -> "ResultsStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _print_table(rows: Iterable[Tuple[str, int]], indent: str = "") -> None:
+    for key, value in rows:
+        print(f"{indent}{key:<30} {value:>10}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Query a results database."""
+    parser = argparse.ArgumentParser(description='WordcloudSR - results database queries')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    top = subparsers.add_parser('top', help='Most frequent lemmas, globally or per directory')
+    scope = top.add_mutually_exclusive_group()
+    scope.add_argument('--directory', default=None, help='Only this directory')
+    scope.add_argument('--per-directory', action='store_true', help='Top lemmas of every directory')
+    top.add_argument('--limit', type=int, default=20, help='Number of lemmas (default: 20)')
+
+    lemma = subparsers.add_parser('lemma', help='Directories that use a lemma most')
+    lemma.add_argument('--lemma', required=True, help='Lemma to look up')
+    lemma.add_argument('--limit', type=int, default=20, help='Number of directories (default: 20)')
+
+    directories = subparsers.add_parser('directories', help='List stored directories')
+
+    for sub in (top, lemma, directories):
+        sub.add_argument('--db', required=True, help='Results database written with --results-db')
+        sub.add_argument('--since', type=parse_since, default=None,
+                         help='Only directories processed at or after this date, e.g. 2026-10-12')
+
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        parser.error(f"results database {args.db} does not exist")
+
+    with ResultsStore(args.db) as store:
+        if args.command == 'top':
+            if args.per_directory:
+                for name, rows in store.top_per_directory(args.limit, args.since).items():
+                    print(name)
+                    _print_table(rows, "  ")
+            else:
+                _print_table(store.top(args.limit, args.directory, args.since))
+        elif args.command == 'lemma':
+            _print_table(store.lemma(args.lemma, args.limit, args.since))
+        else:
+            for name, updated, tokens, lemmas in store.directories(args.since):
+                stamp = datetime.fromtimestamp(updated).isoformat(sep=' ', timespec='seconds')
+                print(f"{name:<30} {stamp}  {tokens:>10} tokens  {lemmas:>8} lemmas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+# filepath: d:\GitHub\WordcloudSR\service.py
+"""
+WordcloudSR Local HTTP Service
+
+This script runs WordcloudSR as a long-running local service, so a web
+application can lemmatize text, count lemma frequencies and render word
+clouds on demand without starting an interpreter, importing matplotlib and
+launching TreeTagger for every request.
+
+The taggers are started once and kept warm. Concurrent requests are
+coalesced: texts arriving within a short batching window are sent to a
+tagger together in a single ``lemmatize_many`` call, so many small articles
+cost one TreeTagger round trip instead of one each. Clients are served by an
+asyncio front end; tagging and rendering run in worker threads.
+
+Endpoints (the text is the UTF-8 request body, or ``{"text": ...}`` JSON):
+    POST /lemmatize                      JSON with the lemmatized text
+    POST /frequencies?format=json|csv    lemma frequencies, stopwords removed (limit=N)
+    POST /wordcloud?format=png|webp|jpeg|svg
+                                         word cloud image (width, height, max_words,
+                                         scale, collocations=1)
+    GET  /health                         JSON with batching statistics
+
+Usage:
+    python service.py --port 8765 --stopwords stopwords.txt --service-taggers 2
+    python service.py --fake-tagger      # no TreeTagger needed, for testing
+    curl --data-binary @article.txt 'http://127.0.0.1:8765/wordcloud?format=png' -o cloud.png
+    curl --data-binary @article.txt 'http://127.0.0.1:8765/frequencies?format=csv&limit=50'
+
+Author: Unknown
+Date: October 16, 2026
+"""
+
+import io
+import csv
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from http import HTTPStatus
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from SerbianTagger import DEFAULT_BATCH_CHARS, LemmatizerBackend, create_tagger
+from lemma_cache import DEFAULT_MAX_ENTRIES
+from wordcloudsr import cloud_frequencies, generate_wordcloud_from_frequencies
+from wordfrqsr import count_lemma_tokens, sort_lemma_counts
+from utils import (
+    DEFAULT_CHUNK_SIZE,
+    IMAGE_FORMATS,
+    LAYOUT_ENGINES,
+    chunk_sentences,
+    count_lemmas_and_bigrams,
+    load_stopwords,
+    setup_logging,
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds a batch waits for more texts after its first one arrives
+DEFAULT_BATCH_WINDOW = 0.005
+
+# Largest accepted request body, in bytes
+DEFAULT_MAX_BODY = 16 << 20
+
+# Largest accepted word cloud side, in pixels
+MAX_IMAGE_SIDE = 8000
+
+_CONTENT_TYPES = {'png': 'image/png', 'webp': 'image/webp', 'jpeg': 'image/jpeg',
+                  'svg': 'image/svg+xml', 'json': 'application/json',
+                  'csv': 'text/csv; charset=utf-8'}
+
+Response = Tuple[int, str, bytes]
+
+
+class HttpError(Exception):
+    """An error reported to the client with an HTTP status code."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class LemmaBatcher:
+    """
+    Coalesces concurrent lemmatization requests into batched tagger calls.
+
+    Every tagger is owned by one consumer task, so taggers that are not
+    thread-safe are never used by two threads at once. A consumer takes the
+    next queued text, waits ``window`` seconds for more to arrive, and sends
+    up to ``batch_chars`` characters to its tagger in one call.
+    """
+
+    def __init__(self, taggers: Sequence[LemmatizerBackend], window: float = DEFAULT_BATCH_WINDOW,
+                 batch_chars: int = DEFAULT_BATCH_CHARS):
+        """
+        Args:
+            taggers (Sequence[LemmatizerBackend]): Warm taggers, used concurrently.
+            window (float): Seconds a batch waits for more texts; 0 sends what is queued.
+            batch_chars (int): Approximate number of characters per tagger call.
+        """
+        self.taggers = list(taggers)
+        self.window = window
+        self.batch_chars = batch_chars
+        self.batches = 0
+        self.texts = 0
+        self.chars = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._executor = ThreadPoolExecutor(max_workers=len(self.taggers),
+                                            thread_name_prefix='service-tagger')
+
+    def start(self) -> None:
+        """Start one consumer task per tagger on the running event loop."""
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._consume(tagger)) for tagger in self.taggers]
+
+    async def lemmatize(self, text: str) -> str:
+        """
+        Lemmatize one text as part of the next batch.
+
+        Args:
+            text (str): Text of at most about ``batch_chars`` characters.
+
+        Returns:
+            str: Space-separated lemmas.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _consume(self, tagger: LemmatizerBackend) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            if size < self.batch_chars and self.window > 0:
+                await asyncio.sleep(self.window)
+            while size < self.batch_chars and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                size += len(batch[-1][0])
+            texts = [text for text, _ in batch]
+            try:
+                lemmatized = await loop.run_in_executor(self._executor, tagger.lemmatize_many,
+                                                        texts, self.batch_chars)
+            except Exception as e:
+                logger.error(f"Batch of {len(texts)} texts failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += len(texts)
+            self.chars += size
+            for (_, future), result in zip(batch, lemmatized):
+                # The client may have disconnected in the meantime
+                if not future.done():
+                    future.set_result(result or "")
+
+    async def close(self) -> None:
+        """Stop the consumer tasks and the tagger threads."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+
+
+def _int_param(query: Dict[str, List[str]], name: str, default: int,
+               minimum: int = 1, maximum: Optional[int] = None) -> int:
+    """Read an integer query parameter within bounds."""
+    try:
+        value = int(query[name][-1]) if name in query else default
+    except ValueError:
+        raise HttpError(400, f"{name} must be an integer")
+    if value < minimum or (maximum is not None and value > maximum):
+        raise HttpError(400, f"{name} must be between {minimum} and {maximum}")
+    return value
+
+
+def _bool_param(query: Dict[str, List[str]], name: str, default: bool) -> bool:
+    """Read a boolean query parameter (1/0, true/false, yes/no)."""
+    if name not in query:
+        return default
+    return query[name][-1].lower() in ('1', 'true', 'yes', 'on')
+
+
+def encode_wordcloud(wordcloud: Any, image_format: str) -> bytes:
+    """
+    Encode a word cloud as an image file in memory.
+
+    Args:
+        wordcloud (WordCloud): Laid out word cloud.
+        image_format (str): One of ``IMAGE_FORMATS``.
+
+    Returns:
+        bytes: The image file, as :func:`wordcloudsr.save_wordcloud` would write it.
+    """
+    if image_format == 'svg':
+        return wordcloud.to_svg().encode('utf-8')
+    buffer = io.BytesIO()
+    options = {'quality': 95} if image_format in ('jpeg', 'webp') else {}
+    wordcloud.to_image().save(buffer, format=image_format.upper(), **options)
+    return buffer.getvalue()
+
+
+class WordcloudService:
+    """
+    Request handlers of the HTTP service, independent of the transport.
+
+    :meth:`handle` can be called directly (e.g. with a fake tagger in tests);
+    :meth:`serve` exposes it over HTTP.
+    """
+
+    def __init__(self, taggers: Sequence[LemmatizerBackend], stopwords: Set[str],
+                 window: float = DEFAULT_BATCH_WINDOW, batch_chars: int = DEFAULT_BATCH_CHARS,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, render_workers: int = 2,
+                 layout_engine: str = 'wordcloud', max_body: int = DEFAULT_MAX_BODY):
+        """
+        Args:
+            taggers (Sequence[LemmatizerBackend]): Warm taggers; closed with the service.
+            stopwords (Set[str]): Lemmas left out of frequencies and word clouds.
+            window (float): Batching window in seconds.
+            batch_chars (int): Approximate number of characters per tagger call.
+            chunk_size (int): Longer texts are split at sentence ends into chunks of this size.
+            render_workers (int): Threads counting lemmas and laying out word clouds.
+            layout_engine (str): Word placement engine, one of ``LAYOUT_ENGINES``.
+            max_body (int): Largest accepted request body, in bytes.
+        """
+        self.stopwords = stopwords
+        self.chunk_size = chunk_size
+        self.layout_engine = layout_engine
+        self.max_body = max_body
+        self.batcher = LemmaBatcher(taggers, window, batch_chars)
+        self.requests = 0
+        self.started = time.time()
+        self._render = ThreadPoolExecutor(max_workers=max(1, render_workers),
+                                          thread_name_prefix='service-render')
+        self._routes: Dict[Tuple[str, str], Callable] = {
+            ('POST', '/lemmatize'): self.lemmatize,
+            ('POST', '/frequencies'): self.frequencies,
+            ('POST', '/wordcloud'): self.wordcloud,
+            ('GET', '/health'): self.health,
+        }
+
+    async def start(self) -> None:
+        """Start batching; must be called on the event loop that serves requests."""
+        self.batcher.start()
+
+    async def close(self) -> None:
+        """Stop batching and rendering and close the taggers."""
+        await self.batcher.close()
+        self._render.shutdown(wait=True)
+        for tagger in self.batcher.taggers:
+            tagger.close()
+
+    async def lemmatize_text(self, text: str) -> str:
+        """
+        Lemmatize a text of any length through the batcher.
+
+        Args:
+            text (str): Text to lemmatize.
+
+        Returns:
+            str: Space-separated lemmas.
+        """
+        chunks = list(chunk_sentences([text], self.chunk_size))
+        lemmatized = await asyncio.gather(*(self.batcher.lemmatize(chunk) for chunk in chunks))
+        return " ".join(chunk for chunk in lemmatized if chunk)
+
+    async def _in_render_thread(self, func: Callable, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._render, func, *args)
+
+    async def lemmatize(self, text: str, query: Dict[str, List[str]]) -> Response:
+        """Handle ``POST /lemmatize``."""
+        lemmatized = await self.lemmatize_text(text)
+        return self._json({'lemmas': lemmatized, 'tokens': len(lemmatized.split())})
+
+    async def frequencies(self, text: str, query: Dict[str, List[str]]) -> Response:
+        """Handle ``POST /frequencies``."""
+        output_format = query.get('format', ['json'])[-1]
+        if output_format not in ('json', 'csv'):
+            raise HttpError(400, "format must be json or csv")
+        limit = _int_param(query, 'limit', 0, minimum=0)
+        lemmatized = await self.lemmatize_text(text)
+        frequencies = await self._in_render_thread(
+            lambda: sort_lemma_counts(count_lemma_tokens([lemmatized]), self.stopwords))
+        if limit:
+            frequencies = frequencies[:limit]
+        if output_format == 'json':
+            return self._json({'frequencies': frequencies})
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['Lemma', 'Frequency'])
+        writer.writerows(frequencies)
+        return 200, _CONTENT_TYPES['csv'], buffer.getvalue().encode('utf-8')
+
+    async def wordcloud(self, text: str, query: Dict[str, List[str]]) -> Response:
+        """Handle ``POST /wordcloud``."""
+        image_format = query.get('format', ['png'])[-1]
+        if image_format not in IMAGE_FORMATS:
+            raise HttpError(400, f"format must be one of {', '.join(sorted(IMAGE_FORMATS))}")
+        width = _int_param(query, 'width', 1200, maximum=MAX_IMAGE_SIDE)
+        height = _int_param(query, 'height', 800, maximum=MAX_IMAGE_SIDE)
+        max_words = _int_param(query, 'max_words', 200, maximum=10000)
+        collocations = _bool_param(query, 'collocations', False)
+        try:
+            scale = float(query.get('scale', ['1'])[-1])
+        except ValueError:
+            raise HttpError(400, "scale must be a number")
+        if not 0 < scale <= 4 or max(width, height) * scale > MAX_IMAGE_SIDE:
+            raise HttpError(400, f"scale must be in (0, 4] and the image at most {MAX_IMAGE_SIDE} pixels wide")
+
+        lemmatized = await self.lemmatize_text(text)
+
+        def render() -> Optional[bytes]:
+            lemma_freq, bigram_freq = count_lemmas_and_bigrams([lemmatized])
+            standard, collocated = cloud_frequencies(lemma_freq, bigram_freq, self.stopwords,
+                                                     collocations, max_words)
+            table = collocated if collocations else standard
+            wordcloud = generate_wordcloud_from_frequencies(table.items(), width, height, max_words,
+                                                            scale, self.layout_engine)
+            return encode_wordcloud(wordcloud, image_format) if wordcloud else None
+
+        image = await self._in_render_thread(render)
+        if image is None:
+            raise HttpError(422, "no words left for a word cloud")
+        return 200, _CONTENT_TYPES[image_format], image
+
+    async def health(self, text: str, query: Dict[str, List[str]]) -> Response:
+        """Handle ``GET /health``."""
+        batcher = self.batcher
+        return self._json({
+            'status': 'ok',
+            'uptime_seconds': round(time.time() - self.started, 3),
+            'taggers': len(batcher.taggers),
+            'requests': self.requests,
+            'batches': batcher.batches,
+            'batched_texts': batcher.texts,
+            'batched_chars': batcher.chars,
+        })
+
+    @staticmethod
+    def _json(payload: Any, status: int = 200) -> Response:
+        return status, _CONTENT_TYPES['json'], json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+    @staticmethod
+    def _decode_body(body: bytes, content_type: str) -> str:
+        """Return the text of a request body: UTF-8 text, or JSON with a ``text`` field."""
+        try:
+            text = body.decode('utf-8')
+        except UnicodeDecodeError:
+            raise HttpError(400, "request body must be UTF-8 text")
+        if content_type.split(';')[0].strip() == 'application/json':
+            try:
+                text = json.loads(text)['text']
+            except (ValueError, KeyError, TypeError):
+                raise HttpError(400, 'JSON body must be an object with a "text" field')
+            if not isinstance(text, str):
+                raise HttpError(400, '"text" must be a string')
+        return text
+
+    async def handle(self, method: str, target: str, body: bytes = b'',
+                     content_type: str = 'text/plain') -> Response:
+        """
+        Answer one request.
+
+        Args:
+            method (str): HTTP method.
+            target (str): Request path with query string.
+            body (bytes): Request body.
+            content_type (str): Content type of the body.
+
+        Returns:
+            Tuple[int, str, bytes]: Status code, content type and response body.
+        """
+        url = urlsplit(target)
+        handler = self._routes.get((method, url.path))
+        try:
+            if handler is None:
+                known = [path for _, path in self._routes if path == url.path]
+                raise HttpError(405 if known else 404, f"no route for {method} {url.path}")
+            self.requests += 1
+            text = self._decode_body(body, content_type) if method == 'POST' else ''
+            return await handler(text, parse_qs(url.query))
+        except HttpError as e:
+            return self._json({'error': str(e)}, e.status)
+        except Exception as e:
+            logger.error(f"Request {method} {url.path} failed: {e}")
+            return self._json({'error': 'internal error'}, 500)
+
+    async def _read_request(self, reader: asyncio.StreamReader
+                            ) -> Optional[Tuple[str, str, str, Dict[str, str], bytes]]:
+        """Read one HTTP/1.x request; None when the client closed the connection."""
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise HttpError(400, "malformed request line")
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if 'transfer-encoding' in headers:
+            raise HttpError(411, "chunked bodies are not supported, send Content-Length")
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HttpError(400, "invalid Content-Length")
+        if length > self.max_body:
+            raise HttpError(413, f"request body larger than {self.max_body} bytes")
+        body = await reader.readexactly(length) if length else b''
+        return method, target, version, headers, body
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    await self._write(writer, *self._json({'error': str(e)}, e.status), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+                response = await self.handle(method, target, body,
+                                             headers.get('content-type', 'text/plain'))
+                await self._write(writer, *response, keep_alive=keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, status: int, content_type: str, body: bytes,
+                     keep_alive: bool) -> None:
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8765,
+                    ready: Optional[Callable[[int], None]] = None) -> None:
+        """
+        Serve HTTP requests until cancelled.
+
+        Args:
+            host (str): Address to listen on; keep the default to stay local.
+            port (int): Port to listen on; 0 picks a free port.
+            ready (Optional[Callable[[int], None]]): Called with the bound port once listening.
+        """
+        await self.start()
+        server = await asyncio.start_server(self._serve_client, host, port)
+        bound = server.sockets[0].getsockname()[1]
+        logger.info(f"WordcloudSR service listening on http://{host}:{bound} "
+                    f"with {len(self.batcher.taggers)} taggers")
+        if ready is not None:
+            ready(bound)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.close()
+
+
+def parse_arguments(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Parse command-line arguments of the service.
+
+    Returns:
+        Dict[str, Any]: Dictionary containing parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description='WordcloudSR - local HTTP service')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    parser.add_argument('--stopwords', default='stopwords.txt',
+                        help='Stopwords file path (default: stopwords.txt)')
+    parser.add_argument('--service-taggers', type=int, default=1,
+                        help='Warm taggers serving batches concurrently (default: 1)')
+    parser.add_argument('--taggers', type=int, default=1,
+                        help='TreeTagger processes per tagger (default: 1)')
+    parser.add_argument('--lemma-cache', default=None, help='SQLite file for a persistent lemma cache')
+    parser.add_argument('--lemma-cache-size', type=int, default=DEFAULT_MAX_ENTRIES,
+                        help=f'Maximum number of cached sentences (default: {DEFAULT_MAX_ENTRIES})')
+    parser.add_argument('--lexicon', default=None, help='Lexicon file for the in-process lemmatizer')
+    parser.add_argument('--batch-window', type=float, default=DEFAULT_BATCH_WINDOW,
+                        help=f'Seconds to wait for more texts per batch (default: {DEFAULT_BATCH_WINDOW})')
+    parser.add_argument('--batch-chars', type=int, default=DEFAULT_BATCH_CHARS,
+                        help=f'Characters per tagger call (default: {DEFAULT_BATCH_CHARS})')
+    parser.add_argument('--render-workers', type=int, default=2,
+                        help='Threads laying out word clouds (default: 2)')
+    parser.add_argument('--layout-engine', default='wordcloud', choices=LAYOUT_ENGINES,
+                        help='Word placement engine (default: wordcloud)')
+    parser.add_argument('--fake-tagger', action='store_true',
+                        help='Use the deterministic benchmark tagger instead of TreeTagger (testing)')
+    parser.add_argument('--debug', action='store_true', help='Enable debug logging')
+    return vars(parser.parse_args(argv))
+
+
+def create_service(args: Dict[str, Any]) -> WordcloudService:
+    """
+    Start the taggers and build the service from parsed arguments.
+
+    Args:
+        args (Dict[str, Any]): Arguments from :func:`parse_arguments`.
+
+    Returns:
+        WordcloudService: The service, not yet listening.
+    """
+    count = max(1, args['service_taggers'])
+    if args['fake_tagger']:
+        from benchmark import FakeTagger
+        taggers = [FakeTagger() for _ in range(count)]
+    else:
+        logger.info(f"Starting {count} Serbian TreeTagger instances")
+        taggers = [create_tagger(pool_size=args['taggers'], lexicon_path=args['lexicon'],
+                                 cache_path=args['lemma_cache'], cache_size=args['lemma_cache_size'])
+                   for _ in range(count)]
+    return WordcloudService(taggers, load_stopwords(args['stopwords']),
+                            window=args['batch_window'], batch_chars=args['batch_chars'],
+                            render_workers=args['render_workers'],
+                            layout_engine=args['layout_engine'])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the service until interrupted."""
+    args = parse_arguments(argv)
+    setup_logging(args['debug'])
+    service = create_service(args)
+    try:
+        asyncio.run(service.serve(args['host'], args['port']))
+    except KeyboardInterrupt:
+        logger.info("WordcloudSR service stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
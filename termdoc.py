@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# filepath: d:\GitHub\WordcloudSR\termdoc.py
+"""
+TermDoc: Term-Document Matrix and Distinctive-Word Clouds
+
+This module saves the lemma counts of a batch as a sparse term-document
+matrix (one row per directory, one column per lemma) and weights it so that
+each folder's word cloud shows what is distinctive about it rather than
+what is merely frequent:
+
+    - ``tfidf``: term frequency times smoothed inverse document frequency.
+    - ``log-odds``: z-scores of the log-odds ratio of a lemma in a folder
+      versus the rest of the corpus, with an informative Dirichlet prior
+      (Monroe, Colaresi and Quinn, "Fightin' Words").
+
+The matrix is stored in compressed sparse row form in a single ``.npz``
+file, stopwords and punctuation included, so clouds can be re-weighted and
+re-rendered later (with other stopwords, too) without running TreeTagger.
+All weights are computed over the non-zero entries at once with NumPy.
+
+Usage:
+    python wordfrqsr.py --term-matrix output/terms.npz --weighting tfidf
+    python termdoc.py render --matrix output/terms.npz --weighting log-odds --output output
+    python termdoc.py top --matrix output/terms.npz --weighting tfidf --limit 10
+
+Author: Unknown
+Date: October 16, 2026
+"""
+
+import os
+import sys
+import logging
+import argparse
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from vocabulary import CountStore
+from utils import IMAGE_FORMATS, is_cloud_word, load_stopwords, setup_logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRIOR = 0.01
+
+
+def _encode_strings(strings: List[str]) -> np.ndarray:
+    """Pack strings into one UTF-8 byte array, so the file loads without pickle."""
+    return np.frombuffer("\n".join(strings).encode('utf-8'), dtype=np.uint8)
+
+
+def _decode_strings(data: np.ndarray, count: int) -> List[str]:
+    return data.tobytes().decode('utf-8').split("\n") if count else []
+
+
+class TermDocumentMatrix:
+    """
+    Lemma counts of a batch as a sparse directories × lemmas matrix.
+
+    Stored in compressed sparse row form: the counts of row ``i`` are
+    ``data[indptr[i]:indptr[i + 1]]`` in the columns
+    ``indices[indptr[i]:indptr[i + 1]]``.
+    """
+
+    def __init__(self, directories: List[str], lemmas: List[str], indptr: np.ndarray,
+                 indices: np.ndarray, data: np.ndarray):
+        """
+        Args:
+            directories (List[str]): Directory name of each row.
+            lemmas (List[str]): Lemma of each column.
+            indptr (np.ndarray): Start of each row in ``indices``/``data``, plus the end.
+            indices (np.ndarray): Column of each non-zero entry.
+            data (np.ndarray): Count of each non-zero entry.
+        """
+        self.directories = directories
+        self.lemmas = lemmas
+        self.indptr = indptr.astype(np.int64, copy=False)
+        self.indices = indices.astype(np.uint32, copy=False)
+        self.data = data
+
+    @classmethod
+    def from_store(cls, store: CountStore) -> "TermDocumentMatrix":
+        """
+        Build the matrix from the counts of a batch.
+
+        Args:
+            store (CountStore): Lemma counts per directory, e.g. ``results.counts``
+                of ``wordfrqsr.process_files(keep_counts=True)``.
+
+        Returns:
+            TermDocumentMatrix: One row per stored directory, in insertion order. Only
+            lemmas that occur in the batch get a column.
+        """
+        directories = list(store)
+        rows = [store[name] for name in directories]
+        lengths = np.fromiter((len(counts) for counts in rows), dtype=np.int64, count=len(rows))
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        if rows:
+            ids = np.concatenate([counts.ids for counts in rows])
+            data = np.concatenate([counts.counts.astype(np.uint64) for counts in rows])
+        else:
+            ids = np.zeros(0, dtype=np.uint32)
+            data = np.zeros(0, dtype=np.uint64)
+        if not data.size or data.max() <= np.iinfo(np.uint32).max:
+            data = data.astype(np.uint32)
+
+        # The shared vocabulary may hold lemmas of other batches; renumber the used ones
+        used, indices = np.unique(ids, return_inverse=True)
+        lemmas = store.vocabulary.lookup(used.tolist())
+        return cls(directories, lemmas, indptr, indices.reshape(-1), data)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """(directories, lemmas)."""
+        return len(self.directories), len(self.lemmas)
+
+    @property
+    def nnz(self) -> int:
+        """Number of non-zero entries."""
+        return int(self.data.size)
+
+    def row_ids(self) -> np.ndarray:
+        """Return the row of every non-zero entry."""
+        return np.repeat(np.arange(len(self.directories)), np.diff(self.indptr))
+
+    def select_columns(self, keep: np.ndarray) -> "TermDocumentMatrix":
+        """
+        Drop lemmas from the matrix.
+
+        Args:
+            keep (np.ndarray): Boolean mask over the columns.
+
+        Returns:
+            TermDocumentMatrix: The matrix with only the kept columns.
+        """
+        entries = keep[self.indices]
+        new_columns = np.cumsum(keep) - 1
+        indptr = np.zeros_like(self.indptr)
+        np.cumsum(np.bincount(self.row_ids()[entries], minlength=len(self.directories)), out=indptr[1:])
+        lemmas = [lemma for lemma, kept in zip(self.lemmas, keep.tolist()) if kept]
+        return TermDocumentMatrix(self.directories, lemmas, indptr,
+                                  new_columns[self.indices[entries]], self.data[entries])
+
+    def without(self, stopwords: Optional[Set[str]] = None) -> "TermDocumentMatrix":
+        """
+        Drop stopwords and lemmas a word cloud would not display.
+
+        Args:
+            stopwords (Optional[Set[str]]): Lemmas to leave out.
+
+        Returns:
+            TermDocumentMatrix: The matrix without those columns.
+        """
+        stopwords = stopwords or set()
+        keep = np.fromiter((lemma not in stopwords and is_cloud_word(lemma) for lemma in self.lemmas),
+                           dtype=bool, count=len(self.lemmas))
+        return self.select_columns(keep)
+
+    def save(self, path: str) -> None:
+        """
+        Write the matrix to a compressed ``.npz`` file.
+
+        Args:
+            path (str): Output file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(path, indptr=self.indptr, indices=self.indices, data=self.data,
+                            lemmas=_encode_strings(self.lemmas),
+                            directories=_encode_strings(self.directories),
+                            shape=np.asarray(self.shape, dtype=np.int64))
+        logger.info(f"Saved {self.shape[0]} x {self.shape[1]} term-document matrix "
+                    f"({self.nnz} entries) to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "TermDocumentMatrix":
+        """
+        Read a matrix written by :meth:`save`.
+
+        Args:
+            path (str): ``.npz`` file.
+
+        Returns:
+            TermDocumentMatrix: The stored matrix.
+        """
+        with np.load(path, allow_pickle=False) as arrays:
+            rows, cols = arrays['shape'].tolist()
+            return cls(_decode_strings(arrays['directories'], rows),
+                       _decode_strings(arrays['lemmas'], cols),
+                       arrays['indptr'], arrays['indices'], arrays['data'])
+
+
+def tfidf_weights(matrix: TermDocumentMatrix, sublinear: bool = True) -> np.ndarray:
+    """
+    TF-IDF weight of every non-zero entry.
+
+    Args:
+        matrix (TermDocumentMatrix): Lemma counts.
+        sublinear (bool): Use ``1 + log(count)`` as term frequency, so a handful of
+            very frequent lemmas do not dominate a cloud.
+
+    Returns:
+        np.ndarray: Weights, aligned with ``matrix.data``.
+    """
+    counts = matrix.data.astype(np.float64)
+    tf = 1.0 + np.log(counts) if sublinear else counts
+    documents = np.bincount(matrix.indices, minlength=len(matrix.lemmas))
+    # Smoothed idf: lemmas found in every folder keep a small positive weight
+    idf = np.log((1.0 + len(matrix.directories)) / (1.0 + documents)) + 1.0
+    return tf * idf[matrix.indices]
+
+
+def log_odds_weights(matrix: TermDocumentMatrix, prior: float = DEFAULT_PRIOR) -> np.ndarray:
+    """
+    Log-odds z-score of every non-zero entry, each folder against the rest of the corpus.
+
+    The prior of a lemma is proportional to its corpus frequency, scaled so that
+    the prior counts sum to ``prior`` times the corpus size.
+
+    Args:
+        matrix (TermDocumentMatrix): Lemma counts.
+        prior (float): Strength of the informative Dirichlet prior.
+
+    Returns:
+        np.ndarray: z-scores, aligned with ``matrix.data``; positive where a lemma is
+        more frequent in the folder than elsewhere.
+    """
+    counts = matrix.data.astype(np.float64)
+    corpus = np.bincount(matrix.indices, weights=counts, minlength=len(matrix.lemmas))
+    total = corpus.sum()
+    rows = matrix.row_ids()
+    # bincount, unlike add.reduceat, also copes with folders that have no entries
+    folder_totals = np.bincount(rows, weights=counts, minlength=len(matrix.directories))
+    row_totals = folder_totals[rows]
+
+    alpha_total = prior * total
+    alpha = alpha_total * corpus[matrix.indices] / total
+    rest = corpus[matrix.indices] - counts
+    rest_totals = total - row_totals
+
+    folder_odds = np.log(counts + alpha) - np.log(row_totals + alpha_total - counts - alpha)
+    rest_odds = np.log(rest + alpha) - np.log(rest_totals + alpha_total - rest - alpha)
+    variance = 1.0 / (counts + alpha) + 1.0 / (rest + alpha)
+    return (folder_odds - rest_odds) / np.sqrt(variance)
+
+
+WEIGHTINGS: Dict[str, Callable[[TermDocumentMatrix], np.ndarray]] = {
+    'tfidf': tfidf_weights,
+    'log-odds': log_odds_weights,
+}
+
+
+def weighted_frequencies(matrix: TermDocumentMatrix, weighting: str,
+                         stopwords: Optional[Set[str]] = None,
+                         limit: Optional[int] = None) -> Dict[str, List[Tuple[str, float]]]:
+    """
+    Weight the matrix and return the distinctive lemmas of every folder.
+
+    Args:
+        matrix (TermDocumentMatrix): Lemma counts.
+        weighting (str): One of ``WEIGHTINGS``.
+        stopwords (Optional[Set[str]]): Lemmas to leave out before weighting.
+        limit (Optional[int]): Keep only the highest weights of each folder.
+
+    Returns:
+        Dict[str, List[Tuple[str, float]]]: Directory name to (lemma, weight) pairs with a
+        positive weight, highest first.
+    """
+    if weighting not in WEIGHTINGS:
+        raise ValueError(f"Unknown weighting {weighting!r}, expected one of {', '.join(WEIGHTINGS)}")
+    matrix = matrix.without(stopwords)
+    weights = WEIGHTINGS[weighting](matrix)
+
+    result = {}
+    for row, name in enumerate(matrix.directories):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        row_weights = weights[start:end]
+        order = np.argsort(-row_weights, kind='stable')
+        order = order[row_weights[order] > 0][:limit]
+        lemmas = [matrix.lemmas[column] for column in matrix.indices[start:end][order].tolist()]
+        result[name] = list(zip(lemmas, row_weights[order].tolist()))
+    return result
+
+
+def weighted_wordcloud_path(folder_name: str, output_dir: str, weighting: str,
+                            image_format: str = 'png') -> str:
+    """Return the output path of a weighted word cloud, e.g. ``<folder>_tfidf.png``."""
+    suffix = weighting.replace('-', '_')
+    return os.path.join(output_dir, f'{folder_name}_{suffix}.{IMAGE_FORMATS[image_format]}')
+
+
+def render_weighted_wordclouds(matrix: TermDocumentMatrix, weighting: str, output_dir: str,
+                               stopwords: Optional[Set[str]] = None,
+                               width: int = 1200, height: int = 800, max_words: int = 200,
+                               image_format: str = 'png', scale: float = 1.0,
+                               use_matplotlib: bool = False,
+                               layout_engine: str = 'wordcloud',
+                               directories: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """
+    Render one word cloud per folder, sized by TF-IDF or log-odds weight.
+
+    Args:
+        matrix (TermDocumentMatrix): Lemma counts.
+        weighting (str): One of ``WEIGHTINGS``.
+        output_dir (str): Directory for the images.
+        stopwords (Optional[Set[str]]): Lemmas to leave out.
+        width (int): Width of the word cloud images.
+        height (int): Height of the word cloud images.
+        max_words (int): Maximum number of words per cloud.
+        image_format (str): Output format (png, webp, jpg, svg).
+        scale (float): Scaling between layout and output image size.
+        use_matplotlib (bool): Whether to save the images through matplotlib.
+        layout_engine (str): Word placement engine, one of ``layout_engine.LAYOUT_ENGINES``.
+        directories (Optional[Iterable[str]]): Render only these folders; defaults to all.
+
+    Returns:
+        Dict[str, str]: Directory name to the path of its image.
+    """
+    from wordcloudsr import generate_wordcloud_from_frequencies, save_wordcloud
+
+    tables = weighted_frequencies(matrix, weighting, stopwords, max_words)
+    selected = set(directories) if directories is not None else None
+    results = {}
+    for name, frequencies in tables.items():
+        if selected is not None and name not in selected:
+            continue
+        wordcloud = generate_wordcloud_from_frequencies(frequencies, width, height, max_words,
+                                                        scale, layout_engine)
+        if wordcloud is None:
+            logger.warning(f"No distinctive words for {name}")
+            continue
+        output_path = weighted_wordcloud_path(name, output_dir, weighting, image_format)
+        if save_wordcloud(wordcloud, output_path, use_matplotlib=use_matplotlib):
+            results[name] = output_path
+    logger.info(f"Rendered {len(results)} {weighting} word clouds to {output_dir}")
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Re-weight a saved term-document matrix, without TreeTagger."""
+    parser = argparse.ArgumentParser(description='WordcloudSR - term-document matrix tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    render = subparsers.add_parser('render', help='Render weighted word clouds from a saved matrix')
+    top = subparsers.add_parser('top', help='Print the most distinctive lemmas of every folder')
+    for sub in (render, top):
+        sub.add_argument('--matrix', required=True, help='Matrix file written with --term-matrix')
+        sub.add_argument('--weighting', default='tfidf', choices=sorted(WEIGHTINGS),
+                         help='Weighting of the counts (default: tfidf)')
+        sub.add_argument('--stopwords', default=None, help='File containing stopwords')
+    render.add_argument('--output', default='output', help='Output directory for images (default: output)')
+    render.add_argument('--width', type=int, default=1200, help='Width of images (default: 1200)')
+    render.add_argument('--height', type=int, default=800, help='Height of images (default: 800)')
+    render.add_argument('--max-words', type=int, default=200, help='Maximum words per cloud (default: 200)')
+    render.add_argument('--format', default='png', choices=sorted(IMAGE_FORMATS),
+                        help='Image format (default: png)')
+    render.add_argument('--scale', type=float, default=1.0,
+                        help='Scale of the output image relative to --width/--height (default: 1.0)')
+    render.add_argument('--layout-engine', default='wordcloud', choices=('wordcloud', 'numpy'),
+                        help='Word placement engine (default: wordcloud)')
+    top.add_argument('--limit', type=int, default=20, help='Lemmas per folder (default: 20)')
+
+    args = parser.parse_args(argv)
+    setup_logging()
+    matrix = TermDocumentMatrix.load(args.matrix)
+    stopwords = load_stopwords(args.stopwords) if args.stopwords else None
+
+    if args.command == 'render':
+        results = render_weighted_wordclouds(matrix, args.weighting, args.output, stopwords,
+                                             args.width, args.height, args.max_words,
+                                             args.format, args.scale,
+                                             layout_engine=args.layout_engine)
+        print(f"Wrote {len(results)} {args.weighting} word clouds to {args.output}")
+        return 0
+
+    for name, entries in weighted_frequencies(matrix, args.weighting, stopwords, args.limit).items():
+        print(name)
+        for lemma, weight in entries:
+            print(f"  {lemma:<30} {weight:10.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Shared pytest setup: the modules under test live in the repository root, and
+runs use the benchmark's synthetic corpus and FakeTagger instead of TreeTagger.
+Code that drives TreeTagger itself runs against an in-memory stand-in for
+the treetaggerwrapper module.
+"""
+
+import os
+import re
+import sys
+import types
+import collections
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import FakeTagger, generate_corpus  # noqa: E402
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """A small synthetic corpus: ``input`` with three directories and ``stopwords.txt``."""
+    generate_corpus(str(tmp_path), directories=3, files=4, words=300, vocabulary=200)
+    return tmp_path
+
+
+@pytest.fixture
+def fake_tagger(monkeypatch):
+    """Make the scripts create FakeTaggers instead of starting TreeTagger."""
+    import analyze
+    import wordcloudsr
+    import wordfrqsr
+
+    def create_tagger(**kwargs):
+        return FakeTagger()
+
+    monkeypatch.setattr(analyze, 'create_tagger', create_tagger)
+    monkeypatch.setattr(wordcloudsr, 'create_tagger', create_tagger)
+    monkeypatch.setattr(wordfrqsr, 'create_tagger', create_tagger)
+    return create_tagger
+
+
+class _TreeTaggerProcess:
+    """Imitates a TreeTagger process: SGML tags pass through, tokens get FakeTagger lemmas."""
+
+    def __init__(self, calls, **kwargs):
+        self.calls = calls
+
+    def tag_text(self, text, **kwargs):
+        self.calls.append(text)
+        return [token if token.startswith('<') else f"{token}\tX\t{FakeTagger._lemma(token)}"
+                for token in re.findall(r"<[^>]+>|\w+|[^\w\s]", text)]
+
+
+class _Job:
+    def __init__(self, result):
+        self.result = result
+
+    def wait(self, timeout=None):
+        pass
+
+
+@pytest.fixture
+def treetagger(monkeypatch, tmp_path):
+    """
+    Install a treetaggerwrapper stand-in and a parameter file.
+
+    Returns the module; its ``calls`` list holds every text sent to "TreeTagger".
+    """
+    import SerbianTagger
+
+    module = types.ModuleType('treetaggerwrapper')
+    module.calls = []
+    module.Tag = collections.namedtuple('Tag', 'word pos lemma')
+    module.NotTag = collections.namedtuple('NotTag', 'what')
+    module.TreeTagger = lambda **kwargs: _TreeTaggerProcess(module.calls)
+
+    class TaggerPoll:
+        def __init__(self, **kwargs):
+            self.tagger = _TreeTaggerProcess(module.calls)
+
+        def tag_text(self, text, **kwargs):
+            return self.tagger.tag_text(text)
+
+        def tag_text_async(self, text, **kwargs):
+            return _Job(self.tagger.tag_text(text))
+
+        def stop_poll(self):
+            pass
+
+    module.TaggerPoll = TaggerPoll
+    module.make_tags = lambda lines, **kwargs: [
+        module.Tag(*line.split('\t')) if '\t' in line else module.NotTag(line) for line in lines]
+
+    model = tmp_path / 'serbian.par'
+    model.write_bytes(b'parameters')
+    monkeypatch.setitem(sys.modules, 'treetaggerwrapper', module)
+    monkeypatch.setattr(SerbianTagger, 'treetagger_path', lambda: str(model))
+    module.model = model
+    return module
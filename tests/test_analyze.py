@@ -0,0 +1,44 @@
+"""
+Tests for the single-pass analyze command.
+"""
+
+import os
+
+import analyze
+import wordfrqsr
+from benchmark import FakeTagger
+
+CLOUD_OPTIONS = {'width': 300, 'height': 200, 'max_words': 50}
+
+
+def test_writes_clouds_and_csvs_in_one_pass(corpus, monkeypatch):
+    taggers = []
+
+    def create_tagger(**kwargs):
+        taggers.append(FakeTagger())
+        return taggers[-1]
+
+    monkeypatch.setattr(analyze, 'create_tagger', create_tagger)
+    results = analyze.process_files(collocations=True, input_dir=str(corpus / 'input'),
+                                    output_dir=str(corpus / 'output'),
+                                    stopwords_file=str(corpus / 'stopwords.txt'), **CLOUD_OPTIONS)
+
+    assert list(results) == ['dir000', 'dir001', 'dir002']
+    for paths in results.values():
+        assert os.path.exists(paths['standard'])
+        assert os.path.exists(paths['collocations'])
+        assert os.path.exists(paths['csv'])
+    # Every token was lemmatized once for both the clouds and the CSVs
+    assert [tagger.tokens for tagger in taggers] == [results.metrics['totals']['tokens']]
+
+
+def test_csvs_match_the_frequency_script(corpus, fake_tagger):
+    analyze.process_files(input_dir=str(corpus / 'input'), output_dir=str(corpus / 'analyze'),
+                          stopwords_file=str(corpus / 'stopwords.txt'), **CLOUD_OPTIONS)
+    expected = wordfrqsr.process_files(str(corpus / 'input'), str(corpus / 'wordfrq'),
+                                       str(corpus / 'stopwords.txt'))
+
+    for name, path in expected.items():
+        with open(path, encoding='utf-8') as f, \
+                open(corpus / 'analyze' / f'{name}.csv', encoding='utf-8') as g:
+            assert g.read() == f.read()
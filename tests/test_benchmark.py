@@ -0,0 +1,57 @@
+"""
+Tests for the benchmark's synthetic corpus, fake tagger and runner.
+"""
+
+import os
+
+import pytest
+
+from benchmark import FakeTagger, STAGES, generate_corpus, run_benchmark, summarize
+
+
+def read_tree(root):
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            with open(os.path.join(directory, name), 'rb') as f:
+                files[os.path.relpath(os.path.join(directory, name), root)] = f.read()
+    return files
+
+
+def test_corpus_is_deterministic(tmp_path):
+    first = generate_corpus(str(tmp_path / 'a'), directories=2, files=3, words=100, vocabulary=50)
+    second = generate_corpus(str(tmp_path / 'b'), directories=2, files=3, words=100, vocabulary=50)
+    generate_corpus(str(tmp_path / 'c'), directories=2, files=3, words=100, vocabulary=50, seed=2)
+
+    assert first == second
+    assert (first['directories'], first['files'], first['words']) == (2, 6, 600)
+    assert read_tree(tmp_path / 'a') == read_tree(tmp_path / 'b') != read_tree(tmp_path / 'c')
+    assert first['bytes'] == sum(len(data) for name, data in read_tree(tmp_path / 'a').items()
+                                 if name.endswith('.txt') and name != 'stopwords.txt')
+    text = (tmp_path / 'a' / 'input' / 'dir000' / 'file0000.txt').read_text(encoding='utf-8')
+    assert len(text.replace('.', ' ').split()) == 100
+
+
+def test_fake_tagger():
+    tagger = FakeTagger()
+
+    assert tagger.lemmatize("Gradovima i ženama, kuće!") == "gradov i žen , kuć !"
+    assert tagger.lemmatize(None) is None
+    assert (tagger.calls, tagger.tokens) == (1, 6)
+
+
+@pytest.mark.parametrize('render', [False, True])
+def test_run_benchmark(corpus, render):
+    runs = run_benchmark(str(corpus), FakeTagger(), chunk_size=500, repeat=2, render=render,
+                         width=300, height=200, max_words=50)
+
+    assert len(runs) == 2
+    assert set(runs[0]['directories']) == {'dir000', 'dir001', 'dir002'}
+    assert set(runs[0]['stages']) == set(STAGES)
+    output = sorted(os.listdir(corpus / 'output'))
+    assert [name for name in output if name.endswith('.csv')] == ['dir000.csv', 'dir001.csv', 'dir002.csv']
+    assert any(name.endswith('.png') for name in output) == render
+
+    summary = summarize(runs, {'words': 3600, 'bytes': 1})
+    assert summary['wall_seconds']['min'] <= summary['wall_seconds']['median']
+    assert summary['words_per_second'] == pytest.approx(3600 / summary['wall_seconds']['min'])
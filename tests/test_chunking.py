@@ -0,0 +1,43 @@
+"""
+Tests for reading directories in sentence-aligned chunks.
+"""
+
+from utils import chunk_sentences, iter_text_chunks, lemmatize_chunks, split_sentences
+from benchmark import FakeTagger
+
+
+def test_split_sentences():
+    assert split_sentences("Prva rečenica.  Druga!\nTreća? Kraj") == \
+        ["Prva rečenica.", "Druga!", "Treća?", "Kraj"]
+    assert split_sentences("   ") == []
+
+
+def test_chunks_are_bounded_and_cut_between_sentences():
+    sentences = [f"Rečenica broj {n} je ovde." for n in range(50)]
+    chunks = list(chunk_sentences([" ".join(sentences[:20]), " ".join(sentences[20:])], 100))
+
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert all(chunk.endswith('.') for chunk in chunks)
+    # Chunks span the boundary between texts and keep every sentence
+    assert " ".join(chunks) == " ".join(sentences)
+
+
+def test_long_sentence_is_its_own_chunk():
+    long = "reč " * 50 + "kraj."
+    chunks = list(chunk_sentences(["Kratko. " + long + " Posle."], 40))
+    assert chunks == ["Kratko.", long.strip(), "Posle."]
+
+
+def test_directory_is_read_in_chunks(corpus):
+    directory = str(corpus / 'input' / 'dir000')
+    chunks = list(iter_text_chunks(directory, 500))
+    whole = " ".join(chunk for chunk in iter_text_chunks(directory, 10 ** 9))
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 500 for chunk in chunks)
+    assert " ".join(chunks).split() == whole.split()
+
+
+def test_lemmatize_chunks_skips_empty_results():
+    assert list(lemmatize_chunks(["Gradovi su veliki.", "", "Ljudi."], FakeTagger())) == \
+        ["gradov su velik .", "ljud ."]
@@ -0,0 +1,122 @@
+"""
+Tests for the input scanner: collections, archives, filters and links.
+"""
+
+import os
+import gzip
+import hashlib
+import tarfile
+import zipfile
+
+import pytest
+
+from corpus import Collection, iter_collection_text, iter_documents, scan_collections
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """input/a/{one.txt, two.txt.gz, notes.md, sub/three.txt}, input/b.zip, input/c.tar.gz"""
+    root = tmp_path / 'input'
+    (root / 'a' / 'sub').mkdir(parents=True)
+    (root / 'a' / 'one.txt').write_text("Prvi dokument.", encoding='utf-8')
+    with gzip.open(root / 'a' / 'two.txt.gz', 'wt', encoding='utf-8') as f:
+        f.write("Drugi dokument.")
+    (root / 'a' / 'notes.md').write_text("Nije tekst.", encoding='utf-8')
+    (root / 'a' / 'sub' / 'three.txt').write_text("Treći dokument.", encoding='utf-8')
+    with zipfile.ZipFile(root / 'b.zip', 'w') as archive:
+        archive.writestr('z.txt', "Zip dokument.")
+        archive.writestr('skip.md', "Ne.")
+    member = tmp_path / 't.txt'
+    member.write_text("Tar dokument.", encoding='utf-8')
+    with tarfile.open(root / 'c.tar.gz', 'w:gz') as archive:
+        archive.add(member, arcname='t.txt')
+    return root
+
+
+def names(collection):
+    return [document.name for document in iter_documents(collection)]
+
+
+def test_every_directory_is_a_collection_by_default(tree):
+    collections = scan_collections(str(tree))
+
+    assert [os.path.relpath(c, tree) for c in collections] == [
+        'a', os.path.join('a', 'sub'), 'b.zip', 'c.tar.gz']
+    assert names(collections[0]) == ['one.txt', 'two.txt.gz']
+    assert names(collections[2]) == ['z.txt']
+    assert ''.join(iter_collection_text(collections[3])) == "Tar dokument."
+
+
+def test_collection_depth_reads_nested_directories(tree):
+    collections = scan_collections(str(tree), depth=1)
+
+    assert isinstance(collections[0], Collection) and collections[0].recursive
+    assert names(collections[0]) == ['one.txt', 'sub/three.txt', 'two.txt.gz']
+    with pytest.raises(ValueError):
+        scan_collections(str(tree), depth=0)
+
+
+def test_include_and_exclude(tree):
+    collections = scan_collections(str(tree), depth=1, include=['*.md', '*.txt'], exclude=['sub'])
+    assert names(collections[0]) == ['notes.md', 'one.txt']
+
+
+def test_symlink_loops_are_not_followed(tree):
+    try:
+        os.symlink('..', tree / 'a' / 'sub' / 'loop')
+    except (OSError, NotImplementedError):
+        pytest.skip("symlinks are not supported here")
+
+    collections = scan_collections(str(tree))
+    assert [os.path.relpath(c, tree) for c in collections] == [
+        'a', os.path.join('a', 'sub'), 'b.zip', 'c.tar.gz']
+
+    recursive = scan_collections(str(tree), depth=1)
+    assert names(recursive[0]) == ['one.txt', 'sub/three.txt', 'two.txt.gz']
+
+
+def test_unreadable_files_are_skipped(tree):
+    try:
+        os.symlink(tree / 'missing.txt', tree / 'a' / 'dangling.txt')
+    except (OSError, NotImplementedError):
+        pytest.skip("symlinks are not supported here")
+
+    assert names(Collection(str(tree / 'a'))) == ['one.txt', 'two.txt.gz']
+
+
+def document(path):
+    return next(iter_documents(Collection(str(path.parent), include=[path.name])))
+
+
+def test_text_is_read_in_bounded_pieces(tmp_path, monkeypatch):
+    import corpus
+    monkeypatch.setattr(corpus, 'MMAP_THRESHOLD', 1)
+
+    text = "Prva rečenica je ovde. Druga ima više reči, čak i ćirilicu: град. " * 50
+    path = tmp_path / 'long.txt'
+    path.write_text(text, encoding='utf-8')
+    hasher = hashlib.sha256()
+    pieces = list(document(path).iter_text(block_size=100, hasher=hasher))
+
+    assert ''.join(pieces) == text
+    assert all(len(piece) <= 200 for piece in pieces)
+    assert all(piece.endswith(' ') for piece in pieces[:-1])
+    assert hasher.hexdigest() == hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def test_word_longer_than_a_block_does_not_grow_the_carry(tmp_path):
+    path = tmp_path / 'word.txt'
+    path.write_text("kratko " + "ž" * 5000, encoding='utf-8')
+
+    pieces = list(document(path).iter_text(block_size=256))
+    assert ''.join(pieces) == "kratko " + "ž" * 5000
+    assert max(len(piece) for piece in pieces) <= 2 * 256
+
+
+def test_invalid_utf8_is_replaced_and_counted(tmp_path):
+    path = tmp_path / 'bad.txt'
+    path.write_bytes(b"Grad \xff je velik.")
+    doc = document(path)
+
+    assert ''.join(doc.iter_text()) == "Grad � je velik."
+    assert doc.decode_errors == 1
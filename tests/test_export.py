@@ -0,0 +1,57 @@
+"""
+Tests for writing word cloud images directly and through matplotlib.
+"""
+
+import os
+
+import pytest
+from PIL import Image
+
+from wordcloudsr import generate_wordcloud_from_frequencies, save_wordcloud
+
+FREQUENCIES = [('grad', 30), ('reka', 20), ('most', 12), ('ulica', 8), ('trg', 5)]
+
+
+@pytest.fixture(scope='module')
+def wordcloud():
+    return generate_wordcloud_from_frequencies(FREQUENCIES, width=300, height=200, scale=2)
+
+
+@pytest.mark.parametrize('extension, image_format', [('png', 'PNG'), ('webp', 'WEBP'), ('jpg', 'JPEG')])
+def test_raster_formats_are_written_at_layout_size(tmp_path, wordcloud, extension, image_format):
+    path = str(tmp_path / 'out' / f'cloud.{extension}')
+
+    assert save_wordcloud(wordcloud, path)
+    with Image.open(path) as image:
+        assert image.format == image_format
+        # The layout size times scale, not a matplotlib figure size
+        assert image.size == (600, 400)
+
+
+def test_svg(tmp_path, wordcloud):
+    path = str(tmp_path / 'cloud.svg')
+
+    assert save_wordcloud(wordcloud, path)
+    with open(path, encoding='utf-8') as f:
+        svg = f.read()
+    assert svg.startswith('<svg')
+    assert all(f'>{word}<' in svg for word in wordcloud.words_)
+
+
+def test_matplotlib_path(tmp_path, wordcloud):
+    path = str(tmp_path / 'cloud.png')
+
+    assert save_wordcloud(wordcloud, path, dpi=20, use_matplotlib=True)
+    with Image.open(path) as image:
+        assert image.format == 'PNG'
+
+
+def test_hard_link_is_replaced_instead_of_written_through(tmp_path, wordcloud):
+    cached = tmp_path / 'cached.png'
+    cached.write_bytes(b'cached image')
+    path = tmp_path / 'cloud.png'
+    os.link(cached, path)
+
+    assert save_wordcloud(wordcloud, str(path))
+    assert cached.read_bytes() == b'cached image'
+    assert path.read_bytes().startswith(b'\x89PNG')
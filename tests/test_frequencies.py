@@ -0,0 +1,56 @@
+"""
+Tests for building word clouds from precomputed lemma and bigram counts.
+"""
+
+import pytest
+from wordcloud import WordCloud
+
+from benchmark import FakeTagger
+from utils import count_lemmas_and_bigrams, extract_text_from_directory, load_stopwords
+from wordcloudsr import WORDCLOUD_OPTIONS, cloud_frequencies, generate_wordcloud_from_frequencies
+
+
+@pytest.fixture
+def lemmatized(corpus):
+    return FakeTagger().lemmatize(extract_text_from_directory(str(corpus / 'input' / 'dir000')))
+
+
+@pytest.fixture
+def stopwords(corpus):
+    return load_stopwords(str(corpus / 'stopwords.txt'))
+
+
+@pytest.mark.parametrize('collocations', [False, True])
+def test_counts_match_wordcloud_tokenization(lemmatized, stopwords, collocations):
+    # A frequent pair of lemmas, so that a collocation is found
+    lemmatized += " novi sad ." * 40
+    # Counted in chunks, so bigrams have to continue across chunk boundaries
+    chunks = [" ".join(lemmatized.split()[n:n + 37]) for n in range(0, len(lemmatized.split()), 37)]
+    lemma_freq, bigram_freq = count_lemmas_and_bigrams(chunks)
+
+    standard, collocated = cloud_frequencies(lemma_freq, bigram_freq, stopwords, collocations,
+                                             max_words=10000)
+
+    expected = WordCloud(stopwords=stopwords, collocations=collocations,
+                         **WORDCLOUD_OPTIONS).process_text(lemmatized.lower())
+    assert (collocated if collocations else standard) == expected
+    if collocations:
+        assert 'novi sad' in collocated
+    else:
+        assert collocated is None
+
+
+def test_only_the_most_frequent_words_are_laid_out(lemmatized, stopwords):
+    lemma_freq, bigram_freq = count_lemmas_and_bigrams([lemmatized])
+    standard, _ = cloud_frequencies(lemma_freq, bigram_freq, stopwords, False, max_words=20)
+
+    assert len(standard) == 20
+    assert min(standard.values()) >= max(count for lemma, count in lemma_freq.items()
+                                         if lemma not in standard and lemma not in stopwords
+                                         and lemma.isalpha())
+    wordcloud = generate_wordcloud_from_frequencies(standard.items(), width=300, height=200, max_words=20)
+    assert set(wordcloud.words_) == set(standard)
+
+
+def test_empty_frequencies_give_no_cloud():
+    assert generate_wordcloud_from_frequencies([('.', 5), ('12', 3)], width=300, height=200) is None
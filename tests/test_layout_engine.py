@@ -0,0 +1,58 @@
+"""
+Tests for the NumPy word placement engine.
+"""
+
+from random import Random
+
+import numpy as np
+import pytest
+from wordcloud import WordCloud
+
+from layout_engine import CellOccupancy, _glyph_box, generate_from_frequencies, glyph_mask
+from wordcloudsr import WORDCLOUD_OPTIONS
+
+FREQUENCIES = {f'reč{n}': 100 - 3 * n for n in range(30)}
+
+
+def layout(random_state):
+    wordcloud = WordCloud(width=400, height=300, random_state=random_state, **WORDCLOUD_OPTIONS)
+    return generate_from_frequencies(wordcloud, FREQUENCIES).layout_
+
+
+def test_free_positions_are_found_and_filled():
+    occupancy = CellOccupancy(10, 10, cell_size=2)
+    position = occupancy.find(10, 10, Random(0))
+    assert position == (0, 0)
+
+    occupancy.add(np.ones((2, 2), dtype=bool), 4, 4)
+    assert occupancy.find(10, 10, Random(0)) is None
+    row, col = occupancy.find(4, 4, Random(0))
+    assert not occupancy.pixels[row:row + 4, col:col + 4].any()
+
+
+def test_padding_beyond_the_canvas_is_occupied():
+    occupancy = CellOccupancy(5, 5, cell_size=4)
+    assert occupancy.find(5, 5, Random(0)) is None
+    assert occupancy.find(4, 4, Random(0)) == (0, 0)
+
+
+@pytest.mark.parametrize('seed', [7, Random(7)])
+def test_layout_is_reproducible_with_a_seed(seed):
+    # An int seeds a generator, like the stock engine does
+    assert layout(seed) == layout(7)
+
+
+def test_placed_words_do_not_overlap():
+    wordcloud = WordCloud(width=400, height=300, random_state=3, **WORDCLOUD_OPTIONS)
+    generate_from_frequencies(wordcloud, FREQUENCIES)
+
+    assert len(wordcloud.layout_) > 10
+    assert wordcloud.layout_[0][0][0] == 'reč0'
+    canvas = np.zeros((wordcloud.height, wordcloud.width), dtype=bool)
+    for (word, _), font_size, (row, col), orientation, _ in wordcloud.layout_:
+        left, top, _, _ = _glyph_box(wordcloud.font_path, word, font_size, orientation)
+        mask = glyph_mask(wordcloud.font_path, word, font_size, orientation)
+        region = canvas[row + top:row + top + mask.shape[0], col + left:col + left + mask.shape[1]]
+        assert region.shape == mask.shape, f"{word} is outside the canvas"
+        assert not (region & mask).any(), f"{word} overlaps another word"
+        region |= mask
@@ -0,0 +1,74 @@
+"""
+Tests for the persistent lemma cache.
+"""
+
+import pytest
+
+from lemma_cache import LemmaCache
+
+
+@pytest.fixture
+def model(tmp_path):
+    path = tmp_path / 'model.par'
+    path.write_bytes(b'parameters v1')
+    return path
+
+
+def test_hits_and_misses(tmp_path, model):
+    cache = LemmaCache(str(tmp_path / 'cache.sqlite'), str(model))
+
+    assert cache.get_many(["Grad je velik.", "Ljudi žive."]) == [None, None]
+    cache.put_many([("Grad je velik.", "grad biti velik ."), ("Ljudi žive.", "čovek živeti .")])
+    assert cache.get_many(["Ljudi žive.", "Novo.", "Grad je velik."]) == \
+        ["čovek živeti .", None, "grad biti velik ."]
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 3, 2)
+    assert stats['hit_rate'] == pytest.approx(0.4)
+    cache.close()
+
+
+def test_entries_persist_until_the_model_changes(tmp_path, model):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = LemmaCache(path, str(model))
+    cache.put_many([("Grad je velik.", "grad biti velik .")])
+    cache.close()
+
+    cache = LemmaCache(path, str(model))
+    assert cache.get_many(["Grad je velik."]) == ["grad biti velik ."]
+    cache.close()
+
+    model.write_bytes(b'parameters v2')
+    cache = LemmaCache(path, str(model))
+    assert cache.get_many(["Grad je velik."]) == [None]
+    assert cache.stats()['entries'] == 0
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, model):
+    cache = LemmaCache(str(tmp_path / 'cache.sqlite'), str(model), max_entries=2)
+    cache.put_many([("a.", "a ."), ("b.", "b .")])
+    cache.get_many(["a."])
+    cache.put_many([("c.", "c .")])
+
+    assert cache.get_many(["a.", "b.", "c."]) == ["a .", None, "c ."]
+    assert cache.stats()['entries'] == 2
+    cache.close()
+
+
+def test_tagger_sends_only_cache_misses_to_treetagger(tmp_path, treetagger):
+    from SerbianTagger import SrbTreeTagger
+
+    path = str(tmp_path / 'cache.sqlite')
+    text = "Gradovi su veliki. Ljudi žive u gradovima."
+    with SrbTreeTagger(cache_path=path) as tagger:
+        first = tagger.lemmatize(text)
+    assert first == "gradov su velik . ljud živ u gradov ."
+    assert len(treetagger.calls) == 1
+
+    with SrbTreeTagger(cache_path=path) as tagger:
+        assert tagger.lemmatize(text) == first
+        assert tagger.lemmatize("Ljudi žive u gradovima. Novi grad.") == "ljud živ u gradov . nov grad ."
+        assert tagger.cache_stats()['hits'] == 3
+    # Only the unseen sentence was tagged again
+    assert treetagger.calls[1:] == ["Novi grad."]
@@ -0,0 +1,99 @@
+"""
+Tests for the lexicon lemmatizer backend.
+"""
+
+from typing import List, Optional
+
+from SerbianTagger import LemmatizerBackend
+from lexicon import (CompactLexicon, Lexicon, LexiconLemmatizer, agreement, is_compact_lexicon,
+                     tokenize, write_compact_lexicon)
+
+
+class ContextTagger(LemmatizerBackend):
+    """Stand-in for TreeTagger whose lemma of 'kosa' depends on the previous token."""
+
+    def __init__(self):
+        self.texts: List[str] = []
+
+    def lemmatize(self, text: str) -> Optional[str]:
+        self.texts.append(text)
+        lemmas = []
+        previous = None
+        for token in tokenize(text):
+            word = token.lower()
+            if word == 'kosa':
+                lemmas.append('kos' if previous == 'na' else 'kosa')
+            else:
+                lemmas.append({'ima': 'imati'}.get(word, word))
+            previous = word
+        return " ".join(lemmas)
+
+
+LEXICON = {'ima': 'imati', 'na': 'na', 'glava': 'glava', 'dan': 'dan', '.': '.'}
+TEXTS = ["Ima kosa na glava. Dan.", "Na kosa ima.", "Dan ima."]
+
+
+def test_ambiguous_tokens_are_tagged_in_their_sentence():
+    fallback = ContextTagger()
+    lemmatizer = LexiconLemmatizer(LEXICON, fallback)
+
+    assert lemmatizer.lemmatize_many(TEXTS) == [
+        "imati kosa na glava . dan .", "na kos imati .", "dan imati ."]
+    # Only whole sentences with an unresolved token reach the fallback, once each
+    assert fallback.texts == ["Ima kosa na glava.", "Na kosa ima."]
+    assert lemmatizer.unknown_tokens == 2
+    assert lemmatizer.known_tokens == 12
+
+
+def test_agreement_compares_tokens_in_context():
+    lemmatizer = LexiconLemmatizer(LEXICON, ContextTagger())
+
+    report = agreement(TEXTS, lemmatizer)
+
+    assert report['tokens'] == 14
+    assert report['agreement_rate'] == 1.0
+    assert report['lexicon_coverage'] == 12 / 14
+
+
+def test_different_tokenization_keeps_fallback_output():
+    class SplittingTagger(ContextTagger):
+        def lemmatize(self, text):
+            return super().lemmatize(text.replace("-", " - "))
+
+    lemmatizer = LexiconLemmatizer(LEXICON, SplittingTagger())
+
+    assert lemmatizer.lemmatize("Na kosa-dan.") == "na kos - dan ."
+
+
+def test_compact_lexicon_round_trip(tmp_path):
+    forms = {'grad': 'grad', 'gradovi': 'grad', 'žene': 'žena', 'ženi': 'žena', 'ćup': 'ćup', 'a': 'a'}
+    path = str(tmp_path / 'lexicon.bin')
+
+    assert write_compact_lexicon(forms, path) == len(forms)
+    assert is_compact_lexicon(path)
+    lexicon = CompactLexicon(path)
+    try:
+        assert dict(lexicon) == {form: lexicon[form] for form in forms} == forms
+        assert lexicon.get('nepoznat') is None
+        assert 'grado' not in lexicon and 'gradovi' in lexicon
+        # Forms are kept sorted by their UTF-8 bytes
+        assert list(lexicon) == sorted(forms, key=lambda form: form.encode('utf-8'))
+    finally:
+        lexicon.close()
+
+
+def test_lexicon_file_formats_give_the_same_lemmas(tmp_path):
+    lexicon = Lexicon()
+    for form, lemma in [('Ima', 'imati'), ('ima', 'imati'), ('kosa', 'kosa'), ('kosa', 'kos'), ('dan', 'dan')]:
+        lexicon.add(form, lemma)
+    text_path, compact_path = str(tmp_path / 'lexicon.tsv'), str(tmp_path / 'lexicon.bin')
+    lexicon.save(text_path)
+    assert lexicon.save_compact(compact_path) == 3
+    assert not is_compact_lexicon(text_path)
+
+    results = []
+    for path in (text_path, compact_path):
+        lemmatizer = LexiconLemmatizer.from_file(path, ContextTagger())
+        results.append([lemmatizer.lemmatize(text) for text in TEXTS])
+        lemmatizer.close()
+    assert results[0] == results[1]
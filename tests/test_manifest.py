@@ -0,0 +1,153 @@
+"""
+Tests for incremental processing with per-file manifests and count shards.
+"""
+
+import os
+import hashlib
+import collections
+
+import pytest
+
+import manifest
+from benchmark import FakeTagger
+from manifest import DirectoryState
+from utils import count_lemmas_and_bigrams
+
+
+def token_count(path):
+    with open(path, encoding='utf-8') as f:
+        return len(FakeTagger().lemmatize(f.read()).split())
+
+
+def full_counts(directory):
+    """Counts of lemmatizing every file from scratch; bigrams do not cross files."""
+    lemmas, bigrams = collections.Counter(), collections.Counter()
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name), encoding='utf-8') as f:
+            file_lemmas, file_bigrams = count_lemmas_and_bigrams([FakeTagger().lemmatize(f.read())])
+        lemmas.update(file_lemmas)
+        bigrams.update(file_bigrams)
+    return lemmas, bigrams
+
+
+def test_only_new_and_changed_files_are_lemmatized(corpus, tmp_path):
+    directory = str(corpus / 'input' / 'dir000')
+    state_dir = str(tmp_path / 'state')
+    tagger = FakeTagger()
+
+    assert DirectoryState(state_dir, directory).update(tagger) == full_counts(directory)
+    tagged = tagger.tokens
+    assert tagged > 0
+
+    # Nothing changed: everything comes from the shards
+    assert DirectoryState(state_dir, directory).update(tagger) == full_counts(directory)
+    assert tagger.tokens == tagged
+
+    # A changed, a new and a deleted file
+    with open(os.path.join(directory, 'file0000.txt'), 'a', encoding='utf-8') as f:
+        f.write(" Novi gradovi.")
+    with open(os.path.join(directory, 'new.txt'), 'w', encoding='utf-8') as f:
+        f.write("Ljudi u gradu.")
+    os.remove(os.path.join(directory, 'file0001.txt'))
+    changed_tokens = (token_count(os.path.join(directory, 'file0000.txt'))
+                      + token_count(os.path.join(directory, 'new.txt')))
+
+    assert DirectoryState(state_dir, directory).update(tagger) == full_counts(directory)
+    assert tagger.tokens == tagged + changed_tokens
+
+
+def test_identical_content_reuses_its_shard(corpus, tmp_path):
+    directory = str(corpus / 'input' / 'dir001')
+    state_dir = str(tmp_path / 'state')
+    tagger = FakeTagger()
+    DirectoryState(state_dir, directory).update(tagger)
+    tagged = tagger.tokens
+
+    # A copy under a new name has a known content hash
+    with open(os.path.join(directory, 'file0000.txt'), 'rb') as f:
+        data = f.read()
+    with open(os.path.join(directory, 'copy.txt'), 'wb') as f:
+        f.write(data)
+
+    assert DirectoryState(state_dir, directory).update(tagger) == full_counts(directory)
+    assert tagger.tokens == tagged
+
+
+class OtherModelTagger(FakeTagger):
+    def model_key(self):
+        return 'other-model'
+
+
+def test_state_is_rebuilt_for_another_model(corpus, tmp_path):
+    directory = str(corpus / 'input' / 'dir000')
+    state_dir = str(tmp_path / 'state')
+    DirectoryState(state_dir, directory).update(FakeTagger())
+
+    tagger = OtherModelTagger()
+    assert DirectoryState(state_dir, directory).update(tagger) == full_counts(directory)
+    tagged = tagger.tokens
+    assert tagged > 0
+    # The shards of the new model are reused as usual
+    DirectoryState(state_dir, directory).update(tagger)
+    assert tagger.tokens == tagged
+
+
+def test_interrupted_update_does_not_double_count(corpus, tmp_path, monkeypatch):
+    directory = str(corpus / 'input' / 'dir002')
+    state_dir = str(tmp_path / 'state')
+    DirectoryState(state_dir, directory).update(FakeTagger())
+    with open(os.path.join(directory, 'file0000.txt'), 'a', encoding='utf-8') as f:
+        f.write(" Novi gradovi.")
+
+    write_json = manifest._write_json
+
+    def interrupt_state_write(path, data):
+        if path.endswith('state.json'):
+            raise KeyboardInterrupt
+        write_json(path, data)
+
+    # Interrupted after the new shards were written but before the state was saved
+    monkeypatch.setattr(manifest, '_write_json', interrupt_state_write)
+    with pytest.raises(KeyboardInterrupt):
+        DirectoryState(state_dir, directory).update(FakeTagger())
+    monkeypatch.undo()
+
+    assert DirectoryState(state_dir, directory).update(FakeTagger()) == full_counts(directory)
+
+
+def test_treetagger_model_key_follows_the_parameter_file(treetagger):
+    from SerbianTagger import SrbTreeTagger
+    from lexicon import LexiconLemmatizer
+
+    key = SrbTreeTagger().model_key()
+    assert key.startswith('treetagger:')
+    assert LexiconLemmatizer({'grada': 'grad'}, SrbTreeTagger()).model_key().endswith(key)
+
+    treetagger.model.write_bytes(b'other parameters')
+    assert SrbTreeTagger().model_key() != key
+
+
+def test_large_files_are_streamed_and_hashed_while_read(corpus, tmp_path, monkeypatch):
+    from corpus import Document
+    directory = str(corpus / 'input' / 'dir002')
+    state_dir = str(tmp_path / 'state')
+
+    def read_bytes(self):
+        raise AssertionError("documents must not be read whole")
+
+    monkeypatch.setattr(Document, 'read_bytes', read_bytes)
+    tagger = FakeTagger()
+    # Every file is longer than a chunk, so none is batched
+    assert DirectoryState(state_dir, directory).update(tagger, chunk_size=200) == full_counts(directory)
+    assert tagger.calls > len(os.listdir(directory))
+
+    with open(os.path.join(directory, 'file0000.txt'), 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    state = DirectoryState(state_dir, directory)
+    assert os.path.exists(state._shard_path(digest))
+
+    # A copy of a large file is tagged while it is read, but its known shard is reused
+    with open(os.path.join(directory, 'copy.txt'), 'wb') as f, \
+            open(os.path.join(directory, 'file0000.txt'), 'rb') as source:
+        f.write(source.read())
+    assert state.update(tagger, chunk_size=200) == full_counts(directory)
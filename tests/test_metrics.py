@@ -0,0 +1,85 @@
+"""
+Tests for per-stage metrics and the run report.
+"""
+
+import json
+import itertools
+
+import pytest
+
+import metrics as metrics_module
+import wordfrqsr
+from metrics import DirectoryMetrics, build_report, format_prometheus
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A perf_counter that advances by one second per call."""
+    ticks = itertools.count()
+    monkeypatch.setattr(metrics_module.time, 'perf_counter', lambda: float(next(ticks)))
+
+
+def test_nested_stages_are_timed_exclusively(clock):
+    metrics = DirectoryMetrics('dir')
+    with metrics.stage('lemmatize'):          # t=0
+        with metrics.stage('extract'):        # t=1
+            pass                              # t=2
+        with metrics.stage('extract'):        # t=3
+            pass                              # t=4
+    # leaving lemmatize at t=5
+    assert metrics.seconds == {'extract': 2.0, 'lemmatize': 3.0, 'count': 0.0, 'render': 0.0,
+                               'write': 0.0}
+
+
+def test_timed_charges_producing_items(clock):
+    metrics = DirectoryMetrics('dir')
+    assert list(metrics.timed(iter('ab'), 'count')) == ['a', 'b']
+    # Two items and the final StopIteration, one second each
+    assert metrics.seconds['count'] == 3.0
+
+
+def test_read_chunks_records_files_and_bytes(corpus):
+    directory = corpus / 'input' / 'dir000'
+    metrics = DirectoryMetrics(str(directory))
+
+    chunks = list(metrics.read_chunks(str(directory), 500))
+
+    assert len(chunks) > 1
+    assert metrics.files == 4
+    assert metrics.bytes == sum(path.stat().st_size for path in directory.iterdir())
+    assert metrics.seconds['extract'] > 0
+
+
+def test_report_totals_and_prometheus_text():
+    first, second = DirectoryMetrics('in/a'), DirectoryMetrics('in/b"x')
+    for metrics, tokens in ((first, 10), (second, 30)):
+        metrics.files = 1
+        metrics.bytes = 100
+        metrics.add_counts({'grad': tokens - 1, 'reka': 1})
+        metrics.seconds['lemmatize'] = 2.0
+
+    report = build_report('test', [first, second], wall_seconds=4.0, finished=1700000000.0)
+
+    assert report['directory_count'] == 2
+    assert report['totals']['tokens'] == 40
+    assert report['totals']['seconds']['lemmatize'] == 4.0
+    assert report['throughput'] == {'tokens_per_second': 10.0, 'bytes_per_second': 50.0}
+    text = format_prometheus(report)
+    assert 'wordcloudsr_run_tokens_per_second{script="test"} 10.0' in text
+    assert 'wordcloudsr_directory_tokens{script="test",directory="b\\"x"} 30' in text
+    assert '# TYPE wordcloudsr_run_stage_seconds gauge' in text
+
+
+def test_run_writes_reports(corpus, fake_tagger):
+    report_path, prometheus_path = corpus / 'reports' / 'run.json', corpus / 'run.prom'
+
+    results = wordfrqsr.process_files(str(corpus / 'input'), str(corpus / 'output'),
+                                      str(corpus / 'stopwords.txt'), report_path=str(report_path),
+                                      prometheus_path=str(prometheus_path))
+
+    report = json.loads(report_path.read_text(encoding='utf-8'))
+    assert report == results.metrics
+    assert report['script'] == 'wordfrqsr'
+    assert report['totals']['files'] == 12
+    assert report['totals']['tokens'] > 0
+    assert 'wordcloudsr_run_wall_seconds{script="wordfrqsr"}' in prometheus_path.read_text(encoding='utf-8')
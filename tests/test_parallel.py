@@ -0,0 +1,40 @@
+"""
+Tests for running directories in worker processes.
+"""
+
+import multiprocessing
+
+import pytest
+
+import SerbianTagger
+import wordfrqsr
+from benchmark import FakeTagger
+
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                                reason="workers only inherit the fake tagger when forked")
+
+
+@pytest.fixture
+def worker_tagger(monkeypatch, fake_tagger):
+    """Make worker processes create FakeTaggers too."""
+    monkeypatch.setattr(SerbianTagger, 'create_tagger', lambda **kwargs: FakeTagger())
+
+
+def read_all(paths):
+    contents = {}
+    for name, path in paths.items():
+        with open(path, encoding='utf-8') as f:
+            contents[name] = f.read()
+    return contents
+
+
+def test_workers_match_serial_run(corpus, worker_tagger):
+    arguments = (str(corpus / 'input'),)
+    stopwords = str(corpus / 'stopwords.txt')
+
+    serial = wordfrqsr.process_files(*arguments, str(corpus / 'serial'), stopwords)
+    parallel = wordfrqsr.process_files(*arguments, str(corpus / 'parallel'), stopwords, workers=2)
+
+    assert list(parallel) == list(serial) == ['dir000', 'dir001', 'dir002']
+    assert read_all(parallel) == read_all(serial)
+    assert parallel.metrics['totals']['tokens'] == serial.metrics['totals']['tokens']
@@ -0,0 +1,153 @@
+"""
+Tests for pipelined execution: the stage runner, read-ahead and the pipelined script mode.
+"""
+
+import os
+import time
+import threading
+
+import pytest
+
+import wordcloudsr
+from pipeline import Stage, prefetch, run_pipeline
+from progress import CancellationToken
+
+CLOUD_OPTIONS = {'width': 300, 'height': 200, 'max_words': 50}
+
+
+def test_results_come_back_with_their_input_position():
+    def slow_on_even(item, _):
+        if item % 2 == 0:
+            time.sleep(0.05)
+        return item * 10
+
+    stages = [Stage('first', slow_on_even, workers=3), Stage('second', lambda item, _: item + 1)]
+    results = list(run_pipeline(range(6), stages))
+
+    assert sorted(results) == [(n, n * 10 + 1) for n in range(6)]
+    # Fast items overtake slow ones
+    assert [index for index, _ in results] != list(range(6))
+
+
+def test_failed_items_are_dropped(caplog):
+    def fail_on_two(item, _):
+        if item == 2:
+            raise ValueError("bad item")
+        return item
+
+    assert sorted(run_pipeline(range(4), [Stage('check', fail_on_two)])) == [(0, 0), (1, 1), (3, 3)]
+    assert "bad item" in caplog.text
+
+
+def test_worker_state_is_set_up_and_torn_down_per_thread():
+    created, released = [], []
+    lock = threading.Lock()
+
+    def setup():
+        with lock:
+            created.append(object())
+            return created[-1]
+
+    stage = Stage('owned', lambda item, state: state in created, workers=3,
+                  setup=setup, teardown=released.append)
+    assert all(result for _, result in run_pipeline(range(10), [stage]))
+    assert len(created) == 3
+    assert sorted(map(id, released)) == sorted(map(id, created))
+
+
+def test_setup_failure_stops_the_pipeline():
+    def setup():
+        raise RuntimeError("no tagger")
+
+    with pytest.raises(RuntimeError, match="no tagger"):
+        list(run_pipeline(range(3), [Stage('first', lambda item, _: item),
+                                     Stage('tag', lambda item, _: item, setup=setup)]))
+
+
+def test_stop_event_ends_the_pipeline():
+    cancel = CancellationToken()
+    started = threading.Event()
+
+    def wait(item, _):
+        started.set()
+        time.sleep(0.05)
+        return item
+
+    def items():
+        for n in range(1000):
+            if started.is_set():
+                cancel.cancel()
+            yield n
+
+    results = list(run_pipeline(items(), [Stage('wait', wait)], queue_size=1, cancel=cancel))
+    assert len(results) < 10
+
+
+def test_prefetch_reads_ahead_up_to_its_bound():
+    produced = []
+
+    def items():
+        for n in range(10):
+            produced.append(n)
+            yield n
+
+    chunks = prefetch(items(), maxsize=3)
+    time.sleep(0.2)
+    # Three items wait in the queue and the producer is blocked holding the fourth
+    assert produced == [0, 1, 2, 3]
+    assert list(chunks) == list(range(10))
+
+
+def test_prefetch_raises_producer_errors_in_the_consumer():
+    def items():
+        yield 1
+        raise OSError("disk gone")
+
+    chunks = prefetch(items(), maxsize=2)
+    assert next(chunks) == 1
+    with pytest.raises(OSError, match="disk gone"):
+        next(chunks)
+
+
+def test_prefetch_stops_when_the_consumer_goes_away():
+    finished = threading.Event()
+
+    def items():
+        try:
+            n = 0
+            while True:
+                yield n
+                n += 1
+        finally:
+            finished.set()
+
+    chunks = prefetch(items(), maxsize=1)
+    next(chunks)
+    chunks.close()
+    assert finished.wait(2)
+
+    finished.clear()
+    # Never started and dropped
+    prefetch(items(), maxsize=1)
+    assert finished.wait(2)
+
+
+def tokens_per_directory(results):
+    return {os.path.basename(d['directory']): (d['files'], d['bytes'], d['tokens'])
+            for d in results.metrics['directories']}
+
+
+def test_pipelined_run_matches_serial_run(corpus, fake_tagger):
+    arguments = {'input_dir': str(corpus / 'input'), 'stopwords_file': str(corpus / 'stopwords.txt'),
+                 'collocations': True, 'chunk_size': 500, **CLOUD_OPTIONS}
+
+    serial = wordcloudsr.process_files(output_dir=str(corpus / 'serial'), **arguments)
+    pipelined = wordcloudsr.process_files(
+        output_dir=str(corpus / 'pipelined'), queue_size=1,
+        pipeline_workers={'read': 1, 'lemmatize': 2, 'render': 2, 'save': 1}, **arguments)
+
+    assert list(pipelined) == list(serial) == ['dir000', 'dir001', 'dir002']
+    assert tokens_per_directory(pipelined) == tokens_per_directory(serial)
+    for paths in pipelined.values():
+        assert os.path.exists(paths['standard'])
+        assert os.path.exists(paths['collocations'])
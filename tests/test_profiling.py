@@ -0,0 +1,47 @@
+"""
+Tests for the per-stage profiling mode.
+"""
+
+import cProfile
+import pstats
+
+import wordfrqsr
+from profiling import collapsed_stacks
+
+
+def leaf():
+    return sum(range(20000))
+
+
+def branch():
+    return [leaf() for _ in range(5)]
+
+
+def test_collapsed_stacks_follow_the_call_graph():
+    profile = cProfile.Profile()
+    profile.runcall(branch)
+
+    stacks = collapsed_stacks(pstats.Stats(profile))
+
+    leaf_stacks = [stack for stack in stacks if stack.split(';')[-1].endswith(':leaf')]
+    assert leaf_stacks
+    assert all(':branch;' in stack for stack in leaf_stacks)
+    assert all(seconds >= 0 for seconds in stacks.values())
+
+
+def test_run_writes_stage_profiles(corpus, fake_tagger):
+    profile_dir = corpus / 'profile'
+
+    wordfrqsr.process_files(str(corpus / 'input'), str(corpus / 'output'), str(corpus / 'stopwords.txt'),
+                            profile_dir=str(profile_dir), profile_memory=True)
+
+    for folder in ('dir000', 'dir001', 'dir002'):
+        files = {path.name for path in (profile_dir / folder).iterdir()}
+        assert {'extract.pstats', 'extract.collapsed', 'lemmatize.pstats', 'lemmatize.collapsed',
+                'memory.txt'} <= files
+    assert pstats.Stats(str(profile_dir / 'run.pstats')).total_calls > 0
+    with open(profile_dir / 'run.collapsed', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert lines
+    assert {line.split(';')[0] for line in lines} == {'dir000', 'dir001', 'dir002'}
+    assert any(line.split(';')[1] == 'lemmatize' for line in lines)
@@ -0,0 +1,83 @@
+"""
+Tests for progress callbacks and cooperative cancellation of batch runs.
+"""
+
+import os
+import logging
+
+import pytest
+
+import wordcloudsr
+import wordfrqsr
+from progress import Cancelled, CancellationToken, Progress
+
+CLOUD_OPTIONS = {'width': 300, 'height': 200, 'max_words': 50}
+
+
+def test_progress_estimates():
+    update = Progress('dir000', 'done', directories_done=1, directories_total=4,
+                      bytes_done=3000, tokens_done=600, elapsed=2.0)
+
+    assert update.fraction == 0.25
+    assert (update.bytes_per_second, update.tokens_per_second) == (1500.0, 300.0)
+    assert update.eta_seconds == 6.0
+    assert Progress(None, 'read', 0, 4, 0, 0, 0.0).eta_seconds is None
+
+
+def test_cancellation_token():
+    cancel = CancellationToken()
+    cancel.check()
+    cancel.cancel()
+
+    assert cancel.cancelled
+    with pytest.raises(Cancelled):
+        cancel.check()
+
+
+def test_progress_reaches_every_directory(corpus, fake_tagger):
+    updates = []
+
+    results = wordfrqsr.process_files(str(corpus / 'input'), str(corpus / 'output'),
+                                      str(corpus / 'stopwords.txt'), progress=updates.append)
+
+    done = [update for update in updates if update.stage == 'done']
+    assert [update.directories_done for update in done] == [1, 2, 3]
+    assert done[-1].fraction == 1.0
+    assert done[-1].tokens_done == results.metrics['totals']['tokens']
+    assert not results.cancelled
+
+
+def test_cancel_keeps_finished_directories(corpus, fake_tagger):
+    cancel = CancellationToken()
+
+    def progress(update):
+        if update.stage == 'done':
+            cancel.cancel()
+
+    results = wordfrqsr.process_files(str(corpus / 'input'), str(corpus / 'output'),
+                                      str(corpus / 'stopwords.txt'), progress=progress, cancel=cancel)
+
+    assert results.cancelled
+    assert results.metrics['cancelled']
+    assert list(results) == ['dir000']
+    assert os.path.exists(results['dir000'])
+    assert not os.path.exists(corpus / 'output' / 'dir001.csv')
+
+
+def test_cancelled_pipeline_does_not_log_stage_failures(corpus, fake_tagger, caplog):
+    cancel = CancellationToken()
+
+    def progress(update):
+        if update.stage == 'lemmatize':
+            cancel.cancel()
+
+    with caplog.at_level(logging.WARNING):
+        results = wordcloudsr.process_files(
+            input_dir=str(corpus / 'input'), output_dir=str(corpus / 'output'),
+            stopwords_file=str(corpus / 'stopwords.txt'), chunk_size=500,
+            pipeline_workers={'read': 2, 'lemmatize': 1, 'render': 1, 'save': 1},
+            progress=progress, cancel=cancel, **CLOUD_OPTIONS)
+
+    assert results.cancelled
+    assert len(results) == 0
+    assert not [record for record in caplog.records if record.levelno >= logging.ERROR]
@@ -0,0 +1,68 @@
+"""
+Tests for the content-addressed render cache.
+"""
+
+import os
+
+import wordcloudsr
+from render_cache import RenderCache
+
+CLOUD_OPTIONS = {'width': 300, 'height': 200, 'max_words': 50}
+
+
+def test_key_depends_on_words_and_parameters(tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'))
+    key = cache.key({'grad': 3, 'reka': 2}, {'width': 300})
+
+    assert key == cache.key({'reka': 2, 'grad': 3}, {'width': 300})
+    assert key != cache.key({'grad': 3, 'reka': 1}, {'width': 300})
+    assert key != cache.key({'grad': 3, 'reka': 2}, {'width': 400})
+
+
+def test_store_and_fetch(tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'))
+    rendered = tmp_path / 'out' / 'a.png'
+    rendered.parent.mkdir()
+    rendered.write_bytes(b'image')
+    key = cache.key({'grad': 3}, {})
+
+    assert not cache.fetch(key, str(tmp_path / 'other' / 'b.png'))
+    cache.store(key, str(rendered))
+    assert cache.fetch(key, str(tmp_path / 'other' / 'b.png'))
+    assert (tmp_path / 'other' / 'b.png').read_bytes() == b'image'
+    assert cache.stats()['entries'] == 1
+
+
+def test_least_recently_used_images_are_evicted(tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'))
+    cache.max_bytes = 2500
+    keys = []
+    for n in range(3):
+        path = tmp_path / f'{n}.png'
+        path.write_bytes(b'x' * 1000)
+        keys.append(cache.key({'word': n}, {}))
+        cache.store(keys[-1], str(path))
+        # Distinct modification times, oldest first
+        os.utime(cache._entry(keys[-1], str(path)), (n, n))
+
+    assert cache.evictions == 1
+    assert not cache.fetch(keys[0], str(tmp_path / 'a.png'))
+    assert cache.fetch(keys[2], str(tmp_path / 'b.png'))
+
+
+def test_second_run_copies_unchanged_clouds(corpus, fake_tagger):
+    arguments = {'input_dir': str(corpus / 'input'), 'output_dir': str(corpus / 'output'),
+                 'stopwords_file': str(corpus / 'stopwords.txt'), 'collocations': True,
+                 'render_cache': str(corpus / 'cache'), **CLOUD_OPTIONS}
+
+    first = wordcloudsr.process_files(**arguments)
+    assert first.metrics['totals']['render_cache_misses'] == 6
+    assert first.metrics['totals']['render_cache_hits'] == 0
+
+    second = wordcloudsr.process_files(**arguments)
+    assert second.metrics['totals']['render_cache_hits'] == 6
+    assert second.metrics['totals']['render_cache_misses'] == 0
+    assert second.metrics['totals']['seconds']['render'] < first.metrics['totals']['seconds']['render']
+    assert dict(second) == dict(first)
+    for paths in second.values():
+        assert all(os.path.exists(path) for path in paths.values())
@@ -0,0 +1,91 @@
+"""
+Tests for the SQLite results store.
+"""
+
+import sqlite3
+import argparse
+
+import pytest
+
+import results_db
+import wordfrqsr
+from results_db import ResultsStore, parse_since
+
+
+@pytest.fixture
+def store(tmp_path):
+    with ResultsStore(str(tmp_path / 'db' / 'results.sqlite')) as store:
+        yield store
+
+
+def test_tables_are_buffered_until_flushed(store):
+    store.add('a', [('grad', 5), ('reka', 2)])
+    with sqlite3.connect(store.path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM frequencies").fetchone()[0] == 0
+
+    store.flush()
+    assert store.written == 1
+    assert store.top(directory='a') == [('grad', 5), ('reka', 2)]
+
+
+def test_batches_are_written_when_enough_rows_are_queued(tmp_path):
+    with ResultsStore(str(tmp_path / 'results.sqlite'), batch_rows=3) as store:
+        store.add('a', [('grad', 5), ('reka', 2)])
+        assert store.written == 0
+        store.add('b', [('most', 1), ('grad', 1)])
+        assert store.written == 2
+
+
+def test_queries(store):
+    store.add('a', [('grad', 5), ('reka', 2)])
+    store.add('b', [('grad', 1), ('most', 4)])
+    store.flush()
+
+    assert store.top(2) == [('grad', 6), ('most', 4)]
+    assert store.top_per_directory(1) == {'a': [('grad', 5)], 'b': [('most', 4)]}
+    assert store.lemma('grad') == [('a', 5), ('b', 1)]
+    assert store.lemma('grad', limit=1) == [('a', 5)]
+    assert [(name, tokens, lemmas) for name, _, tokens, lemmas in store.directories()] == \
+        [('a', 7, 2), ('b', 5, 2)]
+
+
+def test_directory_processed_again_is_upserted(store):
+    store.add('a', [('grad', 5), ('reka', 2)])
+    store.add('b', [('most', 4)])
+    store.flush()
+    store.add('a', [('grad', 7), ('trg', 1)])
+    store.flush()
+
+    assert store.top(directory='a') == [('grad', 7), ('trg', 1)]
+    assert store.top(directory='b') == [('most', 4)]
+    assert store.lemma('reka') == []
+
+
+def test_since_filters_by_update_time(store, monkeypatch):
+    monkeypatch.setattr(results_db.time, 'time', lambda: parse_since('2026-10-01'))
+    store.add('old', [('grad', 5)])
+    monkeypatch.setattr(results_db.time, 'time', lambda: parse_since('2026-10-14T12:00'))
+    store.add('new', [('grad', 1), ('reka', 3)])
+    store.flush()
+
+    since = parse_since('2026-10-12')
+    assert [name for name, *_ in store.directories(since)] == ['new']
+    assert store.top(since=since) == [('reka', 3), ('grad', 1)]
+    assert store.lemma('grad', since=since) == [('new', 1)]
+
+
+def test_invalid_date():
+    with pytest.raises(argparse.ArgumentTypeError, match="invalid date"):
+        parse_since('last monday')
+
+
+def test_run_loads_every_csv(corpus, fake_tagger):
+    path = str(corpus / 'results.sqlite')
+    results = wordfrqsr.process_files(str(corpus / 'input'), str(corpus / 'output'),
+                                      str(corpus / 'stopwords.txt'), results_db=path)
+
+    with ResultsStore(path) as store:
+        for name, csv_path in results.items():
+            with open(csv_path, encoding='utf-8') as f:
+                rows = [line.rsplit(',', 1) for line in f.read().splitlines()[1:]]
+            assert sorted(store.top(10000, directory=name)) == sorted((lemma, int(count)) for lemma, count in rows)
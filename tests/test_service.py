@@ -0,0 +1,124 @@
+"""
+Tests for the local HTTP service, served on localhost with the fake tagger.
+"""
+
+import json
+import asyncio
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmark import FakeTagger
+from service import LemmaBatcher, create_service, parse_arguments
+
+TEXT = "Grad je u gradu. Ljudi žive u gradu."
+
+
+@pytest.fixture
+def service(corpus):
+    """Serve the service on a free localhost port in a background event loop."""
+    args = parse_arguments(['--fake-tagger', '--stopwords', str(corpus / 'stopwords.txt'),
+                            '--batch-window', '0.2'])
+    service = create_service(args)
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    ports = []
+
+    def on_ready(port):
+        ports.append(port)
+        ready.set()
+
+    task = loop.create_task(service.serve('127.0.0.1', 0, on_ready))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert ready.wait(10), "service did not start"
+    yield ports[0]
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join(10)
+    loop.close()
+
+
+def request(port, method, path, body=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        connection.request(method, path, body=body.encode('utf-8') if body else None)
+        response = connection.getresponse()
+        return response.status, response.getheader('Content-Type'), response.read()
+    finally:
+        connection.close()
+
+
+def test_lemmatize(service):
+    status, content_type, body = request(service, 'POST', '/lemmatize', TEXT)
+
+    assert status == 200
+    assert content_type.startswith('application/json')
+    result = json.loads(body)
+    assert result['lemmas'] == FakeTagger().lemmatize(TEXT)
+    assert result['tokens'] == len(result['lemmas'].split())
+
+
+def test_frequencies(service):
+    status, _, body = request(service, 'POST', '/frequencies?limit=3', TEXT)
+    assert status == 200
+    assert json.loads(body)['frequencies'] == [['grad', 3], ['.', 2], ['ljud', 1]]
+
+    status, content_type, body = request(service, 'POST', '/frequencies?format=csv', TEXT)
+    assert status == 200
+    assert content_type.startswith('text/csv')
+    assert body.decode('utf-8').splitlines()[:2] == ['Lemma,Frequency', 'grad,3']
+
+
+def test_wordcloud(service):
+    status, content_type, body = request(service, 'POST', '/wordcloud?width=200&height=100', TEXT)
+
+    assert status == 200
+    assert content_type == 'image/png'
+    assert body.startswith(b'\x89PNG')
+
+
+def test_errors(service):
+    assert request(service, 'GET', '/missing')[0] == 404
+    assert request(service, 'GET', '/lemmatize')[0] == 405
+    assert request(service, 'POST', '/frequencies?format=xml', TEXT)[0] == 400
+
+
+def test_concurrent_requests_are_batched(service):
+    texts = [f"Grad broj {n} je velik." for n in range(8)]
+    with ThreadPoolExecutor(len(texts)) as executor:
+        results = list(executor.map(lambda text: request(service, 'POST', '/lemmatize', text), texts))
+
+    assert [json.loads(body)['lemmas'] for _, _, body in results] == \
+        [FakeTagger().lemmatize(text) for text in texts]
+    status, _, body = request(service, 'GET', '/health')
+    health = json.loads(body)
+    assert status == 200
+    assert health['status'] == 'ok'
+    assert health['batched_texts'] == len(texts)
+    assert health['batches'] < len(texts)
+
+
+def test_batcher_coalesces_texts_within_window():
+    tagger = FakeTagger()
+    batcher = LemmaBatcher([tagger], window=0.05)
+    texts = ["Prvi gradovi.", "Drugi ljudi.", "Treći dani."]
+
+    async def run():
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.lemmatize(text) for text in texts))
+        finally:
+            await batcher.close()
+
+    assert asyncio.run(run()) == [FakeTagger().lemmatize(text) for text in texts]
+    assert (batcher.batches, batcher.texts) == (1, 3)
+    assert tagger.calls == 3
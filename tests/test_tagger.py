@@ -0,0 +1,75 @@
+"""
+Tests for batched lemmatization with SrbTreeTagger and the TreeTagger pool.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmark import FakeTagger
+from SerbianTagger import SrbTreeTagger, SrbTreeTaggerPool, create_tagger
+
+DOCUMENTS = ["Gradovi su veliki.", "Ljudi žive u gradovima.", "Reka teče."]
+
+
+def test_batch_is_tagged_in_one_call(treetagger):
+    tagger = SrbTreeTagger()
+
+    assert tagger.lemmatize_many(DOCUMENTS[:1] + [None] + DOCUMENTS[1:]) == \
+        [FakeTagger().lemmatize(DOCUMENTS[0]), None] + [FakeTagger().lemmatize(d) for d in DOCUMENTS[1:]]
+    assert len(treetagger.calls) == 1
+    assert treetagger.calls[0].count('<wcsr_boundary/>') == len(DOCUMENTS) - 1
+
+
+def test_batches_are_cut_by_size(treetagger):
+    tagger = SrbTreeTagger()
+    documents = DOCUMENTS * 4
+
+    results = list(tagger.iter_lemmatize_many(iter(documents), batch_chars=40))
+
+    assert results == [FakeTagger().lemmatize(d) for d in documents]
+    assert 1 < len(treetagger.calls) < len(documents)
+    assert all(len(call.replace(' <wcsr_boundary/> ', '')) < 40 + max(map(len, DOCUMENTS))
+               for call in treetagger.calls)
+
+
+def test_lost_boundaries_fall_back_to_one_call_per_document(treetagger):
+    tagger = SrbTreeTagger()
+    tag_text = tagger._tagger.tag_text
+    # A tagger that drops the SGML markers
+    tagger._tagger.tag_text = lambda text: [line for line in tag_text(text) if not line.startswith('<')]
+
+    assert tagger.lemmatize_many(DOCUMENTS) == [FakeTagger().lemmatize(d) for d in DOCUMENTS]
+    assert len(treetagger.calls) == 1 + len(DOCUMENTS)
+
+
+def test_batch_with_lemma_cache(tmp_path, treetagger):
+    path = str(tmp_path / 'cache.sqlite')
+    with SrbTreeTagger(cache_path=path) as tagger:
+        tagger.lemmatize_many(DOCUMENTS[:2])
+    with SrbTreeTagger(cache_path=path) as tagger:
+        assert tagger.lemmatize_many(DOCUMENTS) == [FakeTagger().lemmatize(d) for d in DOCUMENTS]
+
+    assert treetagger.calls[1:] == [DOCUMENTS[2]]
+
+
+def test_pool_spreads_sentences_and_keeps_their_order(treetagger):
+    pool = SrbTreeTaggerPool(size=3)
+    text = " ".join(DOCUMENTS * 2)
+
+    assert pool.lemmatize(text) == FakeTagger().lemmatize(text)
+    assert len(treetagger.calls) == 3
+    assert " ".join(treetagger.calls) == text
+
+
+def test_pool_batches_documents_across_processes(treetagger):
+    pool = SrbTreeTaggerPool(size=2)
+    documents = DOCUMENTS * 2
+
+    assert pool.lemmatize_many(documents) == [FakeTagger().lemmatize(d) for d in documents]
+    assert len(treetagger.calls) == 2
+
+
+def test_pool_is_shared_by_threads(treetagger):
+    texts = [f"Grad broj {n} je velik. Reka {n} teče." for n in range(20)]
+    with create_tagger(pool_size=2) as pool, ThreadPoolExecutor(4) as executor:
+        assert isinstance(pool, SrbTreeTaggerPool)
+        assert list(executor.map(pool.lemmatize, texts)) == [FakeTagger().lemmatize(t) for t in texts]
@@ -0,0 +1,92 @@
+"""
+Tests for the term-document matrix and weighted word clouds.
+"""
+
+import math
+import os
+
+import numpy as np
+import pytest
+
+import wordfrqsr
+from termdoc import (TermDocumentMatrix, log_odds_weights, render_weighted_wordclouds,
+                     tfidf_weights, weighted_frequencies)
+from vocabulary import CountStore, LemmaCounts, Vocabulary
+
+COUNTS = {
+    'a': {'grad': 4, 'reka': 1, 'je': 5, '.': 3},
+    'b': {'grad': 2, 'most': 6, 'je': 4},
+    'c': {},
+}
+
+
+@pytest.fixture
+def matrix():
+    vocabulary = Vocabulary(['nekorišćen'])
+    store = CountStore(vocabulary)
+    for name, counts in COUNTS.items():
+        store.add(name, LemmaCounts.from_counter(counts, vocabulary))
+    return TermDocumentMatrix.from_store(store)
+
+
+def dense(matrix):
+    return {name: {matrix.lemmas[column]: int(count)
+                   for column, count in zip(matrix.indices[start:end].tolist(), matrix.data[start:end].tolist())}
+            for name, start, end in zip(matrix.directories, matrix.indptr[:-1], matrix.indptr[1:])}
+
+
+def test_matrix_holds_the_counts(matrix):
+    assert matrix.shape == (3, 5)
+    assert 'nekorišćen' not in matrix.lemmas
+    assert dense(matrix) == COUNTS
+    assert dense(matrix.without({'je'})) == {'a': {'grad': 4, 'reka': 1}, 'b': {'grad': 2, 'most': 6}, 'c': {}}
+
+
+def test_save_and_load(matrix, tmp_path):
+    path = str(tmp_path / 'terms' / 'matrix.npz')
+    matrix.save(path)
+    loaded = TermDocumentMatrix.load(path)
+
+    assert loaded.directories == matrix.directories
+    assert loaded.lemmas == matrix.lemmas
+    assert dense(loaded) == dense(matrix)
+
+
+def test_tfidf(matrix):
+    weights = dict(zip(((name, lemma) for name, row in dense(matrix).items() for lemma in row),
+                       tfidf_weights(matrix).tolist()))
+    # 'grad' is in two of three folders, 'reka' only in one
+    assert weights[('a', 'grad')] == pytest.approx((1 + math.log(4)) * (math.log(4 / 3) + 1))
+    assert weights[('a', 'reka')] == pytest.approx(math.log(4 / 2) + 1)
+
+
+def test_log_odds_favours_distinctive_lemmas(matrix):
+    z = dict(zip(((name, lemma) for name, row in dense(matrix).items() for lemma in row),
+                 log_odds_weights(matrix).tolist()))
+    assert all(np.isfinite(list(z.values())))
+    assert z[('b', 'most')] > 0 > z[('b', 'grad')]
+    assert z[('a', 'grad')] > 0
+
+
+def test_weighted_frequencies_drop_stopwords_and_punctuation(matrix):
+    tables = weighted_frequencies(matrix, 'log-odds', {'je'})
+
+    assert [lemma for lemma, _ in tables['b']] == ['most']
+    assert {lemma for lemma, _ in tables['a']} == {'grad', 'reka'}
+    assert tables['c'] == []
+    with pytest.raises(ValueError):
+        weighted_frequencies(matrix, 'bm25')
+
+
+def test_run_saves_a_matrix_for_weighted_clouds(corpus, fake_tagger):
+    path = str(corpus / 'output' / 'terms.npz')
+    wordfrqsr.process_files(str(corpus / 'input'), str(corpus / 'output'), str(corpus / 'stopwords.txt'),
+                            term_matrix=path)
+
+    matrix = TermDocumentMatrix.load(path)
+    assert matrix.directories == ['dir000', 'dir001', 'dir002']
+    stopwords = wordfrqsr.load_stopwords(str(corpus / 'stopwords.txt'))
+    images = render_weighted_wordclouds(matrix, 'tfidf', str(corpus / 'clouds'), stopwords,
+                                        width=300, height=200, max_words=30)
+    assert sorted(images) == ['dir000', 'dir001', 'dir002']
+    assert all(os.path.basename(path).endswith('_tfidf.png') for path in images.values())
@@ -0,0 +1,66 @@
+"""
+Tests for the interned vocabulary and compact lemma counts.
+"""
+
+import pickle
+from collections import Counter
+
+import wordfrqsr
+from vocabulary import CountStore, LemmaCounts, Vocabulary
+from wordfrqsr import sort_lemma_counts
+
+CHUNKS = ["grad je velik .", "Grad i reka . reka je", "most , grad"]
+
+
+def test_ids_are_assigned_once():
+    vocabulary = Vocabulary(['grad', 'reka'])
+
+    assert vocabulary.intern('reka') == 1
+    assert vocabulary.intern_many(['most', 'grad', 'most']).tolist() == [2, 0, 2]
+    assert vocabulary.lookup([2, 0]) == ['most', 'grad']
+    assert 'most' in vocabulary and vocabulary.get('trg') is None
+    assert len(vocabulary) == 3
+
+
+def test_counts_sort_like_a_counter():
+    stopwords = {'je', 'i'}
+    counter = Counter(" ".join(CHUNKS).lower().split())
+    counts = LemmaCounts.from_chunks(CHUNKS, Vocabulary())
+
+    assert counts.to_counter() == dict(counter)
+    assert counts.total() == sum(counter.values())
+    assert counts.sorted_items(stopwords) == sort_lemma_counts(Counter(counter), stopwords)
+    assert counts.sorted_items(limit=2) == counter.most_common(2)
+
+
+def test_counts_survive_pickling_into_another_vocabulary():
+    counts = LemmaCounts.from_chunks(CHUNKS, Vocabulary(['nešto', 'drugo']))
+    restored = pickle.loads(pickle.dumps(counts))
+
+    assert restored.items() == counts.items()
+
+
+def test_store_shares_one_vocabulary():
+    vocabulary = Vocabulary()
+    store = CountStore(vocabulary)
+    store.add('a', LemmaCounts.from_chunks(CHUNKS[:2], vocabulary))
+    # Counts from another vocabulary are re-interned
+    store.add('b', LemmaCounts.from_chunks(CHUNKS[1:], Vocabulary()))
+
+    assert list(store) == ['a', 'b'] and 'b' in store and len(store) == 2
+    assert store['b'].vocabulary is vocabulary
+    assert store.items('b', {'je', 'i'})[:2] == [('grad', 2), ('reka', 2)]
+    assert len(vocabulary) == len(set(" ".join(CHUNKS).lower().split()))
+    assert store.nbytes == store['a'].nbytes + store['b'].nbytes
+
+
+def test_run_keeps_counts_matching_the_csvs(corpus, fake_tagger):
+    stopwords = wordfrqsr.load_stopwords(str(corpus / 'stopwords.txt'))
+    results = wordfrqsr.process_files(str(corpus / 'input'), str(corpus / 'output'),
+                                      str(corpus / 'stopwords.txt'), keep_counts=True)
+
+    assert list(results.counts) == ['dir000', 'dir001', 'dir002']
+    for name, path in results.items():
+        with open(path, encoding='utf-8') as f:
+            rows = [line.rsplit(',', 1) for line in f.read().splitlines()[1:]]
+        assert [(lemma, int(count)) for lemma, count in rows] == results.counts.items(name, stopwords)
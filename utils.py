@@ -11,26 +11,60 @@ Date: May 21, 2025
 """
 
 import os
+import re
 import logging
-from typing import Set, List, Dict, Any, Optional
+from collections import Counter
+from typing import Set, List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from pathlib import Path
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S',
-    filename='wordcloud.log',
-    filemode='a'
-)
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-formatter = logging.Formatter('%(levelname)s: %(message)s')
-console_handler.setFormatter(formatter)
-logging.getLogger('').addHandler(console_handler)
+from corpus import iter_collection_text, iter_documents, scan_collections
+from lemma_cache import DEFAULT_MAX_ENTRIES
 
 logger = logging.getLogger(__name__)
 
+# Default size of a lemmatization chunk, in characters
+DEFAULT_CHUNK_SIZE = 1000000
+
+# Word cloud output formats and their file extensions
+IMAGE_FORMATS = {'png': 'png', 'webp': 'webp', 'jpeg': 'jpg', 'svg': 'svg'}
+
+# Word placement engines: the wordcloud library's own and layout_engine's NumPy one
+LAYOUT_ENGINES = ('wordcloud', 'numpy')
+
+# Log file written by the command-line scripts
+LOG_FILE = 'wordcloud.log'
+
+_console_handler: Optional[logging.Handler] = None
+
+
+def setup_logging(debug: bool = False, log_file: Optional[str] = LOG_FILE) -> None:
+    """
+    Configure logging for a command-line script: a log file and the console.
+    
+    Entry points call this; importing a module never configures logging.
+    Calling it again only changes the level.
+    
+    Args:
+        debug (bool): Log debug messages too.
+        log_file (Optional[str]): File the log is appended to; None logs to the console only.
+    """
+    global _console_handler
+    level = logging.DEBUG if debug else logging.INFO
+    root = logging.getLogger('')
+    if _console_handler is None:
+        if log_file:
+            file_handler = logging.FileHandler(log_file, mode='a')
+            file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s',
+                                                        datefmt='%Y-%m-%d %H:%M:%S'))
+            root.addHandler(file_handler)
+        _console_handler = logging.StreamHandler()
+        _console_handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+        root.addHandler(_console_handler)
+    root.setLevel(level)
+    _console_handler.setLevel(level)
+    if debug:
+        logger.debug("Debug logging enabled")
+
 
 def load_stopwords(file_path: str) -> Set[str]:
     """
@@ -55,6 +89,33 @@ def load_stopwords(file_path: str) -> Set[str]:
         raise
 
 
+def iter_text_files(directory_path: str) -> Iterator[Tuple[str, str]]:
+    """
+    Yield the contents of every text document of a collection, one document at a time.
+    
+    Documents are ``.txt`` and ``.txt.gz`` files, also inside ``.zip`` and
+    ``.tar`` archives (see :mod:`corpus`).
+    
+    Args:
+        directory_path (str): Path to the directory (or archive) containing text files.
+        
+    Yields:
+        Tuple[str, str]: (file path, file text) pairs.
+    """
+    file_count = 0
+    
+    for document in iter_documents(directory_path):
+        try:
+            text = "".join(document.iter_text())
+        except Exception as e:
+            logger.warning(f"Could not read file {document.path}: {e}")
+            continue
+        file_count += 1
+        yield document.path, text
+    
+    logger.info(f"Processed {file_count} text files from {directory_path}")
+
+
 def extract_text_from_directory(directory_path: str) -> str:
     """
     Extract and combine text from all .txt files in a directory.
@@ -65,23 +126,194 @@ def extract_text_from_directory(directory_path: str) -> str:
     Returns:
         str: Combined text from all .txt files.
     """
-    all_text = ""
-    file_count = 0
+    # Add a space between files
+    return " ".join(text for _, text in iter_text_files(directory_path)).strip()
+
+
+def iter_text_chunks(directory_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Yield the text of a directory in chunks of bounded size.
     
-    # Iterate over all files in the directory
-    for file in os.listdir(directory_path):
-        if file.endswith('.txt'):
-            file_path = os.path.join(directory_path, file)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    text = f.read()
-                    all_text += text + " "  # Add a space between files
-                    file_count += 1
-            except Exception as e:
-                logger.warning(f"Could not read file {file_path}: {e}")
+    Chunks are cut at sentence boundaries and may span several small files.
+    A single sentence longer than ``chunk_size`` is yielded as its own chunk.
+    Files are streamed in blocks of about ``chunk_size`` bytes (large files are
+    memory-mapped), so a large file is never read at once.
     
-    logger.info(f"Processed {file_count} text files from {directory_path}")
-    return all_text.strip()
+    Args:
+        directory_path (str): Path to the directory (or archive) containing text files.
+        chunk_size (int): Target maximum chunk length in characters.
+        
+    Returns:
+        Iterator[str]: Chunks of text.
+    """
+    return chunk_sentences(iter_collection_text(directory_path, chunk_size), chunk_size)
+
+
+def chunk_sentences(texts: Iterable[str], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Pack the sentences of several texts into chunks of bounded size.
+    
+    Args:
+        texts (Iterable[str]): Texts to split, consumed lazily.
+        chunk_size (int): Target maximum chunk length in characters.
+        
+    Yields:
+        str: Chunks of text.
+    """
+    buffer: List[str] = []
+    buffered = 0
+    for text in texts:
+        for sentence in split_sentences(text):
+            if buffer and buffered + len(sentence) > chunk_size:
+                yield " ".join(buffer)
+                buffer, buffered = [], 0
+            buffer.append(sentence)
+            buffered += len(sentence) + 1
+    if buffer:
+        yield " ".join(buffer)
+
+
+def lemmatize_chunks(chunks: Iterable[str], tagger: Any) -> Iterator[str]:
+    """
+    Lemmatize text chunk by chunk.
+    
+    Args:
+        chunks (Iterable[str]): Text chunks, e.g. from :func:`iter_text_chunks`.
+        tagger (Any): Tagger exposing ``lemmatize(text)``.
+        
+    Yields:
+        str: Lemmatized chunks; chunks that produced no lemmas are skipped.
+    """
+    for chunk in chunks:
+        lemmatized = tagger.lemmatize(chunk)
+        if lemmatized:
+            yield lemmatized
+
+
+_SENTENCE_END = re.compile(r'(?<=[.!?\u2026])\s+')
+
+# Same token pattern as WordCloud's default regexp
+_CLOUD_WORD = re.compile(r"^\w[\w']*$")
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text into sentences at terminal punctuation followed by whitespace.
+    
+    Args:
+        text (str): Text to split.
+        
+    Returns:
+        List[str]: Non-empty, stripped sentences in their original order.
+    """
+    return [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+def is_cloud_word(lemma: str) -> bool:
+    """
+    Check whether a lemma should be drawn in a word cloud.
+    
+    Mirrors the tokenization of ``WordCloud.generate``, which drops punctuation
+    and plain numbers.
+    
+    Args:
+        lemma (str): Lemma to check.
+        
+    Returns:
+        bool: True if the lemma is a word.
+    """
+    return bool(_CLOUD_WORD.match(lemma)) and not lemma.isdigit()
+
+
+def lemmatize_documents(texts: Iterable[str], tagger: Any,
+                        batch_chars: int = DEFAULT_CHUNK_SIZE) -> Iterator[Optional[str]]:
+    """
+    Lemmatize a stream of documents, batching them when the tagger supports it.
+    
+    Args:
+        texts (Iterable[str]): Documents to lemmatize.
+        tagger (Any): Tagger exposing ``lemmatize(text)`` and optionally
+            ``iter_lemmatize_many(texts, batch_chars)``.
+        batch_chars (int): Approximate number of characters per tagger call.
+        
+    Yields:
+        Optional[str]: Lemmatized documents in input order.
+    """
+    if hasattr(tagger, 'iter_lemmatize_many'):
+        yield from tagger.iter_lemmatize_many(texts, batch_chars)
+    else:
+        for text in texts:
+            yield tagger.lemmatize(text)
+
+
+def count_lemmas_and_bigrams(lemmatized_chunks: Iterable[str]) -> Tuple[Counter, Counter]:
+    """
+    Count lemmas and adjacent lemma pairs over a stream of lemmatized chunks.
+    
+    Unigram counts are the same as those of :func:`wordfrqsr.count_lemmas` before
+    stopword removal. Bigrams are counted the way ``WordCloud`` forms them:
+    over the sequence of word lemmas with punctuation and numbers dropped,
+    continuing across chunk boundaries. Stopwords are not removed here, so
+    the counts stay valid if the stopword list changes.
+    
+    Args:
+        lemmatized_chunks (Iterable[str]): Space-separated lemmas, one chunk at a time.
+        
+    Returns:
+        Tuple[Counter, Counter]: Lemma counts and bigram counts keyed by ``"first second"``.
+    """
+    lemma_freq: Counter = Counter()
+    bigram_freq: Counter = Counter()
+    previous = None
+    for chunk in lemmatized_chunks:
+        tokens = chunk.lower().split()
+        lemma_freq.update(tokens)
+        words = [token for token in tokens if is_cloud_word(token)]
+        if not words:
+            continue
+        if previous is not None:
+            words.insert(0, previous)
+        bigram_freq.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+        previous = words[-1]
+    return lemma_freq, bigram_freq
+
+
+def remove_stopword_bigrams(bigram_freq: Counter, stopwords: Set[str]) -> Counter:
+    """
+    Drop bigrams that contain a stopword.
+    
+    Args:
+        bigram_freq (Counter): Bigram counts keyed by ``"first second"``.
+        stopwords (Set[str]): Set of stopwords to exclude.
+        
+    Returns:
+        Counter: Bigram counts without stopwords.
+    """
+    return Counter({
+        bigram: count for bigram, count in bigram_freq.items()
+        if not any(word in stopwords for word in bigram.split(" "))
+    })
+
+
+def list_input_directories(input_dir: str, depth: Optional[int] = None,
+                           include: Optional[List[str]] = None,
+                           exclude: Optional[List[str]] = None) -> List[str]:
+    """
+    List the collections of the input directory, in a deterministic order.
+    
+    Args:
+        input_dir (str): Root input directory.
+        depth (Optional[int]): Level of the collections below ``input_dir``, each read
+            with all its nested directories; None makes every nested directory a
+            collection of its own files.
+        include (Optional[List[str]]): Glob patterns of documents to read.
+        exclude (Optional[List[str]]): Glob patterns of documents and directories to skip.
+        
+    Returns:
+        List[str]: Paths of the collections (directories and archives), excluding the
+        root itself. They carry their scan options, see :class:`corpus.Collection`.
+    """
+    return scan_collections(input_dir, depth, include, exclude)
 
 
 def ensure_directory_exists(dir_path: str) -> None:
@@ -99,6 +331,48 @@ def ensure_directory_exists(dir_path: str) -> None:
         raise
 
 
+def log_cache_stats(tagger: Any) -> None:
+    """
+    Log lemma cache hit/miss counters of a tagger, if it has a cache.
+    
+    Args:
+        tagger (Any): Tagger instance exposing ``cache_stats()``, or None.
+    """
+    stats = tagger.cache_stats() if tagger is not None else None
+    if stats:
+        logger.info(
+            f"Lemma cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.1%} hit rate), {stats['entries']} entries"
+        )
+
+
+PIPELINE_STAGES = ('read', 'lemmatize', 'render', 'save')
+
+
+def parse_pipeline_workers(value: str) -> Dict[str, int]:
+    """
+    Parse pipeline worker counts given as ``READ,LEMMATIZE,RENDER,SAVE``.
+    
+    Missing trailing counts default to 1, e.g. ``1,4`` uses four lemmatize workers.
+    
+    Args:
+        value (str): Comma-separated worker counts.
+        
+    Returns:
+        Dict[str, int]: Worker count per pipeline stage.
+    """
+    import argparse
+    
+    try:
+        counts = [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected READ,LEMMATIZE,RENDER,SAVE worker counts, got {value!r}")
+    if len(counts) > len(PIPELINE_STAGES) or any(count < 1 for count in counts):
+        raise argparse.ArgumentTypeError(f"expected up to four positive worker counts, got {value!r}")
+    counts += [1] * (len(PIPELINE_STAGES) - len(counts))
+    return dict(zip(PIPELINE_STAGES, counts))
+
+
 def parse_arguments() -> Dict[str, Any]:
     """
     Parse command-line arguments for WordcloudSR scripts.
@@ -129,15 +403,78 @@ def parse_arguments() -> Dict[str, Any]:
     parser.add_argument('--max-words', type=int, default=200,
                         help='Maximum number of words in the word cloud (default: 200)')
 
+    parser.add_argument('--lemma-cache', default=None,
+                        help='SQLite file used as a persistent lemma cache (default: disabled)')
+    parser.add_argument('--lemma-cache-size', type=int, default=DEFAULT_MAX_ENTRIES,
+                        help=f'Maximum number of cached sentences before LRU eviction '
+                             f'(default: {DEFAULT_MAX_ENTRIES})')
+    parser.add_argument('--render-cache', default=None,
+                        help='Directory caching rendered word clouds by their inputs; unchanged '
+                             'clouds are copied instead of rendered (default: disabled)')
+    parser.add_argument('--render-cache-size', type=int, default=512,
+                        help='Maximum render cache size in MB before LRU eviction (default: 512)')
+
+    parser.add_argument('--collection-depth', type=int, default=None, metavar='N',
+                        help='Treat only directories and archives N levels below --input as '
+                             'collections, including their subdirectories (default: every directory)')
+    parser.add_argument('--include', action='append', default=None, metavar='PATTERN',
+                        help='Glob pattern of files to read; repeatable (default: *.txt and *.txt.gz)')
+    parser.add_argument('--exclude', action='append', default=None, metavar='PATTERN',
+                        help='Glob pattern of files and directories to skip; repeatable')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'Characters of text lemmatized per TreeTagger call (default: {DEFAULT_CHUNK_SIZE})')
+
+    parser.add_argument('--state-dir', default=None,
+                        help='Directory for per-file lemma count shards; enables incremental runs (default: disabled)')
+
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes, each with its own TreeTagger (default: 1)')
+
+    parser.add_argument('--format', default='png', choices=sorted(IMAGE_FORMATS),
+                        help='Word cloud image format (default: png)')
+    parser.add_argument('--layout-engine', default='wordcloud', choices=LAYOUT_ENGINES,
+                        help='Word placement engine: the wordcloud library\'s own, or the vectorized '
+                             'numpy engine, which is much faster on large images (default: wordcloud)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Scale of the output image relative to --width/--height (default: 1.0)')
+    parser.add_argument('--matplotlib', action='store_true',
+                        help='Save images through matplotlib like older versions (slower)')
+
+    parser.add_argument('--taggers', type=int, default=1,
+                        help='Number of TreeTagger processes per worker (default: 1)')
+    parser.add_argument('--lexicon', default=None,
+                        help='Lexicon file built with lexicon.py; known forms skip TreeTagger (default: disabled)')
+
+    parser.add_argument('--report', default=None,
+                        help='Write a JSON run report with per-directory statistics to this file')
+    parser.add_argument('--prometheus', default=None,
+                        help='Write run metrics as a Prometheus textfile (e.g. wordcloudsr.prom)')
+
+    parser.add_argument('--profile', nargs='?', const='profile', default=None, metavar='DIR',
+                        help='Write per-directory, per-stage CPU profiles to DIR (default: profile)')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='With --profile, also record peak memory of the lemmatize and render stages')
+
+    parser.add_argument('--pipeline', nargs='?', const='1,1,1,1', default=None,
+                        type=parse_pipeline_workers, metavar='READ,LEMMATIZE,RENDER,SAVE',
+                        help='Overlap reading, lemmatization, rendering and saving across directories, '
+                             'with the given worker threads per stage (wordcloudsr.py only)')
+    parser.add_argument('--queue-size', type=int, default=2,
+                        help='Directories that may wait between two pipeline stages, and text chunks '
+                             'read ahead of lemmatization per directory (default: 2)')
+
+    parser.add_argument('--results-db', default=None, metavar='FILE',
+                        help='Also load all lemma frequency tables into this SQLite database '
+                             '(wordfrqsr.py and analyze.py)')
+    parser.add_argument('--term-matrix', default=None, metavar='FILE',
+                        help='Save lemma counts as a term-document matrix (.npz) for later '
+                             're-weighting with termdoc.py (wordfrqsr.py only)')
+    parser.add_argument('--weighting', default=None, choices=('tfidf', 'log-odds'),
+                        help='Also render word clouds of the most distinctive lemmas of each '
+                             'directory, weighted by TF-IDF or log-odds (wordfrqsr.py only)')
+
     parser.add_argument('--debug', action='store_true',
                         help='Enable debug logging')
     
     args = parser.parse_args()
-    
-    # Set logging level based on debug flag
-    if args.debug:
-        logging.getLogger().setLevel(logging.DEBUG)
-        console_handler.setLevel(logging.DEBUG)
-        logger.debug("Debug logging enabled")
-    
     return vars(args)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# filepath: d:\GitHub\WordcloudSR\vocabulary.py
+"""
+WordcloudSR Interned Vocabulary and Compact Lemma Counts
+
+This module stores lemma counts as integer ids. A :class:`Vocabulary` gives
+every distinct lemma an id once per process. The counts of a directory are
+then a :class:`LemmaCounts`: two NumPy arrays of ids and counts, about 8
+bytes per distinct lemma, instead of a ``Counter`` holding its own copy of
+every lemma string. A :class:`CountStore` keeps the counts of many
+directories, so memory for a batch grows with the total vocabulary rather
+than with vocabulary times directories.
+
+The familiar ``(lemma, count)`` lists are built on demand, in the same
+order as sorting a ``Counter``.
+
+Author: Unknown
+Date: October 16, 2026
+"""
+
+import logging
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class _Ids(dict):
+    """Lemma to id mapping that assigns the next id to unknown lemmas."""
+
+    def __init__(self, lemmas: List[str]):
+        super().__init__()
+        self.lemmas = lemmas
+
+    def __missing__(self, lemma: str) -> int:
+        lemma_id = self[lemma] = len(self.lemmas)
+        self.lemmas.append(lemma)
+        return lemma_id
+
+
+class Vocabulary:
+    """
+    Interned lemmas with consecutive integer ids.
+    """
+
+    def __init__(self, lemmas: Iterable[str] = ()):
+        """
+        Args:
+            lemmas (Iterable[str]): Lemmas to intern up front, in id order.
+        """
+        self.lemmas: List[str] = []
+        self._ids = _Ids(self.lemmas)
+        for lemma in lemmas:
+            self.intern(lemma)
+
+    def __len__(self) -> int:
+        return len(self.lemmas)
+
+    def __contains__(self, lemma: str) -> bool:
+        return dict.__contains__(self._ids, lemma)
+
+    def get(self, lemma: str) -> Optional[int]:
+        """Return the id of a lemma, or None if it was never interned."""
+        return dict.get(self._ids, lemma)
+
+    def intern(self, lemma: str) -> int:
+        """Return the id of a lemma, assigning a new one if needed."""
+        return self._ids[lemma]
+
+    def intern_many(self, lemmas: List[str]) -> np.ndarray:
+        """
+        Intern a list of lemmas.
+
+        Args:
+            lemmas (List[str]): Lemmas, e.g. the tokens of a chunk.
+
+        Returns:
+            np.ndarray: Their ids, as ``uint32``.
+        """
+        return np.fromiter(map(self._ids.__getitem__, lemmas), dtype=np.uint32, count=len(lemmas))
+
+    def lookup(self, ids: Iterable[int]) -> List[str]:
+        """Return the lemmas of a sequence of ids."""
+        lemmas = self.lemmas
+        return [lemmas[lemma_id] for lemma_id in ids]
+
+
+_SHARED: Optional[Vocabulary] = None
+
+
+def shared_vocabulary() -> Vocabulary:
+    """
+    Return the vocabulary shared by everything counted in this process.
+
+    Returns:
+        Vocabulary: The process-wide vocabulary, created on first use.
+    """
+    global _SHARED
+    if _SHARED is None:
+        _SHARED = Vocabulary()
+    return _SHARED
+
+
+class LemmaCounts:
+    """
+    Compact lemma counts of one directory.
+
+    Entries are kept in order of first occurrence, so :meth:`sorted_items`
+    breaks ties exactly like sorting the items of a ``Counter``.
+    """
+
+    def __init__(self, vocabulary: Vocabulary, ids: np.ndarray, counts: np.ndarray):
+        """
+        Args:
+            vocabulary (Vocabulary): Vocabulary the ids refer to.
+            ids (np.ndarray): Lemma ids, in order of first occurrence.
+            counts (np.ndarray): Count of each id.
+        """
+        self.vocabulary = vocabulary
+        self.ids = ids.astype(np.uint32, copy=False)
+        dtype = np.uint32 if not counts.size or counts.max() <= np.iinfo(np.uint32).max else np.uint64
+        self.counts = counts.astype(dtype, copy=False)
+
+    @classmethod
+    def from_chunks(cls, lemmatized_chunks: Iterable[str],
+                    vocabulary: Optional[Vocabulary] = None) -> "LemmaCounts":
+        """
+        Count lemmas over a stream of lemmatized chunks.
+
+        Same counts as :func:`wordfrqsr.count_lemma_tokens`. The lemma strings
+        of a directory are held only while it is counted.
+
+        Args:
+            lemmatized_chunks (Iterable[str]): Space-separated lemmas, one chunk at a time.
+            vocabulary (Optional[Vocabulary]): Vocabulary to intern into; defaults to
+                :func:`shared_vocabulary`.
+
+        Returns:
+            LemmaCounts: Lemma counts.
+        """
+        # The strings are only counted per directory; the result keeps ids alone
+        lemma_freq: Counter = Counter()
+        for chunk in lemmatized_chunks:
+            lemma_freq.update(chunk.lower().split())
+        return cls.from_counter(lemma_freq, vocabulary)
+
+    @classmethod
+    def from_counter(cls, lemma_freq: Mapping[str, int],
+                     vocabulary: Optional[Vocabulary] = None) -> "LemmaCounts":
+        """
+        Convert a ``Counter`` (or any lemma to count mapping), keeping its order.
+
+        Args:
+            lemma_freq (Mapping[str, int]): Lemma counts.
+            vocabulary (Optional[Vocabulary]): Vocabulary to intern into; defaults to
+                :func:`shared_vocabulary`.
+
+        Returns:
+            LemmaCounts: Lemma counts.
+        """
+        vocabulary = vocabulary if vocabulary is not None else shared_vocabulary()
+        ids = vocabulary.intern_many(list(lemma_freq))
+        counts = np.fromiter(lemma_freq.values(), dtype=np.int64, count=len(lemma_freq))
+        keep = counts > 0
+        return cls(vocabulary, ids[keep], counts[keep])
+
+    def __len__(self) -> int:
+        return int(self.ids.size)
+
+    def total(self) -> int:
+        """Return the number of tokens counted."""
+        return int(self.counts.sum())
+
+    def values(self) -> List[int]:
+        """Return the counts, in the order of :meth:`items`."""
+        return self.counts.tolist()
+
+    def items(self) -> List[Tuple[str, int]]:
+        """Return (lemma, count) pairs in order of first occurrence."""
+        return list(zip(self.vocabulary.lookup(self.ids.tolist()), self.counts.tolist()))
+
+    def to_counter(self) -> Dict[str, int]:
+        """Return the counts as a lemma to count dictionary."""
+        return dict(self.items())
+
+    def _keep(self, stopwords: Optional[Set[str]]) -> np.ndarray:
+        if not stopwords:
+            return np.ones(self.ids.size, dtype=bool)
+        stop_ids = [lemma_id for lemma_id in map(self.vocabulary.get, stopwords) if lemma_id is not None]
+        return ~np.isin(self.ids, np.asarray(stop_ids, dtype=np.uint32))
+
+    def sorted_items(self, stopwords: Optional[Set[str]] = None,
+                     limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Return (lemma, count) pairs sorted by frequency, like :func:`wordfrqsr.sort_lemma_counts`.
+
+        Args:
+            stopwords (Optional[Set[str]]): Lemmas to leave out.
+            limit (Optional[int]): Return only the most frequent entries.
+
+        Returns:
+            List[Tuple[str, int]]: (lemma, frequency) pairs, most frequent first.
+        """
+        keep = np.flatnonzero(self._keep(stopwords))
+        # Stable sort on negated counts keeps first-occurrence order among ties
+        order = keep[np.argsort(-self.counts[keep].astype(np.int64), kind='stable')][:limit]
+        return list(zip(self.vocabulary.lookup(self.ids[order].tolist()), self.counts[order].tolist()))
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the id and count arrays."""
+        return self.ids.nbytes + self.counts.nbytes
+
+    def __reduce__(self):
+        # Ids only mean something in this process; send the lemmas to other processes
+        return _restore_counts, ("\n".join(self.vocabulary.lookup(self.ids.tolist())), self.counts)
+
+
+def _restore_counts(lemmas: str, counts: np.ndarray) -> LemmaCounts:
+    """Rebuild pickled counts against the receiving process's shared vocabulary."""
+    vocabulary = shared_vocabulary()
+    ids = vocabulary.intern_many(lemmas.split("\n")) if counts.size else np.zeros(0, dtype=np.uint32)
+    return LemmaCounts(vocabulary, ids, counts)
+
+
+class CountStore:
+    """
+    Lemma counts of many directories over one vocabulary.
+    """
+
+    def __init__(self, vocabulary: Optional[Vocabulary] = None):
+        """
+        Args:
+            vocabulary (Optional[Vocabulary]): Vocabulary of all stored counts; defaults
+                to :func:`shared_vocabulary`.
+        """
+        self.vocabulary = vocabulary if vocabulary is not None else shared_vocabulary()
+        self._counts: Dict[str, LemmaCounts] = {}
+
+    def add(self, name: str, counts: LemmaCounts) -> None:
+        """
+        Store the counts of a directory.
+
+        Args:
+            name (str): Directory name.
+            counts (LemmaCounts): Its counts; re-interned if they use another vocabulary.
+        """
+        if counts.vocabulary is not self.vocabulary:
+            counts = LemmaCounts(self.vocabulary,
+                                 self.vocabulary.intern_many(counts.vocabulary.lookup(counts.ids.tolist())),
+                                 counts.counts)
+        self._counts[name] = counts
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._counts
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._counts)
+
+    def __getitem__(self, name: str) -> LemmaCounts:
+        return self._counts[name]
+
+    def items(self, name: str, stopwords: Optional[Set[str]] = None) -> List[Tuple[str, int]]:
+        """
+        Return the (lemma, count) pairs of a directory sorted by frequency.
+
+        Args:
+            name (str): Directory name.
+            stopwords (Optional[Set[str]]): Lemmas to leave out.
+
+        Returns:
+            List[Tuple[str, int]]: (lemma, frequency) pairs, most frequent first.
+        """
+        return self._counts[name].sorted_items(stopwords)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the count arrays of all directories (the vocabulary not included)."""
+        return sum(counts.nbytes for counts in self._counts.values())
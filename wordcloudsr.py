@@ -17,23 +17,51 @@ Date: May 21, 2025
 """
 
 import os
-import argparse
+import time
+import heapq
 from pathlib import Path
-from typing import Set, Optional, Dict, List, Tuple
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
-from SerbianTagger import SrbTreeTagger
+from typing import TYPE_CHECKING, Any, Callable, Set, Optional, Dict, Iterable, Iterator, List, Tuple
+from SerbianTagger import SrbTreeTagger, create_tagger
+from lemma_cache import DEFAULT_MAX_ENTRIES
+from metrics import DirectoryMetrics, RunResults, finish_run
+from parallel import map_directories
+from pipeline import Stage, prefetch, run_pipeline
+from progress import CancellationToken, Progress, ProgressTracker
+from render_cache import DEFAULT_MAX_MB, RenderCache
 from utils import (
+    DEFAULT_CHUNK_SIZE,
+    IMAGE_FORMATS,
+    LAYOUT_ENGINES,
+    count_lemmas_and_bigrams,
+    is_cloud_word,
     load_stopwords, 
-    extract_text_from_directory, 
+    lemmatize_chunks,
     ensure_directory_exists,
+    list_input_directories,
+    log_cache_stats,
     parse_arguments,
+    remove_stopword_bigrams,
+    setup_logging,
     logger
 )
 
+# wordcloud (and through it matplotlib) is imported by the stages that lay out
+# or save word clouds, so runs that only hit the render cache never load it
+if TYPE_CHECKING:
+    from wordcloud import WordCloud
+
+# Fixed WordCloud settings, part of the render cache fingerprint
+WORDCLOUD_OPTIONS = {
+    'background_color': 'white',
+    'prefer_horizontal': 0.9,
+    'relative_scaling': 0.5,
+    'min_font_size': 8,
+}
+
 
 def generate_wordcloud(text: str, stopwords: Set[str], collocations: bool = False,
-                      width: int = 1200, height: int = 800, max_words: int = 200) -> Optional[WordCloud]:
+                      width: int = 1200, height: int = 800, max_words: int = 200,
+                      layout_engine: str = 'wordcloud') -> Optional["WordCloud"]:
     """
     Generate a word cloud from lemmatized text.
     
@@ -44,6 +72,7 @@ def generate_wordcloud(text: str, stopwords: Set[str], collocations: bool = Fals
         width (int): Width of the word cloud image.
         height (int): Height of the word cloud image.
         max_words (int): Maximum number of words to include.
+        layout_engine (str): Word placement engine, one of ``LAYOUT_ENGINES``.
         
     Returns:
         Optional[WordCloud]: Generated word cloud object or None if generation fails.
@@ -51,7 +80,8 @@ def generate_wordcloud(text: str, stopwords: Set[str], collocations: bool = Fals
     if not text:
         logger.warning("Empty text provided for word cloud generation")
         return None
-        
+    
+    from wordcloud import WordCloud
     try:
         # Configure and generate the word cloud
         wordcloud = WordCloud(
@@ -60,11 +90,13 @@ def generate_wordcloud(text: str, stopwords: Set[str], collocations: bool = Fals
             width=width,
             height=height,
             max_words=max_words,
-            background_color='white',
-            prefer_horizontal=0.9,
-            relative_scaling=0.5,
-            min_font_size=8
-        ).generate(text.lower())
+            **WORDCLOUD_OPTIONS
+        )
+        if layout_engine == 'numpy':
+            from layout_engine import generate_from_frequencies as numpy_layout
+            numpy_layout(wordcloud, wordcloud.process_text(text.lower()))
+        else:
+            wordcloud.generate(text.lower())
         
         logger.debug(f"Generated word cloud with collocations={collocations}")
         return wordcloud
@@ -73,14 +105,123 @@ def generate_wordcloud(text: str, stopwords: Set[str], collocations: bool = Fals
         return None
 
 
-def save_wordcloud(wordcloud: WordCloud, output_path: str, dpi: int = 300) -> bool:
+def select_cloud_words(frequencies: Iterable[Tuple[str, int]], max_words: int) -> Dict[str, int]:
+    """
+    Select the entries of a frequency table that a word cloud lays out.
+    
+    Args:
+        frequencies (Iterable[Tuple[str, int]]): (lemma, frequency) pairs with stopwords already
+            removed. Keys may also be collocations of two lemmas separated by a space.
+        max_words (int): Maximum number of words to include.
+        
+    Returns:
+        Dict[str, int]: The ``max_words`` most frequent displayable entries.
+    """
+    # Only the top max_words entries are laid out, so select them up front
+    return dict(heapq.nlargest(
+        max_words,
+        ((lemma, count) for lemma, count in frequencies
+         if count > 0 and all(is_cloud_word(word) for word in lemma.split(" "))),
+        key=lambda item: item[1]
+    ))
+
+
+def generate_wordcloud_from_frequencies(frequencies: Iterable[Tuple[str, int]],
+                                        width: int = 1200, height: int = 800,
+                                        max_words: int = 200,
+                                        scale: float = 1.0,
+                                        layout_engine: str = 'wordcloud') -> Optional["WordCloud"]:
+    """
+    Generate a word cloud from precomputed lemma frequencies.
+    
+    Args:
+        frequencies (Iterable[Tuple[str, int]]): (lemma, frequency) pairs with stopwords already
+            removed. Keys may also be collocations of two lemmas separated by a space.
+        width (int): Width of the word cloud image.
+        height (int): Height of the word cloud image.
+        max_words (int): Maximum number of words to include.
+        scale (float): Scaling between layout and output image size.
+        layout_engine (str): Word placement engine, one of ``LAYOUT_ENGINES``: the
+            ``wordcloud`` library's own, or the faster ``numpy`` engine.
+        
+    Returns:
+        Optional[WordCloud]: Generated word cloud object or None if generation fails.
+    """
+    words = select_cloud_words(frequencies, max_words)
+    if not words:
+        logger.warning("Empty frequency table provided for word cloud generation")
+        return None
+    
+    from wordcloud import WordCloud
+    try:
+        wordcloud = WordCloud(
+            width=width,
+            height=height,
+            max_words=max_words,
+            scale=scale,
+            **WORDCLOUD_OPTIONS
+        )
+        if layout_engine == 'numpy':
+            from layout_engine import generate_from_frequencies as numpy_layout
+            numpy_layout(wordcloud, words)
+        else:
+            wordcloud.generate_from_frequencies(words)
+        
+        logger.debug(f"Generated word cloud from {len(words)} frequencies")
+        return wordcloud
+    except Exception as e:
+        logger.error(f"Error generating word cloud: {e}")
+        return None
+
+
+def collocation_frequencies(lemma_freq: Dict[str, int], bigram_freq: Dict[str, int],
+                            threshold: int = 30) -> Dict[str, int]:
+    """
+    Merge lemma and bigram counts the way ``WordCloud`` does with collocations enabled.
+    
+    A bigram whose collocation score exceeds the threshold is added as its own
+    entry and its count is subtracted from both of its lemmas.
+    
+    Args:
+        lemma_freq (Dict[str, int]): Lemma counts with stopwords removed.
+        bigram_freq (Dict[str, int]): Bigram counts with stopword bigrams removed.
+        threshold (int): Minimum collocation score, as in ``WordCloud.collocation_threshold``.
+        
+    Returns:
+        Dict[str, int]: Frequencies of lemmas and collocations.
+    """
+    from wordcloud.tokenization import score
+    
+    unigrams = {lemma: count for lemma, count in lemma_freq.items() if is_cloud_word(lemma)}
+    n_words = sum(unigrams.values())
+    frequencies = dict(unigrams)
+    for bigram, count in bigram_freq.items():
+        first, second = bigram.split(" ")
+        if first not in unigrams or second not in unigrams:
+            continue
+        if score(count, unigrams[first], unigrams[second], n_words) > threshold:
+            frequencies[first] -= count
+            frequencies[second] -= count
+            frequencies[bigram] = count
+    return {word: count for word, count in frequencies.items() if count > 0}
+
+
+def save_wordcloud(wordcloud: "WordCloud", output_path: str, dpi: int = 300,
+                   use_matplotlib: bool = False) -> bool:
     """
     Save a word cloud image to a file.
     
+    By default the word cloud's own raster is written directly, at its
+    ``width``/``height`` times ``scale``, in the format given by the file
+    extension (.png, .webp, .jpg). A .svg extension writes a vector image.
+    The legacy matplotlib path renders a 16x10 inch figure instead and is
+    much slower.
+    
     Args:
         wordcloud (WordCloud): The word cloud object to save.
         output_path (str): Path where the image will be saved.
-        dpi (int): Dots per inch for the output image.
+        dpi (int): Dots per inch for the output image (matplotlib only).
+        use_matplotlib (bool): Whether to render the image through matplotlib.
         
     Returns:
         bool: True if saving was successful, False otherwise.
@@ -89,13 +230,26 @@ def save_wordcloud(wordcloud: WordCloud, output_path: str, dpi: int = 300) -> bo
     ensure_directory_exists(os.path.dirname(output_path))
     
     try:
-        # Use matplotlib for better quality image saving
-        plt.figure(figsize=(16, 10), dpi=dpi)
-        plt.imshow(wordcloud, interpolation='bilinear')
-        plt.axis('off')
-        plt.tight_layout(pad=0)
-        plt.savefig(output_path, dpi=dpi, bbox_inches='tight')
-        plt.close()
+        # Replace a hard-linked file (e.g. from the render cache) instead of writing through the link
+        if os.path.isfile(output_path) and os.stat(output_path).st_nlink > 1:
+            os.remove(output_path)
+        
+        extension = os.path.splitext(output_path)[1].lower()
+        if use_matplotlib:
+            import matplotlib.pyplot as plt
+            plt.figure(figsize=(16, 10), dpi=dpi)
+            plt.imshow(wordcloud, interpolation='bilinear')
+            plt.axis('off')
+            plt.tight_layout(pad=0)
+            plt.savefig(output_path, dpi=dpi, bbox_inches='tight')
+            plt.close()
+        elif extension == '.svg':
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write(wordcloud.to_svg())
+        elif extension in ('.jpg', '.jpeg', '.webp'):
+            wordcloud.to_image().save(output_path, quality=95)
+        else:
+            wordcloud.to_image().save(output_path)
         
         logger.info(f"Successfully saved word cloud to {output_path}")
         return True
@@ -106,7 +260,13 @@ def save_wordcloud(wordcloud: WordCloud, output_path: str, dpi: int = 300) -> bo
 
 def process_directory(directory: str, tagger: SrbTreeTagger, stopwords: Set[str],
                      output_dir: str, collocations: bool,
-                     width: int, height: int, max_words: int) -> Tuple[Optional[str], Optional[str]]:
+                     width: int, height: int, max_words: int,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     image_format: str = 'png', scale: float = 1.0,
+                     use_matplotlib: bool = False,
+                     render_cache: Optional[RenderCache] = None,
+                     layout_engine: str = 'wordcloud',
+                     metrics: Optional[DirectoryMetrics] = None) -> Tuple[Optional[str], Optional[str]]:
     """
     Process a single directory of text files to generate word clouds.
     
@@ -119,69 +279,443 @@ def process_directory(directory: str, tagger: SrbTreeTagger, stopwords: Set[str]
         width (int): Width of the generated word cloud image.
         height (int): Height of the generated word cloud image.
         max_words (int): Maximum number of words in the word cloud.
+        chunk_size (int): Characters of text lemmatized per TreeTagger call.
+        image_format (str): Output format, one of ``IMAGE_FORMATS``.
+        scale (float): Scaling between layout and output image size.
+        use_matplotlib (bool): Whether to save images through matplotlib.
+        render_cache (Optional[RenderCache]): Cache of rendered images; unchanged word
+            clouds are copied from it instead of being laid out again.
+        layout_engine (str): Word placement engine, one of ``LAYOUT_ENGINES``.
+        metrics (Optional[DirectoryMetrics]): Collects file, token and timing statistics.
         
     Returns:
         Tuple[Optional[str], Optional[str]]: Paths to the standard and collocations word cloud images
     """
     logger.info(f"Processing directory: {directory}")
+    metrics = metrics or DirectoryMetrics(directory)
     
-    # Get all text from the directory
-    all_text = extract_text_from_directory(directory)
+    # Count lemmas and bigrams once, chunk by chunk
+    lemmatized_chunks = metrics.timed(
+        lemmatize_chunks(metrics.read_chunks(directory, chunk_size), tagger), 'lemmatize')
+    with metrics.stage('count'):
+        lemma_freq, bigram_freq = count_lemmas_and_bigrams(lemmatized_chunks)
+    metrics.add_counts(lemma_freq)
     
-    if not all_text:
-        logger.warning(f"No text content found in {directory}, skipping")
+    if not lemma_freq:
+        logger.warning(f"No lemmatized text for {directory}, skipping")
         return None, None
+    
+    return render_wordclouds(
+        lemma_freq,
+        bigram_freq,
+        os.path.basename(directory),
+        stopwords,
+        output_dir,
+        collocations,
+        width,
+        height,
+        max_words,
+        image_format,
+        scale,
+        use_matplotlib,
+        metrics,
+        render_cache,
+        layout_engine
+    )
+
+
+def render_wordclouds(lemma_freq: Dict[str, int], bigram_freq: Dict[str, int],
+                      folder_name: str, stopwords: Set[str],
+                      output_dir: str, collocations: bool,
+                      width: int, height: int, max_words: int,
+                      image_format: str = 'png', scale: float = 1.0,
+                      use_matplotlib: bool = False,
+                      metrics: Optional[DirectoryMetrics] = None,
+                      render_cache: Optional[RenderCache] = None,
+                      layout_engine: str = 'wordcloud') -> Tuple[Optional[str], Optional[str]]:
+    """
+    Generate and save the standard and (optionally) collocations word clouds.
+    
+    Both clouds are rendered from the same precomputed counts, so the text is
+    never re-tokenized. With a render cache, clouds whose frequency table and
+    parameters match an earlier run are copied from the cache instead.
+    
+    Args:
+        lemma_freq (Dict[str, int]): Lemma counts of one directory.
+        bigram_freq (Dict[str, int]): Bigram counts of one directory.
+        folder_name (str): Name used for the output image files.
+        stopwords (Set[str]): Set of stopwords.
+        output_dir (str): Directory to save output images.
+        collocations (bool): Whether to include collocations.
+        width (int): Width of the generated word cloud image.
+        height (int): Height of the generated word cloud image.
+        max_words (int): Maximum number of words in the word cloud.
+        image_format (str): Output format, one of ``IMAGE_FORMATS``.
+        scale (float): Scaling between layout and output image size.
+        use_matplotlib (bool): Whether to save images through matplotlib.
+        metrics (Optional[DirectoryMetrics]): Collects render and write timings.
+        render_cache (Optional[RenderCache]): Cache of rendered images.
+        layout_engine (str): Word placement engine, one of ``LAYOUT_ENGINES``.
         
-    # Lemmatize the combined text
-    lemmatized_text = tagger.lemmatize(all_text)
+    Returns:
+        Tuple[Optional[str], Optional[str]]: Paths to the standard and collocations word cloud images
+    """
+    metrics = metrics or DirectoryMetrics(folder_name)
+    tables = cloud_frequencies(lemma_freq, bigram_freq, stopwords, collocations, max_words, metrics)
+    hits, keys = fetch_cached_wordclouds(render_cache, tables, folder_name, output_dir, stopwords,
+                                         width, height, max_words, image_format, scale,
+                                         use_matplotlib, metrics, layout_engine)
+    wordclouds = layout_frequencies(tables, hits, width, height, max_words, scale, metrics,
+                                    layout_engine)
+    paths = save_wordclouds(wordclouds, folder_name, output_dir, image_format,
+                            use_matplotlib, metrics)
+    store_cached_wordclouds(render_cache, keys, paths)
+    return tuple(hit or path for hit, path in zip(hits, paths))
+
+
+def cloud_frequencies(lemma_freq: Dict[str, int], bigram_freq: Dict[str, int],
+                      stopwords: Set[str], collocations: bool, max_words: int,
+                      metrics: Optional[DirectoryMetrics] = None
+                      ) -> Tuple[Dict[str, int], Optional[Dict[str, int]]]:
+    """
+    Build the frequency tables of the standard and (optionally) collocations word clouds.
     
-    if not lemmatized_text:
-        logger.warning(f"Lemmatization failed for {directory}, skipping")
-        return None, None
+    Args:
+        lemma_freq (Dict[str, int]): Lemma counts of one directory.
+        bigram_freq (Dict[str, int]): Bigram counts of one directory.
+        stopwords (Set[str]): Set of stopwords.
+        collocations (bool): Whether to include collocations.
+        max_words (int): Maximum number of words in the word cloud.
+        metrics (Optional[DirectoryMetrics]): Collects count timings.
+        
+    Returns:
+        Tuple[Dict[str, int], Optional[Dict[str, int]]]: The entries laid out in the standard
+        and collocations word clouds; the latter is None without collocations.
+    """
+    metrics = metrics or DirectoryMetrics('')
+    with metrics.stage('count'):
+        unigrams = {lemma: count for lemma, count in lemma_freq.items() if lemma not in stopwords}
+        standard = select_cloud_words(unigrams.items(), max_words)
+        collocated = None
+        if collocations:
+            frequencies = collocation_frequencies(unigrams, remove_stopword_bigrams(bigram_freq, stopwords))
+            collocated = select_cloud_words(frequencies.items(), max_words)
+    return standard, collocated
+
+
+def wordcloud_paths(folder_name: str, output_dir: str,
+                    image_format: str = 'png') -> Tuple[str, str]:
+    """Return the output paths of the standard and collocations word clouds of a directory."""
+    extension = IMAGE_FORMATS[image_format]
+    return tuple(os.path.join(output_dir, f'{folder_name}{suffix}.{extension}')
+                 for suffix in ('', '_collocations'))
+
+
+def fetch_cached_wordclouds(render_cache: Optional[RenderCache],
+                            tables: Tuple[Optional[Dict[str, int]], Optional[Dict[str, int]]],
+                            folder_name: str, output_dir: str, stopwords: Set[str],
+                            width: int, height: int, max_words: int, image_format: str,
+                            scale: float, use_matplotlib: bool,
+                            metrics: Optional[DirectoryMetrics] = None,
+                            layout_engine: str = 'wordcloud'
+                            ) -> Tuple[Tuple[Optional[str], Optional[str]],
+                                       Tuple[Optional[str], Optional[str]]]:
+    """
+    Copy unchanged word clouds from the render cache to the output directory.
     
-    folder_name = os.path.basename(directory)
-    results = []
+    Args:
+        render_cache (Optional[RenderCache]): Cache of rendered images; None disables caching.
+        tables (Tuple[Optional[Dict[str, int]], Optional[Dict[str, int]]]): Frequency tables
+            from :func:`cloud_frequencies`.
+        folder_name (str): Name used for the output image files.
+        output_dir (str): Directory to save output images.
+        stopwords (Set[str]): Set of stopwords.
+        width (int): Width of the generated word cloud image.
+        height (int): Height of the generated word cloud image.
+        max_words (int): Maximum number of words in the word cloud.
+        image_format (str): Output format, one of ``IMAGE_FORMATS``.
+        scale (float): Scaling between layout and output image size.
+        use_matplotlib (bool): Whether images are saved through matplotlib.
+        metrics (Optional[DirectoryMetrics]): Collects write timings and cache hits.
+        layout_engine (str): Word placement engine, one of ``LAYOUT_ENGINES``.
+        
+    Returns:
+        Tuple[Tuple[Optional[str], Optional[str]], Tuple[Optional[str], Optional[str]]]: Paths
+        of the word clouds taken from the cache, and the cache keys of those still to be rendered.
+    """
+    if render_cache is None:
+        return (None, None), (None, None)
+    metrics = metrics or DirectoryMetrics(folder_name)
+    hits, keys = [], []
+    with metrics.stage('write'):
+        for table, kind, path in zip(tables, ('standard', 'collocations'),
+                                     wordcloud_paths(folder_name, output_dir, image_format)):
+            hit = key = None
+            if table:
+                key = render_cache.key(table, {
+                    'kind': kind,
+                    'width': width,
+                    'height': height,
+                    'max_words': max_words,
+                    'scale': scale,
+                    'format': image_format,
+                    'matplotlib': use_matplotlib,
+                    'engine': layout_engine,
+                    'options': WORDCLOUD_OPTIONS,
+                    'stopwords': sorted(stopwords),
+                })
+                if render_cache.fetch(key, path):
+                    hit, key = path, None
+                    metrics.render_cache_hits += 1
+                else:
+                    metrics.render_cache_misses += 1
+            hits.append(hit)
+            keys.append(key)
+    return tuple(hits), tuple(keys)
+
+
+def store_cached_wordclouds(render_cache: Optional[RenderCache],
+                            keys: Tuple[Optional[str], Optional[str]],
+                            paths: Tuple[Optional[str], Optional[str]]) -> None:
+    """Add freshly saved word clouds to the render cache under their keys."""
+    if render_cache is None:
+        return
+    for key, path in zip(keys, paths):
+        if key and path:
+            render_cache.store(key, path)
+
+
+def layout_wordclouds(lemma_freq: Dict[str, int], bigram_freq: Dict[str, int],
+                      stopwords: Set[str], collocations: bool,
+                      width: int, height: int, max_words: int, scale: float = 1.0,
+                      metrics: Optional[DirectoryMetrics] = None,
+                      layout_engine: str = 'wordcloud'
+                      ) -> Tuple[Optional["WordCloud"], Optional["WordCloud"]]:
+    """
+    Lay out the standard and (optionally) collocations word clouds without saving them.
     
-    # Generate standard word cloud
-    wordcloud = generate_wordcloud(
-        lemmatized_text,
-        stopwords,
-        collocations=False,
-        width=width,
-        height=height,
-        max_words=max_words
-    )
-    if wordcloud:
-        std_path = os.path.join(output_dir, f'{folder_name}.png')
-        if save_wordcloud(wordcloud, std_path):
-            results.append(std_path)
+    Args:
+        lemma_freq (Dict[str, int]): Lemma counts of one directory.
+        bigram_freq (Dict[str, int]): Bigram counts of one directory.
+        stopwords (Set[str]): Set of stopwords.
+        collocations (bool): Whether to include collocations.
+        width (int): Width of the generated word cloud image.
+        height (int): Height of the generated word cloud image.
+        max_words (int): Maximum number of words in the word cloud.
+        scale (float): Scaling between layout and output image size.
+        metrics (Optional[DirectoryMetrics]): Collects count and render timings.
+        
+    Returns:
+        Tuple[Optional[WordCloud], Optional[WordCloud]]: Standard and collocations word clouds.
+    """
+    tables = cloud_frequencies(lemma_freq, bigram_freq, stopwords, collocations, max_words, metrics)
+    return layout_frequencies(tables, (None, None), width, height, max_words, scale, metrics,
+                              layout_engine)
+
+
+def layout_frequencies(tables: Tuple[Optional[Dict[str, int]], Optional[Dict[str, int]]],
+                       skip: Tuple[Optional[str], Optional[str]],
+                       width: int, height: int, max_words: int, scale: float = 1.0,
+                       metrics: Optional[DirectoryMetrics] = None,
+                       layout_engine: str = 'wordcloud'
+                       ) -> Tuple[Optional["WordCloud"], Optional["WordCloud"]]:
+    """
+    Lay out word clouds from the frequency tables of :func:`cloud_frequencies`.
+    
+    Args:
+        tables (Tuple[Optional[Dict[str, int]], Optional[Dict[str, int]]]): Standard and
+            collocations frequency tables; None tables are skipped.
+        skip (Tuple[Optional[str], Optional[str]]): Clouds that are not laid out because
+            they already exist, e.g. paths of render cache hits.
+        width (int): Width of the generated word cloud image.
+        height (int): Height of the generated word cloud image.
+        max_words (int): Maximum number of words in the word cloud.
+        scale (float): Scaling between layout and output image size.
+        metrics (Optional[DirectoryMetrics]): Collects render timings.
+        layout_engine (str): Word placement engine, one of ``LAYOUT_ENGINES``.
+        
+    Returns:
+        Tuple[Optional[WordCloud], Optional[WordCloud]]: Standard and collocations word clouds.
+    """
+    metrics = metrics or DirectoryMetrics('')
+    wordclouds = []
+    for table, done in zip(tables, skip):
+        wordcloud = None
+        if table is not None and not done:
+            with metrics.stage('render'):
+                wordcloud = generate_wordcloud_from_frequencies(table.items(), width, height,
+                                                                max_words, scale, layout_engine)
+        wordclouds.append(wordcloud)
+    return tuple(wordclouds)
+
+
+def save_wordclouds(wordclouds: Tuple[Optional["WordCloud"], Optional["WordCloud"]],
+                    folder_name: str, output_dir: str, image_format: str = 'png',
+                    use_matplotlib: bool = False,
+                    metrics: Optional[DirectoryMetrics] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Save the standard and collocations word clouds of a directory.
+    
+    Args:
+        wordclouds (Tuple[Optional[WordCloud], Optional[WordCloud]]): Standard and collocations
+            word clouds; missing clouds are skipped.
+        folder_name (str): Name used for the output image files.
+        output_dir (str): Directory to save output images.
+        image_format (str): Output format, one of ``IMAGE_FORMATS``.
+        use_matplotlib (bool): Whether to save images through matplotlib.
+        metrics (Optional[DirectoryMetrics]): Collects write timings.
+        
+    Returns:
+        Tuple[Optional[str], Optional[str]]: Paths to the standard and collocations word cloud images
+    """
+    metrics = metrics or DirectoryMetrics(folder_name)
+    results = []
+    for wordcloud, path in zip(wordclouds, wordcloud_paths(folder_name, output_dir, image_format)):
+        if not wordcloud:
+            path = None
         else:
-            results.append(None)
-    else:
-        results.append(None)
-    
-    # Generate collocations word cloud if requested
-    if collocations:
-        wordcloud = generate_wordcloud(
-            lemmatized_text,
-            stopwords,
-            collocations=True,
-            width=width,
-            height=height,
-            max_words=max_words
-        )
-        if wordcloud:
-            coll_path = os.path.join(output_dir, f'{folder_name}_collocations.png')
-            if save_wordcloud(wordcloud, coll_path):
-                results.append(coll_path)
-            else:
-                results.append(None)
+            with metrics.stage('write'):
+                if not save_wordcloud(wordcloud, path, use_matplotlib=use_matplotlib):
+                    path = None
+        results.append(path)
+    return tuple(results)
+
+
+def pipeline_directories(directories: List[str], stopwords: Set[str], output_dir: str,
+                         collocations: bool, width: int, height: int, max_words: int,
+                         chunk_size: int, image_format: str, scale: float, use_matplotlib: bool,
+                         render_cache: Optional[RenderCache], layout_engine: str,
+                         tagger_kwargs: Dict[str, Any], pipeline_workers: Dict[str, int],
+                         queue_size: int = 2, progress: Optional[ProgressTracker] = None,
+                         cancel: Optional[CancellationToken] = None
+                         ) -> List[Tuple[str, Tuple[Optional[str], Optional[str]], DirectoryMetrics]]:
+    """
+    Generate word clouds with the read, lemmatize, render and save stages overlapping.
+    
+    Every stage runs in its own worker threads, connected by bounded queues,
+    so one directory can be lemmatized while the previous one is rendered and
+    saved. Each lemmatize worker owns a tagger created from ``tagger_kwargs``.
+    
+    Args:
+        directories (List[str]): Directories to process.
+        stopwords (Set[str]): Set of stopwords.
+        output_dir (str): Directory to save output images.
+        collocations (bool): Whether to include collocations.
+        width (int): Width of the generated word cloud image.
+        height (int): Height of the generated word cloud image.
+        max_words (int): Maximum number of words in the word cloud.
+        chunk_size (int): Characters of text lemmatized per TreeTagger call.
+        image_format (str): Output format, one of ``IMAGE_FORMATS``.
+        scale (float): Scaling between layout and output image size.
+        use_matplotlib (bool): Whether to save images through matplotlib.
+        render_cache (Optional[RenderCache]): Cache of rendered images.
+        layout_engine (str): Word placement engine, one of ``LAYOUT_ENGINES``.
+        tagger_kwargs (Dict[str, Any]): Keyword arguments for ``create_tagger``.
+        pipeline_workers (Dict[str, int]): Worker threads of the ``read``, ``lemmatize``,
+            ``render`` and ``save`` stages.
+        queue_size (int): Directories that may wait between two stages, and text
+            chunks each directory's reader thread may read ahead of lemmatization.
+        progress (Optional[ProgressTracker]): Receives the progress of the run.
+        cancel (Optional[CancellationToken]): Stops the pipeline between chunks and directories.
+        
+    Returns:
+        List[Tuple[str, Tuple[Optional[str], Optional[str]], DirectoryMetrics]]: (directory,
+        image paths, metrics) in the order of ``directories``. Failed directories are left out,
+        as are those not finished when the run is cancelled.
+    """
+    save_workers = pipeline_workers.get('save', 1)
+    if use_matplotlib and save_workers > 1:
+        # pyplot keeps global state and cannot be used from several threads
+        logger.warning("Saving through matplotlib uses a single save worker")
+        save_workers = 1
+    
+    def read(directory: str, _: Any) -> Dict[str, Any]:
+        logger.info(f"Processing directory: {directory}")
+        metrics = DirectoryMetrics(directory)
+        metrics.progress, metrics.cancel = progress, cancel
+        # DirectoryMetrics is not thread-safe, so the reader thread records into its own
+        reading = DirectoryMetrics(directory)
+        reading.progress, reading.cancel = progress, cancel
+        
+        def read_chunks() -> Iterator[str]:
+            try:
+                yield from reading.read_chunks(directory, chunk_size)
+            finally:
+                metrics.add_reading(reading)
+        
+        # A reader thread fills a bounded chunk queue while the directory waits for
+        # and goes through the lemmatize stage; waiting on it is charged to extract
+        chunks = metrics.timed(prefetch(read_chunks(), queue_size, f"read-{os.path.basename(directory)}"),
+                               'extract')
+        return {'directory': directory, 'metrics': metrics, 'chunks': chunks}
+    
+    def lemmatize(job: Dict[str, Any], tagger: Any) -> Dict[str, Any]:
+        metrics = job['metrics']
+        lemmatized_chunks = metrics.timed(lemmatize_chunks(job.pop('chunks'), tagger), 'lemmatize')
+        with metrics.stage('count'):
+            job['counts'] = count_lemmas_and_bigrams(lemmatized_chunks)
+        metrics.add_counts(job['counts'][0])
+        return job
+    
+    def render(job: Dict[str, Any], _: Any) -> Dict[str, Any]:
+        lemma_freq, bigram_freq = job.pop('counts')
+        job['hits'], job['keys'] = (None, None), (None, None)
+        if not lemma_freq:
+            logger.warning(f"No lemmatized text for {job['directory']}, skipping")
+            job['wordclouds'] = (None, None)
         else:
-            results.append(None)
-    else:
-        results.append(None)
+            metrics = job['metrics']
+            tables = cloud_frequencies(lemma_freq, bigram_freq, stopwords, collocations,
+                                       max_words, metrics)
+            job['hits'], job['keys'] = fetch_cached_wordclouds(
+                render_cache, tables, os.path.basename(job['directory']), output_dir, stopwords,
+                width, height, max_words, image_format, scale, use_matplotlib, metrics,
+                layout_engine)
+            job['wordclouds'] = layout_frequencies(tables, job['hits'], width, height,
+                                                   max_words, scale, metrics, layout_engine)
+        return job
     
-    return tuple(results)
+    def save(job: Dict[str, Any], _: Any) -> Dict[str, Any]:
+        paths = save_wordclouds(job.pop('wordclouds'), os.path.basename(job['directory']),
+                                output_dir, image_format, use_matplotlib, job['metrics'])
+        store_cached_wordclouds(render_cache, job['keys'], paths)
+        job['paths'] = tuple(hit or path for hit, path in zip(job['hits'], paths))
+        if progress is not None:
+            progress.finish(job['metrics'])
+        return job
+    
+    def close_tagger(tagger: Any) -> None:
+        log_cache_stats(tagger)
+        tagger.close()
+    
+    stages = [
+        Stage('read', read, pipeline_workers.get('read', 1)),
+        Stage('lemmatize', lemmatize, pipeline_workers.get('lemmatize', 1),
+              setup=lambda: create_tagger(**tagger_kwargs), teardown=close_tagger),
+        Stage('render', render, pipeline_workers.get('render', 1)),
+        Stage('save', save, save_workers),
+    ]
+    logger.info(
+        "Pipelined processing with "
+        + ", ".join(f"{stage.workers} {stage.name}" for stage in stages)
+        + f" workers, queue size {queue_size}"
+    )
+    
+    # Directories finish out of order; report them in input order
+    finished = sorted(run_pipeline(directories, stages, queue_size, cancel), key=lambda entry: entry[0])
+    return [(job['directory'], job['paths'], job['metrics']) for _, job in finished]
+
+
+def log_render_cache_stats(cache: RenderCache, directory_metrics: List[DirectoryMetrics]) -> None:
+    """Log render cache hits of a run and the size of the cache."""
+    hits = sum(metrics.render_cache_hits for metrics in directory_metrics)
+    misses = sum(metrics.render_cache_misses for metrics in directory_metrics)
+    stats = cache.stats()
+    hit_rate = hits / (hits + misses) if hits + misses else 0.0
+    logger.info(
+        f"Render cache: {hits} hits, {misses} misses ({hit_rate:.1%} hit rate), "
+        f"{stats['entries']} images, {stats['megabytes']:.1f} MB"
+    )
 
 
 def process_files(collocations: bool = False,
@@ -190,7 +724,30 @@ def process_files(collocations: bool = False,
                  stopwords_file: str = 'stopwords.txt',
                  width: int = 1200,
                  height: int = 800,
-                 max_words: int = 200) -> Dict[str, Dict[str, str]]:
+                 max_words: int = 200,
+                 lemma_cache: Optional[str] = None,
+                 lemma_cache_size: int = DEFAULT_MAX_ENTRIES,
+                 workers: int = 1,
+                 taggers: int = 1,
+                 lexicon: Optional[str] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 image_format: str = 'png',
+                 scale: float = 1.0,
+                 use_matplotlib: bool = False,
+                 report_path: Optional[str] = None,
+                 prometheus_path: Optional[str] = None,
+                 profile_dir: Optional[str] = None,
+                 profile_memory: bool = False,
+                 pipeline_workers: Optional[Dict[str, int]] = None,
+                 queue_size: int = 2,
+                 render_cache: Optional[str] = None,
+                 render_cache_size: int = DEFAULT_MAX_MB,
+                 layout_engine: str = 'wordcloud',
+                 collection_depth: Optional[int] = None,
+                 include: Optional[List[str]] = None,
+                 exclude: Optional[List[str]] = None,
+                 progress: Optional[Callable[[Progress], None]] = None,
+                 cancel: Optional[CancellationToken] = None) -> Dict[str, Dict[str, str]]:
     """
     Process text files in subdirectories, generate word clouds, and save as images.
     
@@ -202,65 +759,132 @@ def process_files(collocations: bool = False,
         width (int): Width of the generated word clouds.
         height (int): Height of the generated word clouds.
         max_words (int): Maximum number of words in each word cloud.
+        lemma_cache (Optional[str]): SQLite file for a persistent lemma cache.
+        lemma_cache_size (int): Maximum number of entries in the lemma cache.
+        workers (int): Number of worker processes. Each worker starts its own
+            TreeTagger; with 1 everything runs in the current process.
+        taggers (int): Number of TreeTagger processes per worker; above 1 a
+            SrbTreeTaggerPool spreads every directory across them.
+        lexicon (Optional[str]): Lexicon file for the in-process lexicon lemmatizer;
+            only unknown and ambiguous forms are then sent to TreeTagger.
+        chunk_size (int): Characters of text lemmatized per TreeTagger call.
+        image_format (str): Output image format: png, webp, jpeg or svg.
+        scale (float): Scaling between layout and output image size.
+        use_matplotlib (bool): Whether to save images through matplotlib (slower).
+        report_path (Optional[str]): JSON file for the run report.
+        prometheus_path (Optional[str]): Prometheus textfile for the run report.
+        profile_dir (Optional[str]): Directory for per-directory, per-stage CPU profiles;
+            None disables profiling.
+        profile_memory (bool): Also record tracemalloc peaks of the lemmatize and render
+            stages (requires ``profile_dir``).
+        pipeline_workers (Optional[Dict[str, int]]): Worker threads of the ``read``,
+            ``lemmatize``, ``render`` and ``save`` stages. When set, the stages run as a
+            pipeline overlapping across directories instead of one directory at a time;
+            ``workers`` and profiling are then not used.
+        queue_size (int): Directories that may wait between two pipeline stages, and
+            text chunks read ahead of lemmatization per directory.
+        render_cache (Optional[str]): Directory of a content-addressed cache of rendered
+            images; word clouds identical to a cached one are copied instead of rendered.
+        render_cache_size (int): Maximum size of the render cache in megabytes.
+        layout_engine (str): Word placement engine: ``wordcloud`` (the library's own)
+            or ``numpy`` (vectorized, much faster on large images).
+        collection_depth (Optional[int]): Level of the collections below ``input_dir``,
+            each read with its nested directories; None makes every nested directory
+            a collection of its own files.
+        include (Optional[List[str]]): Glob patterns of files to read (default:
+            ``*.txt`` and ``*.txt.gz``, also inside ``.zip`` and ``.tar`` archives).
+        exclude (Optional[List[str]]): Glob patterns of files and directories to skip.
+        progress (Optional[Callable[[Progress], None]]): Called with the directory, stage,
+            bytes and tokens done as the run advances, from the thread doing the work.
+        cancel (Optional[CancellationToken]): Stops the run between chunks and directories;
+            the results of the directories finished before are kept.
         
     Returns:
-        Dict[str, Dict[str, str]]: Results dictionary with paths to generated images.
+        Dict[str, Dict[str, str]]: Results dictionary with paths to generated images. It is a
+        :class:`metrics.RunResults` whose ``metrics`` attribute holds the run report and
+        whose ``cancelled`` attribute tells whether the run was cancelled.
     """
+    if layout_engine not in LAYOUT_ENGINES:
+        raise ValueError(f"Unknown layout engine {layout_engine!r}, expected one of {LAYOUT_ENGINES}")
     logger.info(
         f"Starting word cloud generation (collocations={collocations}, "
         f"width={width}, height={height}, max_words={max_words})"
     )
+    started = time.perf_counter()
     
     # Ensure output directory exists
     ensure_directory_exists(output_dir)
-    results = {}
+    results = RunResults()
+    directory_metrics = []
     
+    tagger = None
     try:
         # Initialize tagger and load stopwords
-        logger.info("Initializing Serbian TreeTagger")
-        tagger = SrbTreeTagger()
+        tagger_kwargs = {'cache_path': lemma_cache, 'cache_size': lemma_cache_size,
+                         'pool_size': taggers, 'lexicon_path': lexicon}
+        if pipeline_workers:
+            if workers > 1 or profile_dir:
+                logger.warning("Worker processes and profiling are not used in pipelined mode")
+            profile_dir = None
+        elif workers <= 1:
+            logger.info("Initializing Serbian TreeTagger")
+            tagger = create_tagger(**tagger_kwargs)
         
         logger.info(f"Loading stopwords from {stopwords_file}")
         stopwords = load_stopwords(stopwords_file)
+        profile = {'profile_dir': profile_dir, 'memory': profile_memory} if profile_dir else None
         
         # Process each subdirectory in the input directory
-        for root, dirs, files in os.walk(input_dir):
-            # Skip the root input directory itself
-            if root == input_dir:
-                continue
-            
-            folder_name = os.path.basename(root)
-            std_path, coll_path = process_directory(
-                root,
-                tagger,
-                stopwords,
-                output_dir,
-                collocations,
-                width,
-                height,
-                max_words
-            )
-            
+        directories = list_input_directories(input_dir, collection_depth, include, exclude)
+        cache = RenderCache(render_cache, render_cache_size) if render_cache else None
+        tracker = ProgressTracker(progress, len(directories)) if progress else None
+        args = (stopwords, output_dir, collocations, width, height, max_words, chunk_size,
+                image_format, scale, use_matplotlib, cache, layout_engine)
+        if pipeline_workers:
+            processed = pipeline_directories(directories, *args, tagger_kwargs,
+                                             pipeline_workers, queue_size, tracker, cancel)
+        else:
+            processed = map_directories(process_directory, directories, args,
+                                        tagger=tagger, workers=workers,
+                                        tagger_kwargs=tagger_kwargs, profile=profile,
+                                        progress=tracker, cancel=cancel)
+        for directory, (std_path, coll_path), metrics in processed:
+            directory_metrics.append(metrics)
             # Store results
             if std_path or coll_path:
-                results[folder_name] = {
+                results[os.path.basename(directory)] = {
                     'standard': std_path,
                     'collocations': coll_path
                 }
         
         processed_count = len(results)
+        if cancel is not None and cancel.cancelled and len(directory_metrics) < len(directories):
+            results.cancelled = True
+            logger.warning(f"Word cloud generation cancelled after {len(directory_metrics)} of "
+                           f"{len(directories)} directories, keeping their results")
         logger.info(f"Word cloud generation completed. Processed {processed_count} directories.")
-        return results
+        log_cache_stats(tagger)
+        if cache is not None:
+            log_render_cache_stats(cache, directory_metrics)
+        if profile_dir:
+            from profiling import merge_profiles
+            merge_profiles(profile_dir, [metrics.directory for metrics in directory_metrics])
+        return finish_run(results, 'wordcloudsr', directory_metrics, started,
+                          report_path, prometheus_path)
         
     except Exception as e:
         logger.error(f"An error occurred during processing: {e}")
         raise
+    finally:
+        if tagger is not None:
+            tagger.close()
 
 
 def main():
     """Parse arguments and run the word cloud generation process."""
     # Get command line arguments
     args = parse_arguments()
+    setup_logging(args['debug'])
 
     # Run the main process
     process_files(
@@ -270,7 +894,28 @@ def main():
         stopwords_file=args['stopwords'],
         width=args['width'],
         height=args['height'],
-        max_words=args['max_words']
+        max_words=args['max_words'],
+        lemma_cache=args['lemma_cache'],
+        lemma_cache_size=args['lemma_cache_size'],
+        workers=args['workers'],
+        taggers=args['taggers'],
+        lexicon=args['lexicon'],
+        chunk_size=args['chunk_size'],
+        image_format=args['format'],
+        scale=args['scale'],
+        use_matplotlib=args['matplotlib'],
+        report_path=args['report'],
+        prometheus_path=args['prometheus'],
+        profile_dir=args['profile'],
+        profile_memory=args['profile_memory'],
+        pipeline_workers=args['pipeline'],
+        queue_size=args['queue_size'],
+        render_cache=args['render_cache'],
+        render_cache_size=args['render_cache_size'],
+        layout_engine=args['layout_engine'],
+        collection_depth=args['collection_depth'],
+        include=args['include'],
+        exclude=args['exclude']
     )
 
 
@@ -21,16 +21,80 @@ import csv
 import collections
 import logging
 from pathlib import Path
-from typing import Set, Dict, List, Tuple, Optional
-from SerbianTagger import SrbTreeTagger
+import time
+from typing import TYPE_CHECKING, Callable, Set, Dict, Iterable, List, Tuple, Optional
+from SerbianTagger import SrbTreeTagger, create_tagger
+from lemma_cache import DEFAULT_MAX_ENTRIES
+from manifest import DirectoryState
+from metrics import DirectoryMetrics, RunResults, finish_run
+from parallel import map_directories
+from progress import CancellationToken, Progress, ProgressTracker
 from utils import (
+    DEFAULT_CHUNK_SIZE,
     load_stopwords, 
-    extract_text_from_directory, 
+    lemmatize_chunks,
     ensure_directory_exists,
+    list_input_directories,
+    log_cache_stats,
     parse_arguments,
+    setup_logging,
     logger
 )
 
+# vocabulary needs NumPy, which is only imported once lemmas are counted
+if TYPE_CHECKING:
+    from vocabulary import LemmaCounts
+
+def sort_lemma_counts(lemma_freq: collections.Counter, stopwords: Set[str]) -> List[Tuple[str, int]]:
+    """
+    Remove stopwords from lemma counts and sort them by frequency.
+    
+    Args:
+        lemma_freq (collections.Counter): Lemma counts; stopwords are removed in place.
+        stopwords (Set[str]): Set of stopwords to exclude.
+        
+    Returns:
+        List[Tuple[str, int]]: List of (lemma, frequency) pairs sorted by frequency.
+    """
+    # Remove stopwords
+    for stopword in stopwords:
+        if stopword in lemma_freq:
+            del lemma_freq[stopword]
+    
+    # Sort by frequency in descending order
+    return sorted(lemma_freq.items(), key=lambda x: x[1], reverse=True)
+
+
+def count_lemmas(lemmatized_text: str, stopwords: Set[str]) -> List[Tuple[str, int]]:
+    """
+    Count lemma frequencies in already lemmatized text and remove stopwords.
+    
+    Args:
+        lemmatized_text (str): Space-separated lemmas.
+        stopwords (Set[str]): Set of stopwords to exclude.
+        
+    Returns:
+        List[Tuple[str, int]]: List of (lemma, frequency) pairs sorted by frequency.
+    """
+    return sort_lemma_counts(collections.Counter(lemmatized_text.lower().split()), stopwords)
+
+
+def count_lemma_tokens(lemmatized_chunks: Iterable[str]) -> collections.Counter:
+    """
+    Count lemmas over a stream of lemmatized chunks, without removing stopwords.
+    
+    Args:
+        lemmatized_chunks (Iterable[str]): Space-separated lemmas, one chunk at a time.
+        
+    Returns:
+        collections.Counter: Lemma counts.
+    """
+    lemma_freq = collections.Counter()
+    for chunk in lemmatized_chunks:
+        lemma_freq.update(chunk.lower().split())
+    return lemma_freq
+
+
 def calculate_lemma_frequencies(text: str, tagger: SrbTreeTagger, stopwords: Set[str]) -> List[Tuple[str, int]]:
     """
     Calculate lemma frequencies from text after lemmatization and stopword removal.
@@ -54,16 +118,7 @@ def calculate_lemma_frequencies(text: str, tagger: SrbTreeTagger, stopwords: Set
         logger.warning("Lemmatization produced empty result")
         return []
     
-    # Count lemma frequencies
-    lemma_freq = collections.Counter(lemmatized_text.lower().split())
-    
-    # Remove stopwords
-    for stopword in stopwords:
-        if stopword in lemma_freq:
-            del lemma_freq[stopword]
-    
-    # Sort by frequency in descending order
-    return sorted(lemma_freq.items(), key=lambda x: x[1], reverse=True)
+    return count_lemmas(lemmatized_text, stopwords)
 
 
 def write_frequencies_to_csv(frequencies: List[Tuple[str, int]], output_path: str) -> bool:
@@ -93,46 +148,87 @@ def write_frequencies_to_csv(frequencies: List[Tuple[str, int]], output_path: st
 
 
 def process_directory(directory: str, tagger: SrbTreeTagger, stopwords: Set[str], 
-                     output_dir: str) -> Optional[str]:
+                     output_dir: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     state_dir: Optional[str] = None,
+                     keep_counts: bool = False,
+                     metrics: Optional[DirectoryMetrics] = None
+                     ) -> Tuple[Optional[str], Optional["LemmaCounts"]]:
     """
     Process a single directory of text files.
     
+    Lemmas are counted into a :class:`vocabulary.LemmaCounts` over the
+    process-wide vocabulary, so kept counts hold integer ids rather than
+    their own copies of the lemma strings.
+    
     Args:
         directory (str): Directory containing text files.
         tagger (SrbTreeTagger): Initialized tagger instance.
         stopwords (Set[str]): Set of stopwords.
         output_dir (str): Directory to save output CSV.
+        chunk_size (int): Characters of text lemmatized per TreeTagger call.
+        state_dir (Optional[str]): Directory with incremental state; when set, only
+            new or changed files are lemmatized.
+        keep_counts (bool): Whether to return the lemma counts as well.
+        metrics (Optional[DirectoryMetrics]): Collects file, token and timing statistics.
         
     Returns:
-        Optional[str]: Path to the output CSV file if successful, None otherwise.
+        Tuple[Optional[str], Optional[LemmaCounts]]: Path to the output CSV file if successful,
+        and the lemma counts (stopwords included) if ``keep_counts`` is set.
     """
+    from vocabulary import LemmaCounts
     logger.info(f"Processing directory: {directory}")
+    metrics = metrics or DirectoryMetrics(directory)
     
-    # Get all text from the directory
-    all_text = extract_text_from_directory(directory)
+    if state_dir:
+        # Merge per-file shards, lemmatizing only new or changed files
+        lemma_freq, _ = DirectoryState(state_dir, directory).update(tagger, chunk_size, metrics)
+        with metrics.stage('count'):
+            counts = LemmaCounts.from_counter(lemma_freq)
+    else:
+        # Stream the directory through the tagger chunk by chunk and count as we go
+        lemmatized_chunks = metrics.timed(
+            lemmatize_chunks(metrics.read_chunks(directory, chunk_size), tagger), 'lemmatize')
+        with metrics.stage('count'):
+            counts = LemmaCounts.from_chunks(lemmatized_chunks)
     
-    if not all_text:
-        logger.warning(f"No text content found in {directory}, skipping")
-        return None
-        
-    # Calculate lemma frequencies
-    sorted_lemmas = calculate_lemma_frequencies(all_text, tagger, stopwords)
+    with metrics.stage('count'):
+        metrics.add_counts(counts)
+        sorted_lemmas = counts.sorted_items(stopwords)
+    kept = counts if keep_counts else None
     
     if not sorted_lemmas:
         logger.warning(f"No lemmas found in {directory}, skipping CSV generation")
-        return None
+        return None, kept
         
     # Determine output CSV path and write results
     csv_path = os.path.join(output_dir, f'{os.path.basename(directory)}.csv')
     
-    if write_frequencies_to_csv(sorted_lemmas, csv_path):
-        return csv_path
-    else:
-        return None
+    with metrics.stage('write'):
+        written = write_frequencies_to_csv(sorted_lemmas, csv_path)
+    return (csv_path if written else None), kept
 
 
 def process_files(input_dir: str = 'input', output_dir: str = 'output', 
-                  stopwords_file: str = 'stopwords.txt') -> Dict[str, str]:
+                  stopwords_file: str = 'stopwords.txt',
+                  lemma_cache: Optional[str] = None,
+                  lemma_cache_size: int = DEFAULT_MAX_ENTRIES,
+                  workers: int = 1,
+                  taggers: int = 1,
+                  lexicon: Optional[str] = None,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE,
+                  state_dir: Optional[str] = None,
+                  report_path: Optional[str] = None,
+                  prometheus_path: Optional[str] = None,
+                  profile_dir: Optional[str] = None,
+                  profile_memory: bool = False,
+                  keep_counts: bool = False,
+                  term_matrix: Optional[str] = None,
+                  results_db: Optional[str] = None,
+                  collection_depth: Optional[int] = None,
+                  include: Optional[List[str]] = None,
+                  exclude: Optional[List[str]] = None,
+                  progress: Optional[Callable[[Progress], None]] = None,
+                  cancel: Optional[CancellationToken] = None) -> Dict[str, str]:
     """
     Process text files in subdirectories, generate lemma frequencies, and save to CSV.
     
@@ -140,48 +236,156 @@ def process_files(input_dir: str = 'input', output_dir: str = 'output',
         input_dir (str): Directory containing subdirectories with text files.
         output_dir (str): Directory where output CSV files will be saved.
         stopwords_file (str): File containing stopwords to exclude.
+        lemma_cache (Optional[str]): SQLite file for a persistent lemma cache.
+        lemma_cache_size (int): Maximum number of entries in the lemma cache.
+        workers (int): Number of worker processes. Each worker starts its own
+            TreeTagger; with 1 everything runs in the current process.
+        taggers (int): Number of TreeTagger processes per worker; above 1 a
+            SrbTreeTaggerPool spreads every directory across them.
+        lexicon (Optional[str]): Lexicon file for the in-process lexicon lemmatizer;
+            only unknown and ambiguous forms are then sent to TreeTagger.
+        chunk_size (int): Characters of text lemmatized per TreeTagger call.
+        state_dir (Optional[str]): Directory with incremental per-file state.
+        report_path (Optional[str]): JSON file for the run report.
+        prometheus_path (Optional[str]): Prometheus textfile for the run report.
+        profile_dir (Optional[str]): Directory for per-directory, per-stage CPU profiles;
+            None disables profiling.
+        profile_memory (bool): Also record tracemalloc peaks of the lemmatize and render
+            stages (requires ``profile_dir``).
+        keep_counts (bool): Also keep the lemma counts of every directory in the
+            ``counts`` attribute of the results, a :class:`vocabulary.CountStore`.
+        term_matrix (Optional[str]): Save the lemma counts of all directories as a
+            term-document matrix to this ``.npz`` file (see :mod:`termdoc`); implies
+            ``keep_counts``.
+        results_db (Optional[str]): Also load every frequency table into this SQLite
+            database (see :mod:`results_db`), upserting directories seen before.
+        collection_depth (Optional[int]): Level of the collections below ``input_dir``,
+            each read with its nested directories; None makes every nested directory
+            a collection of its own files.
+        include (Optional[List[str]]): Glob patterns of files to read (default:
+            ``*.txt`` and ``*.txt.gz``, also inside ``.zip`` and ``.tar`` archives).
+        exclude (Optional[List[str]]): Glob patterns of files and directories to skip.
+        progress (Optional[Callable[[Progress], None]]): Called with the directory, stage,
+            bytes and tokens done as the run advances, from the thread doing the work.
+        cancel (Optional[CancellationToken]): Stops the run between chunks and directories;
+            the results of the directories finished before are kept.
         
     Returns:
-        Dict[str, str]: Dictionary mapping directory names to output CSV paths.
+        Dict[str, str]: Dictionary mapping directory names to output CSV paths. It is a
+        :class:`metrics.RunResults` whose ``metrics`` attribute holds the run report and
+        whose ``cancelled`` attribute tells whether the run was cancelled.
     """
     logger.info(f"Starting text processing with input dir: {input_dir}, output dir: {output_dir}")
+    started = time.perf_counter()
     
     # Ensure output directory exists
     ensure_directory_exists(output_dir)
-    results = {}
+    results = RunResults()
+    directory_metrics = []
     
+    tagger = None
+    results_store = None
     try:
         # Initialize tagger and load stopwords
-        logger.info("Initializing Serbian TreeTagger")
-        tagger = SrbTreeTagger()
+        tagger_kwargs = {'cache_path': lemma_cache, 'cache_size': lemma_cache_size,
+                         'pool_size': taggers, 'lexicon_path': lexicon}
+        if workers <= 1:
+            logger.info("Initializing Serbian TreeTagger")
+            tagger = create_tagger(**tagger_kwargs)
         
         logger.info(f"Loading stopwords from {stopwords_file}")
         stopwords = load_stopwords(stopwords_file)
+        profile = {'profile_dir': profile_dir, 'memory': profile_memory} if profile_dir else None
         
         # Process each subdirectory in the input directory
-        for root, dirs, files in os.walk(input_dir):
-            # Skip the root input directory itself
-            if root == input_dir:
-                continue
-            
-            csv_path = process_directory(root, tagger, stopwords, output_dir)
+        directories = list_input_directories(input_dir, collection_depth, include, exclude)
+        keep_counts = keep_counts or bool(term_matrix)
+        if keep_counts:
+            from vocabulary import CountStore
+            results.counts = CountStore()
+        if results_db:
+            from results_db import ResultsStore
+            results_store = ResultsStore(results_db)
+        tracker = ProgressTracker(progress, len(directories)) if progress else None
+        for directory, (csv_path, counts), metrics in map_directories(
+                process_directory, directories,
+                (stopwords, output_dir, chunk_size, state_dir, keep_counts or bool(results_db)),
+                tagger=tagger, workers=workers, tagger_kwargs=tagger_kwargs,
+                profile=profile, progress=tracker, cancel=cancel):
+            directory_metrics.append(metrics)
             if csv_path:
-                results[os.path.basename(root)] = csv_path
+                results[os.path.basename(directory)] = csv_path
+            if results_store is not None and csv_path:
+                results_store.add(os.path.basename(directory), counts.sorted_items(stopwords))
+            if keep_counts and counts is not None:
+                results.counts.add(os.path.basename(directory), counts)
+        if results_store is not None:
+            results_store.flush()
             
         processed_count = len(results)
+        if cancel is not None and cancel.cancelled and len(directory_metrics) < len(directories):
+            results.cancelled = True
+            logger.warning(f"Text processing cancelled after {len(directory_metrics)} of "
+                           f"{len(directories)} directories, keeping their results")
         logger.info(f"Text processing completed successfully. Processed {processed_count} directories.")
-        return results
+        log_cache_stats(tagger)
+        if term_matrix:
+            from termdoc import TermDocumentMatrix
+            TermDocumentMatrix.from_store(results.counts).save(term_matrix)
+        if profile_dir:
+            from profiling import merge_profiles
+            merge_profiles(profile_dir, [metrics.directory for metrics in directory_metrics])
+        return finish_run(results, 'wordfrqsr', directory_metrics, started,
+                          report_path, prometheus_path)
         
     except Exception as e:
         logger.error(f"An error occurred during processing: {e}")
         raise
+    finally:
+        if tagger is not None:
+            tagger.close()
+        if results_store is not None:
+            results_store.close()
 
 
 # Run the process_files function when the script is run directly
 if __name__ == "__main__":
     args = parse_arguments()
-    process_files(
+    setup_logging(args['debug'])
+    results = process_files(
         input_dir=args['input'],
         output_dir=args['output'],
-        stopwords_file=args['stopwords']
-    )
\ No newline at end of file
+        stopwords_file=args['stopwords'],
+        lemma_cache=args['lemma_cache'],
+        lemma_cache_size=args['lemma_cache_size'],
+        workers=args['workers'],
+        taggers=args['taggers'],
+        lexicon=args['lexicon'],
+        chunk_size=args['chunk_size'],
+        state_dir=args['state_dir'],
+        report_path=args['report'],
+        prometheus_path=args['prometheus'],
+        profile_dir=args['profile'],
+        profile_memory=args['profile_memory'],
+        keep_counts=bool(args['weighting']),
+        term_matrix=args['term_matrix'],
+        results_db=args['results_db'],
+        collection_depth=args['collection_depth'],
+        include=args['include'],
+        exclude=args['exclude']
+    )
+    if args['weighting']:
+        from termdoc import TermDocumentMatrix, render_weighted_wordclouds
+        render_weighted_wordclouds(
+            TermDocumentMatrix.from_store(results.counts),
+            args['weighting'],
+            args['output'],
+            stopwords=load_stopwords(args['stopwords']),
+            width=args['width'],
+            height=args['height'],
+            max_words=args['max_words'],
+            image_format=args['format'],
+            scale=args['scale'],
+            use_matplotlib=args['matplotlib'],
+            layout_engine=args['layout_engine']
+        )
\ No newline at end of file